@@ -0,0 +1,112 @@
+import time
+import pandas as pd
+
+POSITIONS_COLUMNS = ['positions', 'weights', 'orders']
+
+
+class PortfolioPositionsClient:
+    # get_positions compatible client which fetches only the rows
+    # the portfolios need. portfolio rows are fetched with weights only,
+    # then the models named in their weights with positions and orders only.
+    # models added to the weights are backfilled for the whole window.
+    # PositionsCache inserts the backfilled rows at their timestamps
+    def __init__(self, source=None, portfolio_model_ids=None, logger=None, window=24 * 60 * 60):
+        self._source = source
+        self._portfolio_model_ids = set(portfolio_model_ids)
+        self._logger = logger
+        self._window = window
+        # (timestamp, model_id) -> model_ids in weights
+        self._portfolio_rows = {}
+        self._model_ids = set()
+
+    def get_positions(self, min_timestamp=None):
+        now = time.time()
+        df_portfolio = self._source.fetch(min_timestamp, self._portfolio_model_ids, ['weights'])
+        for key, weights in zip(df_portfolio.index, df_portfolio['weights'].values):
+            self._portfolio_rows[key] = set(weights)
+        min_datetime = pd.to_datetime(now - self._window, unit='s', utc=True)
+        for key in [x for x in self._portfolio_rows if x[0] < min_datetime]:
+            del self._portfolio_rows[key]
+
+        # any weights within the window can be the latest one
+        model_ids = set().union(*self._portfolio_rows.values()) - self._portfolio_model_ids
+        added = model_ids - self._model_ids
+        existing = model_ids & self._model_ids
+        self._model_ids = model_ids
+
+        dfs = [df_portfolio]
+        if len(existing) > 0:
+            dfs.append(self._source.fetch(min_timestamp, existing, ['positions', 'orders']))
+        if len(added) > 0:
+            self._logger.info('alphapool query models added {}'.format(sorted(added)))
+            backfill_timestamp = int(now - self._window)
+            if min_timestamp is not None:
+                backfill_timestamp = min(backfill_timestamp, min_timestamp)
+            dfs.append(self._source.fetch(backfill_timestamp, added, ['positions', 'orders']))
+        return pd.concat(dfs).sort_index()
+
+    def is_relevant(self, model_id):
+        return model_id in self._portfolio_model_ids or model_id in self._model_ids
+
+
+class DatasetRowsSource:
+    # pushes model_id and column filters down to the alphapool table
+    def __init__(self, table=None):
+        self._table = table
+        self._timestamp_unit = _timestamp_unit(table.table.c.timestamp.type)
+
+    def fetch(self, min_timestamp, model_ids, columns):
+        import sqlalchemy
+        t = self._table.table
+        query = sqlalchemy.select(
+            *[t.c[x] for x in ['timestamp', 'model_id'] + columns]
+        ).where(t.c.model_id.in_(sorted(model_ids)))
+        if min_timestamp is not None:
+            if self._timestamp_unit is None:
+                min_timestamp = pd.to_datetime(min_timestamp, unit='s').to_pydatetime()
+            query = query.where(t.c.timestamp >= min_timestamp)
+        rows = list(self._table.db.query(query))
+        df = pd.DataFrame(rows, columns=['timestamp', 'model_id'] + columns)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, unit=self._timestamp_unit)
+        return to_positions_frame(df.set_index(['timestamp', 'model_id']), columns)
+
+
+def _timestamp_unit(column_type):
+    # unix seconds or datetime columns. naive datetimes are utc
+    import sqlalchemy
+    if isinstance(column_type, sqlalchemy.DateTime):
+        return None
+    if isinstance(column_type, (sqlalchemy.Integer, sqlalchemy.Numeric)):
+        return 's'
+    raise ValueError('alphapool timestamp column type not supported {}'.format(column_type))
+
+
+class FrameRowsSource:
+    # for clients without table access (mock, replay). filtered after fetching
+    def __init__(self, alphapool_client=None):
+        self._alphapool_client = alphapool_client
+
+    def fetch(self, min_timestamp, model_ids, columns):
+        df = self._alphapool_client.get_positions(min_timestamp=min_timestamp)
+        df = df.loc[df.index.get_level_values('model_id').isin(model_ids), columns]
+        return to_positions_frame(df, columns)
+
+
+def to_positions_frame(df, columns):
+    # columns not fetched are empty like rows without them (null)
+    df = df.copy()
+    for col in POSITIONS_COLUMNS:
+        if col in columns:
+            df[col] = [_to_dict(x, col) for x in df[col].values]
+        else:
+            df[col] = [{} for _ in range(df.shape[0])]
+    return df[POSITIONS_COLUMNS].sort_index()
+
+
+def _to_dict(x, col):
+    # other encodings (ex. json text) would silently close all positions
+    if x is None:
+        return {}
+    if not isinstance(x, dict):
+        raise ValueError('alphapool {} is not a dict {}'.format(col, type(x)))
+    return x
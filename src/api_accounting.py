@@ -0,0 +1,164 @@
+from collections import defaultdict
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+
+DEFAULT_WEIGHT_HEADERS = [
+    # binance
+    'x-mbx-used-weight-1m',
+    'x-mbx-order-count-10s',
+    'x-mbx-order-count-1m',
+    # bybit
+    'x-bapi-limit-status',
+    # okx has no weight header
+]
+
+_non_critical = contextvars.ContextVar('api_accounting_non_critical', default=False)
+
+
+class ApiBudgetExceeded(Exception):
+    pass
+
+
+class NullApiAccounting:
+    def install(self, client):
+        return client
+
+    def begin_loop(self):
+        pass
+
+    def non_critical(self):
+        return contextlib.nullcontext()
+
+    def summary(self):
+        return {}
+
+    def log_summary(self):
+        pass
+
+
+class ApiAccounting:
+    # counts rest calls of a ccxt client per endpoint and per loop.
+    # budget is in ccxt rate limit cost (binance weight).
+    # calls in non_critical() raise ApiBudgetExceeded once the loop budget is used up.
+    def __init__(self, logger=None, budget=None, weight_headers=None, metrics=None):
+        self._logger = logger
+        self._budget = budget
+        self._weight_headers = DEFAULT_WEIGHT_HEADERS if weight_headers is None else weight_headers
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self._loop_stats = defaultdict(_new_stats)
+        self._total_stats = defaultdict(_new_stats)
+        self._loop_cost = 0.0
+        self._deferred = 0
+        self._weights = {}
+
+    def install(self, client):
+        fetch2 = client.fetch2
+
+        if asyncio.iscoroutinefunction(fetch2):
+            async def wrapped(path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+                endpoint, cost = self._before(client, path, api, method, params, config)
+                start = time.perf_counter()
+                error = False
+                try:
+                    return await fetch2(path, api, method, params, headers, body, config)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    self._after(client, endpoint, cost, start, error)
+        else:
+            def wrapped(path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+                endpoint, cost = self._before(client, path, api, method, params, config)
+                start = time.perf_counter()
+                error = False
+                try:
+                    return fetch2(path, api, method, params, headers, body, config)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    self._after(client, endpoint, cost, start, error)
+
+        client.fetch2 = wrapped
+        return client
+
+    def begin_loop(self):
+        with self._lock:
+            self._loop_stats = defaultdict(_new_stats)
+            self._loop_cost = 0.0
+            self._deferred = 0
+
+    @contextlib.contextmanager
+    def non_critical(self):
+        token = _non_critical.set(True)
+        try:
+            yield
+        finally:
+            _non_critical.reset(token)
+
+    def summary(self):
+        with self._lock:
+            return {
+                'loop': {k: dict(v) for k, v in self._loop_stats.items()},
+                'total': {k: dict(v) for k, v in self._total_stats.items()},
+                'loop_cost': self._loop_cost,
+                'budget': self._budget,
+                'deferred': self._deferred,
+                'weights': dict(self._weights),
+            }
+
+    def log_summary(self):
+        summary = self.summary()
+        loop = summary['loop']
+        self._logger.info('api calls {} cost {} budget {} deferred {} weights {}'.format(
+            sum(x['count'] for x in loop.values()),
+            summary['loop_cost'],
+            summary['budget'],
+            summary['deferred'],
+            summary['weights'],
+        ))
+        for endpoint in sorted(loop):
+            x = loop[endpoint]
+            self._logger.info('api endpoint {} count {} errors {} cost {} seconds {:.3f}'.format(
+                endpoint, x['count'], x['errors'], x['cost'], x['seconds'],
+            ))
+
+    def _before(self, client, path, api, method, params, config):
+        endpoint = '{} {} {}'.format(method, api, path)
+        cost = client.calculate_rate_limiter_cost(api, method, path, params, config)
+        with self._lock:
+            if (_non_critical.get() and self._budget is not None
+                    and self._loop_cost + cost > self._budget):
+                self._deferred += 1
+                raise ApiBudgetExceeded('api budget exceeded {} cost {} budget {} {}'.format(
+                    self._loop_cost, cost, self._budget, endpoint
+                ))
+            self._loop_cost += cost
+        return endpoint, cost
+
+    def _after(self, client, endpoint, cost, start, error):
+        elapsed = time.perf_counter() - start
+        # last_response_headers is per client. order submission threads own their clients
+        response_headers = client.last_response_headers or {}
+        response_headers = {k.lower(): v for k, v in response_headers.items()}
+        with self._lock:
+            for stats in [self._loop_stats[endpoint], self._total_stats[endpoint]]:
+                stats['count'] += 1
+                stats['cost'] += cost
+                stats['seconds'] += elapsed
+                if error:
+                    stats['errors'] += 1
+            for header in self._weight_headers:
+                if header in response_headers:
+                    self._weights[header] = response_headers[header]
+
+        if self._metrics is not None:
+            self._metrics.observe('api_request_seconds', elapsed, labels={'endpoint': endpoint})
+
+
+def _new_stats():
+    return {'count': 0, 'errors': 0, 'cost': 0.0, 'seconds': 0.0}
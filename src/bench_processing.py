@@ -0,0 +1,189 @@
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from .logger import create_logger
+from .processing import (
+    preprocess_df,
+    asfreq_positions,
+    calc_portfolio_positions,
+    calc_model_ret,
+)
+
+FREQ = '300S'
+
+
+def generate_positions(n_models=100, n_symbols=20, days=7, n_portfolios=2,
+                       symbols_per_model=5, drop_ratio=0.05, seed=0):
+    # alphapool positions flattened to p.<symbol> and w.<model_id> columns.
+    # models publish every 300s with a jitter and sometimes skip a bar.
+    rs = np.random.RandomState(seed)
+    symbols = ['S{}'.format(i) for i in range(n_symbols)]
+    model_ids = ['model{}'.format(i) for i in range(n_models)]
+    portfolio_ids = ['pf{}'.format(i) for i in range(n_portfolios)]
+    end = pd.Timestamp('2022-01-01', tz='UTC')
+    bars = pd.date_range(end - pd.to_timedelta(days, unit='D'), end, freq=FREQ)
+
+    frames = []
+    for model_id in model_ids:
+        cols = rs.choice(n_symbols, size=min(symbols_per_model, n_symbols), replace=False)
+        keep = rs.uniform(size=len(bars)) >= drop_ratio
+        n = int(keep.sum())
+        df = pd.DataFrame(np.nan, index=np.arange(n), columns=['p.' + x for x in symbols])
+        df.iloc[:, cols] = rs.normal(0, 1.0 / len(cols), size=(n, len(cols)))
+        df['model_id'] = model_id
+        df['timestamp'] = bars[keep] + pd.to_timedelta(rs.randint(0, 60, size=n), unit='s')
+        frames.append(df)
+
+    for portfolio_id in portfolio_ids:
+        n = len(bars)
+        weights = rs.uniform(size=(n, n_models))
+        weights /= weights.sum(axis=1, keepdims=True)
+        df = pd.DataFrame(weights, columns=['w.' + x for x in model_ids])
+        df['model_id'] = portfolio_id
+        df['timestamp'] = bars
+        frames.append(df)
+
+    df = pd.concat(frames, ignore_index=True)
+    return df.set_index(['timestamp', 'model_id']).sort_index(), bars[-1]
+
+
+def generate_returns(index, n_symbols, seed=0):
+    # ret.<symbol> per bar
+    rs = np.random.RandomState(seed)
+    return pd.DataFrame(
+        rs.normal(0, 0.001, size=(len(index), n_symbols)),
+        index=index,
+        columns=['ret.S{}'.format(i) for i in range(n_symbols)],
+    )
+
+
+def attach_returns(df, df_ret):
+    return df.join(df_ret, on='timestamp')
+
+
+def measure(name, fn, *args, **kwargs):
+    # tracing slows allocation heavy code down. time and memory are measured in separate runs
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    del result
+
+    tracemalloc.start()
+    try:
+        result = fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {
+        'name': name,
+        'seconds': elapsed,
+        'peak_memory_bytes': peak,
+    }
+
+
+def run_benchmarks(n_models=100, n_symbols=20, days=7, n_portfolios=2,
+                   repeat=1, seed=0, logger=None):
+    df_raw, execution_time = generate_positions(
+        n_models=n_models,
+        n_symbols=n_symbols,
+        days=days,
+        n_portfolios=n_portfolios,
+        seed=seed,
+    )
+
+    def pipeline(df):
+        df = preprocess_df(df, execution_time)
+        df = calc_portfolio_positions(df)
+        df = attach_returns(df, df_ret)
+        return calc_model_ret(df)
+
+    # inputs of each stage are computed once outside the measurement
+    df_pre = df_raw.fillna(0).filter(regex="^(p|w).", axis=1)
+    df_asfreq = preprocess_df(df_raw, execution_time)
+    df_ret = generate_returns(
+        df_asfreq.index.get_level_values('timestamp').unique().sort_values(),
+        n_symbols,
+        seed=seed,
+    )
+    df_pf = calc_portfolio_positions(df_asfreq)
+    df_with_ret = attach_returns(df_pf, df_ret)
+
+    cases = [
+        ('preprocess_df', preprocess_df, df_raw, execution_time),
+        ('asfreq_positions', asfreq_positions, df_pre, FREQ, execution_time),
+        ('calc_portfolio_positions', calc_portfolio_positions, df_asfreq),
+        ('calc_model_ret', calc_model_ret, df_with_ret),
+        ('pipeline', pipeline, df_raw),
+    ]
+
+    results = []
+    for name, fn, *args in cases:
+        for i in range(repeat):
+            _, result = measure(name, fn, *args)
+            result['repeat'] = i
+            results.append(result)
+            if logger is not None:
+                logger.info('bench {} {:.3f}s peak {:.1f}MB'.format(
+                    name, result['seconds'], result['peak_memory_bytes'] / 2 ** 20
+                ))
+
+    return {
+        'params': {
+            'models': n_models,
+            'symbols': n_symbols,
+            'days': days,
+            'portfolios': n_portfolios,
+            'rows': df_raw.shape[0],
+            'seed': seed,
+        },
+        'env': _environment(),
+        'results': results,
+    }
+
+
+def _environment():
+    try:
+        revision = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        revision = None
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+    }
+
+
+def start():
+    logger = create_logger(os.getenv('ALPHAPOOL_LOG_LEVEL', 'info'))
+    output_path = os.getenv('ALPHAPOOL_BENCH_OUTPUT')
+
+    report = run_benchmarks(
+        n_models=int(os.getenv('ALPHAPOOL_BENCH_MODELS', '100')),
+        n_symbols=int(os.getenv('ALPHAPOOL_BENCH_SYMBOLS', '20')),
+        days=float(os.getenv('ALPHAPOOL_BENCH_DAYS', '7')),
+        n_portfolios=int(os.getenv('ALPHAPOOL_BENCH_PORTFOLIOS', '2')),
+        repeat=int(os.getenv('ALPHAPOOL_BENCH_REPEAT', '1')),
+        seed=int(os.getenv('ALPHAPOOL_BENCH_SEED', '0')),
+        logger=logger,
+    )
+
+    text = json.dumps(report, indent=4)
+    if output_path is None:
+        print(text)
+    else:
+        with open(output_path, 'w') as f:
+            f.write(text)
+        logger.info('bench results written {}'.format(output_path))
+
+
+if __name__ == '__main__':
+    start()
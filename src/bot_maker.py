@@ -1,18 +1,27 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import dataclasses
+import threading
 import time
 import traceback
-from ccxt.base.errors import OrderNotFound
+from ccxt.base.errors import OrderNotFound, ArgumentsRequired, NotSupported
 import numpy as np
 import pandas as pd
 from .utils import (
     fetch_positions,
     fetch_collateral,
-    symbol_to_ccxt_symbol,
-    ccxt_symbol_to_symbol,
-    normalize_amount,
     set_leverage
 )
+from .market_cache import MarketCache
+from .price_snapshot import PriceSnapshot
+from .order_book import RestOrderBookProvider, QuoteUnavailable
+from .order_store import OrderStore
+from .positions_cache import PositionsCache
+from .portfolio_engine import PortfolioEngine, to_exchange_amounts
+from .rate_limiter import get_token_bucket
+from .metrics import NullMetrics
+from .api_accounting import NullApiAccounting, ApiBudgetExceeded
+from .loop_scheduler import LoopScheduler
 
 # position and amount
 # always one of these two
@@ -25,48 +34,104 @@ MAX_LEVERAGE = 10
 class BotMaker:
     def __init__(self, client=None, logger=None, leverage=None,
                  alphapool_client=None, model_id=None, health_check_ping=None,
-                 unit_pos_smoother=None, ccxt_account_type=None):
+                 unit_pos_smoother=None, ccxt_account_type=None,
+                 market_cache=None, order_concurrency=4, order_rate=4.0,
+                 order_book_provider=None, order_sync_mode='symbol',
+                 positions_cache=None, metrics=None, api_accounting=None,
+                 order_rate_limiter=None, loop_scheduler=None,
+                 order_client_factory=None):
         self._client = client
         self._ccxt_account_type = ccxt_account_type
         self._logger = logger
-        self._order_interval = 1
         self._loop_interval = 60
         self._leverage = leverage
         self._alphapool_client = alphapool_client
         self._model_id = model_id
         self._leverage_set = set()
+        self._leverage_lock = threading.Lock()
         self._health_check_ping = health_check_ping
         self._unit_pos_smoother = unit_pos_smoother
+        self._market_cache = market_cache
+        if self._market_cache is None:
+            self._market_cache = MarketCache(client=client, logger=logger)
+        self._price_snapshot = PriceSnapshot(client=client, logger=logger)
+        self._order_book_provider = order_book_provider
+        if self._order_book_provider is None:
+            self._order_book_provider = RestOrderBookProvider(client=client)
+        # ccxt sync clients share a session and throttle state. concurrent
+        # submission needs a client per thread, otherwise orders are placed serially
+        self._order_client_factory = order_client_factory
+        self._order_clients = threading.local()
+        self._order_executor = None
+        if order_client_factory is not None and order_concurrency > 1:
+            self._order_executor = ThreadPoolExecutor(max_workers=order_concurrency)
+        self._order_rate_limiter = order_rate_limiter
+        if self._order_rate_limiter is None:
+            self._order_rate_limiter = get_token_bucket(client.id, rate=order_rate)
+        self._order_sync_mode = order_sync_mode
+        self._bulk_order_history_supported = True
+        self._order_history_per_symbol = False
+        self._metrics = NullMetrics() if metrics is None else metrics
+        self._api_accounting = NullApiAccounting() if api_accounting is None else api_accounting
+        self._initialized = False
+        self._loop_scheduler = loop_scheduler
+        if self._loop_scheduler is None:
+            self._loop_scheduler = LoopScheduler(
+                interval=self._loop_interval,
+                logger=logger,
+                metrics=self._metrics,
+            )
 
         # cache
-        self._df_positions = None
+        self._positions_version = 0
+        self._models_markets = None
+        self._positions_cache = positions_cache
+        if self._positions_cache is None:
+            self._positions_cache = PositionsCache(
+                alphapool_client=alphapool_client,
+                logger=logger,
+            )
+
+        self._symbol_registry = self._market_cache.get_symbol_registry()
+        self._symbol_exists = np.zeros(0, dtype=bool)
+        self._symbol_exists_markets = None
+        # per bot. the registry is shared by the accounts of an exchange
+        self._warned_symbols = set()
 
         # strategy
         self._positions = {}
+        self._portfolio_engine = PortfolioEngine(symbols=self._positions_cache.codec.symbols)
         self._weights = {}
-        self._limit_orders = []
+        self._limit_orders = OrderStore()
         self._order_processed_rows = set()
 
         # exchange states
         self._exchange_positions = defaultdict(float)
 
     def run(self):
-        initialized = False
-
         while True:
-            try:
-                if not initialized:
-                    self._initialize()
-                    initialized = True
+            self.tick()
+            self._loop_scheduler.wait()
 
-                self._step()
-                self._health_check_ping()
-            except Exception as e:
-                self._logger.error(e)
-                self._logger.error(traceback.format_exc())
+    def tick(self):
+        # one loop iteration. errors are logged and the next tick retries
+        try:
+            if not self._initialized:
+                self._initialize()
+                self._initialized = True
 
-            self._remove_old_data()
-            time.sleep(self._loop_interval)
+            self._api_accounting.begin_loop()
+            try:
+                with self._metrics.span('step'):
+                    self._step()
+            finally:
+                self._api_accounting.log_summary()
+            self._health_check_ping()
+        except Exception as e:
+            self._logger.error(e)
+            self._logger.error(traceback.format_exc())
+
+        self._remove_old_data()
 
     def _initialize(self):
         self._logger.info('initialized')
@@ -78,17 +143,23 @@ class BotMaker:
         self._logger.debug('_order_processed_rows {}'.format(self._order_processed_rows))
         self._logger.debug('_exchange_positions {}'.format(self._exchange_positions))
 
-        self._sync_limit_orders_and_exchange_positions()
+        with self._metrics.span('sync_limit_orders_and_exchange_positions'):
+            self._sync_limit_orders_and_exchange_positions()
 
-        collateral = fetch_collateral(self._client, self._ccxt_account_type)
+        with self._metrics.span('fetch_collateral'):
+            collateral = fetch_collateral(self._client, self._ccxt_account_type)
         self._logger.info('collateral {}'.format(collateral))
-        markets = {market['symbol']: fix_market(market, self._client.id)
-                   for market in self._client.fetch_markets()}
-        self._fetch_models(collateral, markets)
-
-        target_positions = self._get_target_positions(collateral, markets)
-        self._sync_taker_positions(target_positions)
-        self._submit_limit_orders(markets)
+        with self._metrics.span('fetch_markets'):
+            markets = self._market_cache.get_markets()
+        with self._metrics.span('fetch_models'):
+            self._fetch_models(collateral, markets)
+
+        with self._metrics.span('get_target_positions'):
+            target_positions = self._get_target_positions(collateral, markets)
+        with self._metrics.span('sync_taker_positions'):
+            self._sync_taker_positions(target_positions)
+        with self._metrics.span('submit_limit_orders'):
+            self._submit_limit_orders(markets)
 
     def _sync_limit_orders_and_exchange_positions(self):
         df_current_pos = fetch_positions(self._client)
@@ -103,35 +174,53 @@ class BotMaker:
         self._logger.info('_sync_limit_orders')
 
         now = time.time()
-        position_changed = False
 
-        ccxt_symbols = set([self._symbol_to_ccxt_symbol(x.symbol) for x in self._limit_orders])
-        self._logger.info('fetch_open_orders ccxt_symbols {}'.format(ccxt_symbols))
-        exchange_orders = []
-        for ccxt_symbol in ccxt_symbols:
-            exchange_orders += self._client.fetch_open_orders(ccxt_symbol)
+        ccxt_symbols = set([self._symbol_to_ccxt_symbol(x) for x in self._limit_orders.symbols()])
+        exchange_orders = self._fetch_open_orders(ccxt_symbols)
+        found_orders = self._fetch_order_history(self._closed_orders(exchange_orders, {}))
+        for order in self._closed_orders(exchange_orders, found_orders):
+            found_orders[order.exchange_order_id] = self._fetch_order(order)
+
+        position_changed, cancels = self._apply_exchange_orders(exchange_orders, found_orders, now)
+        for exchange_order_id, ccxt_symbol in cancels:
+            self._client.cancel_order(exchange_order_id, symbol=ccxt_symbol)
 
-        for i in range(len(self._limit_orders))[::-1]:
-            order = self._limit_orders[i]
+        return position_changed
+
+    def _closed_orders(self, exchange_orders, found_orders):
+        # submitted orders not in open orders
+        return [
+            order for order in reversed(self._limit_orders)
+            if order.exchange_order_id is not None
+            and order.exchange_order_id not in exchange_orders
+            and order.exchange_order_id not in found_orders
+        ]
+
+    def _fetch_order(self, order):
+        try:
+            return self._client.fetch_order(order.exchange_order_id, symbol=self._symbol_to_ccxt_symbol(order.symbol))
+        except OrderNotFound as e:
+            self._logger.warn('order not found {} {}'.format(order, e))
+            return None
+
+    def _apply_exchange_orders(self, exchange_orders, found_orders, now):
+        position_changed = False
+        cancels = []
+
+        for order in reversed(self._limit_orders):
             ccxt_symbol = self._symbol_to_ccxt_symbol(order.symbol)
 
             if order.exchange_order_id is None:
                 self._logger.info('order not submitted. skip {}'.format(order))
                 continue
 
-            exchange_order = None
-            for exchange_order2 in exchange_orders:
-                if exchange_order2['id'] == order.exchange_order_id:
-                    exchange_order = exchange_order2
-                    exchange_orders.remove(exchange_order2)
-                    break
+            exchange_order = exchange_orders.pop(order.exchange_order_id, None)
             if exchange_order is None:
-                try:
-                    exchange_order = self._client.fetch_order(order.exchange_order_id, symbol=ccxt_symbol)
-                except OrderNotFound as e:
-                    self._logger.warn('order not found. remove {} {}'.format(order, e))
-                    self._limit_orders.pop(i)
-                    continue
+                exchange_order = found_orders.get(order.exchange_order_id)
+            if exchange_order is None:
+                self._logger.warn('order not found. remove {}'.format(order))
+                self._limit_orders.remove(order)
+                continue
 
             signed_executed = (exchange_order['filled'] - order.executed_amount) * order.side_int()
             self._exchange_positions[order.symbol] += signed_executed
@@ -144,91 +233,162 @@ class BotMaker:
 
             if status == 'open' and order.expired(now):
                 self._logger.info('order expired. cancel order {}'.format(order))
-                self._client.cancel_order(order.exchange_order_id, symbol=ccxt_symbol)
+                cancels.append((order.exchange_order_id, ccxt_symbol))
 
             if status != 'open' and order.get_position(now) == 0:
                 self._logger.info('order exited. remove {}'.format(order))
-                self._limit_orders.pop(i)
+                self._limit_orders.remove(order)
 
-        for exchange_order in exchange_orders:
+        for exchange_order in exchange_orders.values():
             self._logger.info('cancel unknown order {}'.format(exchange_order['id']))
-            self._client.cancel_order(exchange_order['id'], symbol=exchange_order['symbol'])
+            cancels.append((exchange_order['id'], exchange_order['symbol']))
 
-        return position_changed
+        return position_changed, cancels
+
+    def _fetch_open_orders(self, ccxt_symbols):
+        exchange_orders = {}
+        if len(ccxt_symbols) == 0:
+            return exchange_orders
+
+        if self._order_sync_mode == 'account':
+            self._logger.info('fetch_open_orders all symbols')
+            for exchange_order in self._client.fetch_open_orders():
+                # keep untracked symbols untouched like the per-symbol mode
+                if exchange_order['symbol'] in ccxt_symbols:
+                    exchange_orders[exchange_order['id']] = exchange_order
+        else:
+            self._logger.info('fetch_open_orders ccxt_symbols {}'.format(ccxt_symbols))
+            for ccxt_symbol in ccxt_symbols:
+                for exchange_order in self._client.fetch_open_orders(ccxt_symbol):
+                    exchange_orders[exchange_order['id']] = exchange_order
+        return exchange_orders
+
+    def _fetch_order_history(self, orders):
+        # orders not found here are fetched one by one with fetch_order
+        if self._order_sync_mode != 'account' or not self._bulk_order_history_supported:
+            return {}
+        if len(orders) == 0:
+            return {}
+
+        found_orders = {}
+        for ccxt_symbol, since in self._order_history_requests(orders):
+            self._logger.info('fetch order history {} since {}'.format(ccxt_symbol, since))
+            try:
+                with self._api_accounting.non_critical():
+                    if self._client.has.get('fetchOrders'):
+                        exchange_orders = self._client.fetch_orders(symbol=ccxt_symbol, since=since)
+                    else:
+                        exchange_orders = self._client.fetch_closed_orders(symbol=ccxt_symbol, since=since)
+            except ApiBudgetExceeded as e:
+                # the rest is fetched one by one with fetch_order
+                self._logger.info('order history deferred {}'.format(e))
+                return found_orders
+            except (ArgumentsRequired, NotSupported) as e:
+                if self._order_history_unsupported(ccxt_symbol, e):
+                    return self._fetch_order_history(orders)
+                return found_orders
+            for x in exchange_orders:
+                found_orders[x['id']] = x
+        return found_orders
+
+    def _order_history_requests(self, orders):
+        # (ccxt_symbol, since) of history calls. one call per symbol
+        # of the orders when the exchange needs a symbol (binance)
+        if not self._order_history_per_symbol:
+            return [(None, int(min(order.timestamp for order in orders) * 1000))]
+        since = {}
+        for order in orders:
+            ccxt_symbol = self._symbol_to_ccxt_symbol(order.symbol)
+            t = int(order.timestamp * 1000)
+            since[ccxt_symbol] = min(t, since.get(ccxt_symbol, t))
+        return sorted(since.items())
+
+    def _order_history_unsupported(self, ccxt_symbol, e):
+        # returns True when history is retried per symbol
+        if ccxt_symbol is None and isinstance(e, ArgumentsRequired):
+            self._logger.info('account wide order history needs a symbol. fetch per symbol {}'.format(e))
+            self._order_history_per_symbol = True
+            return True
+        self._logger.warn('bulk order history not supported. fallback to fetch_order {}'.format(e))
+        self._bulk_order_history_supported = False
+        return False
 
     def _force_sync_exchange_positions(self, df_current_pos):
         self._logger.info('force sync exchange positions')
         self._logger.info('df_current_pos {}'.format(df_current_pos))
         self._exchange_positions = defaultdict(float)
         for ccxt_symbol in df_current_pos.index:
-            self._exchange_positions[ccxt_symbol_to_symbol(ccxt_symbol)] = df_current_pos.loc[ccxt_symbol, 'position']
-
-    def _get_positions(self, now):
-        inactive_time = 24 * 60 * 60
-        if self._df_positions is None:
-            df = self._alphapool_client.get_positions(
-                min_timestamp=int(now - inactive_time),
-            )
-        else:
-            df = self._alphapool_client.get_positions(
-                min_timestamp=int(now - 60 * 60),
-            )
-            df = pd.concat([self._df_positions, df])
-            t = df.index.get_level_values('timestamp')
-            df = df.loc[t >= pd.to_datetime(now - inactive_time, unit='s', utc=True)]
-            df = df.loc[~df.index.duplicated(keep='last')]
-            df = df.sort_index()
-
-        self._df_positions = df.copy()
-        return df
+            self._exchange_positions[self._symbol_registry.to_symbol(ccxt_symbol)] = df_current_pos.loc[ccxt_symbol, 'position']
 
     def _fetch_models(self, collateral, markets):
         now = time.time()
+        self._positions_cache.update(now)
+        self._process_models(collateral, markets, now)
 
-        df = self._get_positions(now)
+    def _process_models(self, collateral, markets, now):
+        changed_model_ids, self._positions_version = self._positions_cache.changes(self._positions_version)
 
-        if df.shape[0] == 0:
-            self._logger.info('close all because df.shape[0] == 0')
+        if len(self._positions_cache) == 0:
+            self._logger.info('close all because positions cache is empty')
             self._positions = {}
+            self._portfolio_engine.clear()
             self._weights = {}
             return
 
-        df = df.loc[df.index.get_level_values('timestamp') <= pd.to_datetime(now, unit='s', utc=True)]
-        df = df.reset_index()
-        df = df.groupby('model_id').nth(-1)
+        latest_rows = self._positions_cache.latest_rows()
+        if markets is not self._models_markets:
+            # symbol filter depends on markets
+            changed_model_ids = set(latest_rows) | set(self._positions)
+            self._models_markets = markets
+        if len(changed_model_ids) == 0:
+            self._logger.info('no model updated. skip')
+            return
+        rows = [latest_rows[model_id] for model_id in sorted(changed_model_ids) if model_id in latest_rows]
 
-        def skip_symbol_not_exit(symbol):
-            ccxt_symbol = self._symbol_to_ccxt_symbol(symbol)
-            if ccxt_symbol not in markets:
-                self._logger.warn('symbol {} not exist. skip'.format(ccxt_symbol))
-                return True
-            return False
+        codec = self._positions_cache.codec
+        symbol_exists = self._symbol_exists_mask(markets)
 
-        if self._model_id in df.index:
-            new_weights = df.loc[self._model_id, 'weights']
-        else:
-            new_weights = {}
-        if self._weights != new_weights:
-            self._logger.info('weight updated {}'.format(new_weights))
-            self._weights = new_weights
+        def warn_symbols_not_exist(symbol_ids):
+            for symbol in codec.symbols.values(symbol_ids):
+                if symbol not in self._warned_symbols:
+                    self._warned_symbols.add(symbol)
+                    self._logger.warn('symbol {} not exist. skip'.format(self._symbol_to_ccxt_symbol(symbol)))
+
+        if self._model_id in changed_model_ids:
+            if self._model_id in latest_rows:
+                new_weights = codec.to_dict(latest_rows[self._model_id].weights, codec.model_ids)
+            else:
+                new_weights = {}
+            if self._weights != new_weights:
+                self._logger.info('weight updated {}'.format(new_weights))
+                self._weights = new_weights
 
         # process positions
-        new_positions = {}
-        for row in df.itertuples():
-            model_id = row.Index
-            new_positions[model_id] = {}
-            for symbol in row.positions:
-                if skip_symbol_not_exit(symbol):
-                    continue
-                new_positions[model_id][symbol] = row.positions[symbol]
-        if self._positions != new_positions:
-            self._logger.info('position updated {}'.format(new_positions))
-            self._positions = new_positions
+        updated_positions = {}
+        for model_id in sorted(changed_model_ids):
+            if model_id not in latest_rows:
+                if model_id in self._positions:
+                    self._logger.info('model expired {}'.format(model_id))
+                    del self._positions[model_id]
+                    self._portfolio_engine.remove_model(model_id)
+                continue
+            positions = latest_rows[model_id].positions
+            exists = symbol_exists[positions['id']]
+            warn_symbols_not_exist(positions['id'][~exists])
+            symbol_ids = positions['id'][exists]
+            values = positions['value'][exists]
+            new_positions = dict(zip(codec.symbols.values(symbol_ids), values.tolist()))
+            if self._positions.get(model_id) != new_positions:
+                updated_positions[model_id] = new_positions
+                self._positions[model_id] = new_positions
+                self._portfolio_engine.update_model_ids(model_id, symbol_ids, values)
+        if len(updated_positions) > 0:
+            self._logger.info('position updated {}'.format(updated_positions))
 
         # process orders
         limit_order_amounts = defaultdict(float)
-        for row in df.itertuples():
-            model_id = row.Index
+        for row in rows:
+            model_id = row.model_id
             timestamp = row.timestamp
             if (timestamp, model_id) in self._order_processed_rows:
                 continue
@@ -239,26 +399,33 @@ class BotMaker:
                 self._logger.info('too old order. skip')
                 continue
 
-            for symbol in row.orders:
-                if skip_symbol_not_exit(symbol):
-                    continue
-                for order in row.orders[symbol]:
-                    weight = self._weights.get(model_id, 0.0)
-                    key = (timestamp.timestamp(), symbol, order['price'], order['is_buy'], order['duration'])
-                    unit_pos = collateral / order['price']
-                    limit_order_amounts[key] += amount_to_exchange_amount(
-                        amount=order['amount'] * weight,
-                        leverage=self._leverage,
-                        unit_pos=unit_pos,
-                        market=markets[self._symbol_to_ccxt_symbol(symbol)]
-                    )
+            orders = row.orders
+            exists = symbol_exists[orders['symbol_id']]
+            warn_symbols_not_exist(np.unique(orders['symbol_id'][~exists]))
+            orders = orders[exists]
+            weight = self._weights.get(model_id, 0.0)
+            for symbol, price, amount, is_buy, duration in zip(
+                codec.symbols.values(orders['symbol_id']),
+                orders['price'].tolist(),
+                orders['amount'].tolist(),
+                orders['is_buy'].tolist(),
+                orders['duration'].tolist(),
+            ):
+                key = (timestamp.timestamp(), symbol, price, is_buy, duration)
+                unit_pos = collateral / price
+                limit_order_amounts[key] += amount_to_exchange_amount(
+                    amount=amount * weight,
+                    leverage=self._leverage,
+                    unit_pos=unit_pos,
+                    market=markets[self._symbol_to_ccxt_symbol(symbol)]
+                )
 
         for key in limit_order_amounts:
             amount = limit_order_amounts[key]
             if amount == 0:
                 continue
             self._logger.info('limit order added {} {}'.format(key, amount))
-            self._limit_orders.append(Order(
+            self._limit_orders.add(Order(
                 timestamp=key[0],
                 symbol=key[1],
                 price=key[2],
@@ -270,8 +437,34 @@ class BotMaker:
                 exchange_order_id=None,
             ))
 
+    def _symbol_exists_mask(self, markets):
+        # markets membership per interned symbol id. extended as symbols are interned
+        symbols = self._positions_cache.codec.symbols
+        if markets is not self._symbol_exists_markets:
+            self._symbol_registry = self._market_cache.get_symbol_registry(markets)
+            self._symbol_exists = np.zeros(0, dtype=bool)
+            self._symbol_exists_markets = markets
+            # missing symbols are logged once per markets load
+            self._warned_symbols = set()
+        n = len(self._symbol_exists)
+        if n < len(symbols):
+            added = [
+                self._symbol_registry.exists(x)
+                for x in symbols.values(range(n, len(symbols)))
+            ]
+            self._symbol_exists = np.concatenate([self._symbol_exists, np.array(added, dtype=bool)])
+        return self._symbol_exists
+
     def _sync_taker_positions(self, target_positions):
+        for exchange_order_id, ccxt_symbol in self._update_taker_orders(target_positions):
+            try:
+                self._client.cancel_order(exchange_order_id, symbol=ccxt_symbol)
+            except OrderNotFound as e:
+                self._logger.warn('order not found. probably already executed. skip {} {}'.format(exchange_order_id, e))
+
+    def _update_taker_orders(self, target_positions):
         now = time.time()
+        cancels = []
         self._logger.info('_sync_taker_positions')
         self._logger.info('target_positions {}'.format(target_positions))
 
@@ -293,22 +486,15 @@ class BotMaker:
             if reduce_only:
                 signed_amount = np.sign(signed_amount) * min(np.abs(signed_amount), np.abs(cur_pos))
 
-            for order in list(self._limit_orders):
-                if not (order.symbol == symbol and order.price is None):
-                    continue
-
+            for order in self._limit_orders.takers(symbol):
                 if order.exchange_order_id is None:
                     self._logger.info('remove old order {}'.format(order))
                     self._limit_orders.remove(order)
                 else:
                     self._logger.info('cancel old order {}'.format(order))
-                    ccxt_symbol = self._symbol_to_ccxt_symbol(order.symbol)
-                    try:
-                        self._client.cancel_order(order.exchange_order_id, symbol=ccxt_symbol)
-                    except OrderNotFound as e:
-                        self._logger.warn('order not found. probably already executed. skip {} {}'.format(order, e))
+                    cancels.append((order.exchange_order_id, self._symbol_to_ccxt_symbol(order.symbol)))
 
-            self._limit_orders.append(Order(
+            self._limit_orders.add(Order(
                 timestamp=now,
                 symbol=symbol,
                 price=None,
@@ -320,38 +506,107 @@ class BotMaker:
                 exchange_order_id=None,
             ))
 
-    def _submit_limit_orders(self, markets):
-        for i in range(len(self._limit_orders))[::-1]:
-            order = self._limit_orders[i]
-
-            if order.exchange_order_id is not None:
-                continue
+        return cancels
 
+    def _submit_limit_orders(self, markets):
+        def submit(order):
             ccxt_symbol = self._symbol_to_ccxt_symbol(order.symbol)
-            res = self._create_order(
+            return self._create_order(
                 market=markets[ccxt_symbol],
                 signed_amount=order.side_int() * order.amount,
                 price=order.price,
                 reduce_only=order.reduce_only,
             )
+
+        orders = self._limit_orders.unsubmitted()
+        self._order_book_provider.subscribe(set(
+            self._symbol_to_ccxt_symbol(order.symbol) for order in orders
+        ))
+
+        # apply results after all submissions finished
+        # so that created orders are tracked even if some of them failed
+        results = []
+        if self._order_executor is None:
+            for order in reversed(orders):
+                try:
+                    results.append((order, submit(order)))
+                except Exception as e:
+                    results.append((order, e))
+        else:
+            futures = [
+                (order, self._order_executor.submit(submit, order))
+                for order in reversed(orders)
+            ]
+            for order, future in futures:
+                try:
+                    results.append((order, future.result()))
+                except Exception as e:
+                    results.append((order, e))
+        self._apply_create_order_results(results)
+
+    def _order_client(self):
+        # client of the current submission thread
+        if self._order_executor is None:
+            return self._client
+        client = getattr(self._order_clients, 'client', None)
+        if client is None:
+            client = self._order_client_factory()
+            # markets of the shared cache. otherwise each client loads them with fetch_markets
+            client.set_markets(self._market_cache.get_ccxt_markets())
+            self._order_clients.client = client
+        return client
+
+    def _apply_create_order_results(self, results):
+        error = None
+        created = 0
+        for order, res in results:
+            if isinstance(res, (ApiBudgetExceeded, QuoteUnavailable)):
+                # kept unsubmitted. retried next step
+                self._logger.info('create order deferred {} {}'.format(order, res))
+                continue
+            if isinstance(res, Exception):
+                self._logger.error('create order failed {} {}'.format(order, res))
+                if error is None:
+                    error = res
+                continue
             if res is None:
                 self._logger.info('remove skipped order {}'.format(order))
-                self._limit_orders.pop(i)
+                self._limit_orders.remove(order)
             else:
-                order.exchange_order_id = res['id']
+                self._limit_orders.set_exchange_order_id(order, res['id'])
+                created += 1
+
+        self._metrics.observe('orders_per_step', created)
+        self._metrics.set_gauge('orders_last_step', created)
+        if error is not None:
+            raise error
 
     def _create_order(self, market=None, signed_amount=None, price=None, reduce_only=False):
-        time.sleep(self._order_interval)
+        self._order_rate_limiter.acquire()
 
-        symbol = market['symbol']
+        client = self._order_client()
+        quote = self._order_book_provider.get_quote(market.ccxt_symbol, client=client)
+        request = self._create_order_request(market, signed_amount, price, reduce_only, quote)
+        if request is None:
+            return None
+
+        self._ensure_leverage(market, MAX_LEVERAGE, client=client)
+
+        res = client.create_order(*request)
+        self._logger.info('order created {}'.format(res))
+        return res
+
+    def _create_order_request(self, market, signed_amount, price, reduce_only, quote):
+        symbol = market.ccxt_symbol
         params = {}
         order_type = 'limit'
 
         use_bbo = price is None and self._client.id == 'binance'
 
-        ob = self._client.fetch_order_book(symbol=symbol)
-        best_ask = ob['asks'][0][0]
-        best_bid = ob['bids'][0][0]
+        if quote is None:
+            raise QuoteUnavailable('order book not available {}'.format(symbol))
+        best_ask = quote.best_ask
+        best_bid = quote.best_bid
 
         if price is None:
             price = best_ask if signed_amount < 0 else best_bid
@@ -361,10 +616,9 @@ class BotMaker:
             else:
                 price = min(best_bid, price)
 
-        signed_amount = normalize_amount(
+        signed_amount = market.normalize_amount(
             signed_amount,
             price=price,
-            market=market,
             reduce_only=reduce_only,
         )
         if signed_amount == 0:
@@ -390,15 +644,13 @@ class BotMaker:
         else:
             raise Exception(f'set postonly and reduceonly, not implemented {self._client.id}')
 
-        self._ensure_leverage(market, MAX_LEVERAGE)
-
         self._logger.info('create_order symbol {} signed_amount {} price {} params {}'.format(
             symbol, signed_amount, price, params
         ))
         amount = np.abs(signed_amount)
         if self._client.id == 'bitflyer':
             amount = '{:.8f}'.format(amount)
-        res = self._client.create_order(
+        return (
             symbol,
             order_type,
             'sell' if signed_amount < 0 else 'buy',
@@ -406,10 +658,8 @@ class BotMaker:
             None if use_bbo else price,
             params
         )
-        self._logger.info('order created {}'.format(res))
-        return res
 
-    def _ensure_leverage(self, market, leverage):
+    def _ensure_leverage(self, market, leverage, client=None):
         skipped_exchanges = [
             'bitflyer',
         ]
@@ -417,14 +667,16 @@ class BotMaker:
             self._logger.info(f'{self._client.id} _ensure_leverage skip')
             return
 
-        symbol = market['symbol']
-        if symbol in self._leverage_set:
-            return
-        self._logger.info('set_leverage symbol {} leverage {}'.format(
-            symbol, leverage
-        ))
-        set_leverage(self._client, market, leverage, logger=self._logger)
-        self._leverage_set.add(symbol)
+        symbol = market.ccxt_symbol
+        with self._leverage_lock:
+            if symbol in self._leverage_set:
+                return
+            self._logger.info('set_leverage symbol {} leverage {}'.format(
+                symbol, leverage
+            ))
+            # critical. the order must not be placed with the leverage the account happens to have
+            set_leverage(self._client if client is None else client, market, leverage, logger=self._logger)
+            self._leverage_set.add(symbol)
 
     def _remove_old_data(self):
         now = time.time()
@@ -433,34 +685,44 @@ class BotMaker:
         )
 
     def _get_target_positions(self, collateral, markets):
+        symbols, amounts, ccxt_symbols = self._aggregate_target_positions()
+        self._price_snapshot.fetch(ccxt_symbols)
+        return self._to_target_positions(collateral, markets, symbols, amounts)
+
+    def _aggregate_target_positions(self):
+        # returns ccxt symbols of non-zero targets which need prices
+        symbols, amounts = self._portfolio_engine.aggregate(self._weights)
+        ccxt_symbols = [self._symbol_to_ccxt_symbol(symbols[i]) for i in np.nonzero(amounts)[0]]
+        self._order_book_provider.subscribe(ccxt_symbols)
+        return symbols, amounts, ccxt_symbols
+
+    def _to_target_positions(self, collateral, markets, symbols, amounts):
         now = time.time()
-        target_positions = defaultdict(float)
-        for model_id in self._weights:
-            positions = self._positions.get(model_id, {})
-            for symbol in positions:
-                target_positions[symbol] += self._weights[model_id] * positions[symbol]
-
-        for symbol in target_positions:
-            if target_positions[symbol] == 0:
-                continue
-            ticker = self._client.fetch_ticker(self._symbol_to_ccxt_symbol(symbol))
+        self._logger.info('price snapshot age {}'.format(self._price_snapshot.age()))
 
-            unit_pos = collateral / ticker['last']
-            unit_pos = self._unit_pos_smoother.step(symbol, unit_pos)
-
-            target_positions[symbol] = amount_to_exchange_amount(
-                amount=target_positions[symbol],
-                leverage=self._leverage,
-                unit_pos=unit_pos,
-                market=markets[self._symbol_to_ccxt_symbol(symbol)]
-            )
+        indices = np.nonzero(amounts)[0]
+        ccxt_symbols = [self._symbol_to_ccxt_symbol(symbols[i]) for i in indices]
+        unit_pos = self._unit_pos_smoother.step_many(
+            [symbols[i] for i in indices],
+            collateral / np.array([self._price_snapshot.get_price(x) for x in ccxt_symbols]),
+        )
+        # persisted once per step instead of per symbol
+        self._unit_pos_smoother.flush()
+        contract_size = np.array([markets[x].contract_size for x in ccxt_symbols])
+        amounts[indices] = to_exchange_amounts(
+            amounts[indices],
+            leverage=self._leverage,
+            unit_pos=unit_pos,
+            contract_size=contract_size,
+        )
+        target_positions = defaultdict(float, zip(symbols, amounts.tolist()))
 
-        for order in self._limit_orders:
+        for order in self._limit_orders.makers():
             target_positions[order.symbol] += order.side_int() * order.get_position(now)
         return target_positions
 
     def _symbol_to_ccxt_symbol(self, symbol):
-        return symbol_to_ccxt_symbol(symbol, self._client.id)
+        return self._symbol_registry.to_ccxt(symbol)
 
 
 @dataclasses.dataclass
@@ -500,15 +762,7 @@ def order_is_old(now, timestamp):
 
 
 def amount_to_exchange_amount(amount, leverage, unit_pos, market):
-    return amount * leverage * unit_pos / market['contractSize']
-
-
-def fix_market(market, exchange):
-    if exchange == 'bitflyer':
-        market['limits']['amount']['min'] = 0.01
-        market['precision'] = {'amount': 0.00000001, 'price': 1.0}
-        market['contractSize'] = 1.0
-    return market
+    return amount * leverage * unit_pos / market.contract_size
 
 
 def use_reduce_only(signed_amount, cur_pos, exchange):
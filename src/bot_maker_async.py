@@ -0,0 +1,238 @@
+import asyncio
+import time
+import traceback
+from ccxt.base.errors import OrderNotFound, ArgumentsRequired, NotSupported
+from .utils import (
+    fetch_positions_async,
+    fetch_collateral_async,
+    set_leverage_async,
+)
+from .bot_maker import BotMaker, MAX_LEVERAGE
+from .api_accounting import ApiBudgetExceeded
+
+
+class AsyncBotMaker(BotMaker):
+    # same strategy as BotMaker on a ccxt.async_support client.
+    # independent requests of a step are issued concurrently.
+    def __init__(self, order_concurrency=4, **kwargs):
+        super().__init__(order_concurrency=order_concurrency, **kwargs)
+        self._order_concurrency = order_concurrency
+        self._leverage_lock_async = None
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        try:
+            while True:
+                await self.tick_async()
+                await asyncio.to_thread(self._loop_scheduler.wait)
+        finally:
+            await self._client.close()
+
+    async def tick_async(self):
+        try:
+            if not self._initialized:
+                self._initialize()
+                self._initialized = True
+
+            self._api_accounting.begin_loop()
+            try:
+                with self._metrics.span('step'):
+                    await self._step_async()
+            finally:
+                self._api_accounting.log_summary()
+            self._health_check_ping()
+        except Exception as e:
+            self._logger.error(e)
+            self._logger.error(traceback.format_exc())
+
+        self._remove_old_data()
+
+    async def _step_async(self):
+        self._logger.debug('_positions {}'.format(self._positions))
+        self._logger.debug('_weights {}'.format(self._weights))
+        self._logger.debug('_limit_orders {}'.format(self._limit_orders))
+        self._logger.debug('_exchange_positions {}'.format(self._exchange_positions))
+
+        now = time.time()
+        _, collateral, markets, _ = await asyncio.gather(
+            self._timed('sync_limit_orders_and_exchange_positions', self._sync_limit_orders_and_exchange_positions_async()),
+            self._timed('fetch_collateral', fetch_collateral_async(self._client, self._ccxt_account_type)),
+            self._timed('fetch_markets', self._market_cache.get_markets_async()),
+            # alphapool client is sync
+            self._timed('fetch_models', asyncio.to_thread(self._positions_cache.update, now)),
+        )
+        self._logger.info('collateral {}'.format(collateral))
+        with self._metrics.span('process_models'):
+            self._process_models(collateral, markets, now)
+
+        target_positions = await self._timed('get_target_positions', self._get_target_positions_async(collateral, markets))
+        await self._timed('sync_taker_positions', self._sync_taker_positions_async(target_positions))
+        await self._timed('submit_limit_orders', self._submit_limit_orders_async(markets))
+
+    async def _timed(self, name, coro):
+        with self._metrics.span(name):
+            return await coro
+
+    async def _sync_limit_orders_and_exchange_positions_async(self):
+        # positions must be fetched before orders. see _sync_limit_orders_and_exchange_positions
+        df_current_pos = await fetch_positions_async(self._client)
+        df_current_pos = df_current_pos.loc[df_current_pos['position'] != 0]
+        position_changed = await self._sync_limit_orders_async()
+        if not position_changed:
+            self._force_sync_exchange_positions(df_current_pos)
+
+    async def _sync_limit_orders_async(self):
+        self._logger.info('_sync_limit_orders')
+
+        now = time.time()
+
+        ccxt_symbols = set([self._symbol_to_ccxt_symbol(x) for x in self._limit_orders.symbols()])
+        exchange_orders = await self._fetch_open_orders_async(ccxt_symbols)
+        found_orders = await self._fetch_order_history_async(self._closed_orders(exchange_orders, {}))
+        closed_orders = self._closed_orders(exchange_orders, found_orders)
+        for order, exchange_order in zip(closed_orders, await asyncio.gather(*[
+            self._fetch_order_async(order) for order in closed_orders
+        ])):
+            found_orders[order.exchange_order_id] = exchange_order
+
+        position_changed, cancels = self._apply_exchange_orders(exchange_orders, found_orders, now)
+        await asyncio.gather(*[
+            self._client.cancel_order(exchange_order_id, symbol=ccxt_symbol)
+            for exchange_order_id, ccxt_symbol in cancels
+        ])
+
+        return position_changed
+
+    async def _fetch_order_async(self, order):
+        try:
+            return await self._client.fetch_order(order.exchange_order_id, symbol=self._symbol_to_ccxt_symbol(order.symbol))
+        except OrderNotFound as e:
+            self._logger.warn('order not found {} {}'.format(order, e))
+            return None
+
+    async def _fetch_open_orders_async(self, ccxt_symbols):
+        exchange_orders = {}
+        if len(ccxt_symbols) == 0:
+            return exchange_orders
+
+        if self._order_sync_mode == 'account':
+            self._logger.info('fetch_open_orders all symbols')
+            for exchange_order in await self._client.fetch_open_orders():
+                if exchange_order['symbol'] in ccxt_symbols:
+                    exchange_orders[exchange_order['id']] = exchange_order
+        else:
+            self._logger.info('fetch_open_orders ccxt_symbols {}'.format(ccxt_symbols))
+            for res in await asyncio.gather(*[
+                self._client.fetch_open_orders(ccxt_symbol) for ccxt_symbol in ccxt_symbols
+            ]):
+                for exchange_order in res:
+                    exchange_orders[exchange_order['id']] = exchange_order
+        return exchange_orders
+
+    async def _fetch_order_history_async(self, orders):
+        if self._order_sync_mode != 'account' or not self._bulk_order_history_supported:
+            return {}
+        if len(orders) == 0:
+            return {}
+
+        found_orders = {}
+        for ccxt_symbol, since in self._order_history_requests(orders):
+            self._logger.info('fetch order history {} since {}'.format(ccxt_symbol, since))
+            try:
+                # context var is local to the task
+                with self._api_accounting.non_critical():
+                    if self._client.has.get('fetchOrders'):
+                        exchange_orders = await self._client.fetch_orders(symbol=ccxt_symbol, since=since)
+                    else:
+                        exchange_orders = await self._client.fetch_closed_orders(symbol=ccxt_symbol, since=since)
+            except ApiBudgetExceeded as e:
+                self._logger.info('order history deferred {}'.format(e))
+                return found_orders
+            except (ArgumentsRequired, NotSupported) as e:
+                if self._order_history_unsupported(ccxt_symbol, e):
+                    return await self._fetch_order_history_async(orders)
+                return found_orders
+            for x in exchange_orders:
+                found_orders[x['id']] = x
+        return found_orders
+
+    async def _sync_taker_positions_async(self, target_positions):
+        async def cancel(exchange_order_id, ccxt_symbol):
+            try:
+                await self._client.cancel_order(exchange_order_id, symbol=ccxt_symbol)
+            except OrderNotFound as e:
+                self._logger.warn('order not found. probably already executed. skip {} {}'.format(exchange_order_id, e))
+
+        await asyncio.gather(*[
+            cancel(exchange_order_id, ccxt_symbol)
+            for exchange_order_id, ccxt_symbol in self._update_taker_orders(target_positions)
+        ])
+
+    async def _submit_limit_orders_async(self, markets):
+        semaphore = asyncio.Semaphore(self._order_concurrency)
+
+        async def submit(order):
+            ccxt_symbol = self._symbol_to_ccxt_symbol(order.symbol)
+            async with semaphore:
+                return await self._create_order_async(
+                    market=markets[ccxt_symbol],
+                    signed_amount=order.side_int() * order.amount,
+                    price=order.price,
+                    reduce_only=order.reduce_only,
+                )
+
+        orders = list(reversed(self._limit_orders.unsubmitted()))
+        self._order_book_provider.subscribe(set(
+            self._symbol_to_ccxt_symbol(order.symbol) for order in orders
+        ))
+
+        results = await asyncio.gather(
+            *[submit(order) for order in orders],
+            return_exceptions=True,
+        )
+
+        self._apply_create_order_results(zip(orders, results))
+
+    async def _create_order_async(self, market=None, signed_amount=None, price=None, reduce_only=False):
+        await self._order_rate_limiter.acquire_async()
+
+        quote = await self._order_book_provider.get_quote_async(market.ccxt_symbol)
+        request = self._create_order_request(market, signed_amount, price, reduce_only, quote)
+        if request is None:
+            return None
+
+        await self._ensure_leverage_async(market, MAX_LEVERAGE)
+
+        res = await self._client.create_order(*request)
+        self._logger.info('order created {}'.format(res))
+        return res
+
+    async def _ensure_leverage_async(self, market, leverage):
+        skipped_exchanges = [
+            'bitflyer',
+        ]
+        if self._client.id in skipped_exchanges:
+            self._logger.info(f'{self._client.id} _ensure_leverage skip')
+            return
+
+        # created lazily to bind the running loop
+        if self._leverage_lock_async is None:
+            self._leverage_lock_async = asyncio.Lock()
+
+        symbol = market.ccxt_symbol
+        async with self._leverage_lock_async:
+            if symbol in self._leverage_set:
+                return
+            self._logger.info('set_leverage symbol {} leverage {}'.format(
+                symbol, leverage
+            ))
+            # critical. the order must not be placed with the leverage the account happens to have
+            await set_leverage_async(self._client, market, leverage, logger=self._logger)
+            self._leverage_set.add(symbol)
+
+    async def _get_target_positions_async(self, collateral, markets):
+        symbols, amounts, ccxt_symbols = self._aggregate_target_positions()
+        await self._price_snapshot.fetch_async(ccxt_symbols)
+        return self._to_target_positions(collateral, markets, symbols, amounts)
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import time
+import traceback
+from .loop_scheduler import LoopScheduler
+
+
+class BotScheduler:
+    # runs tick of many bots in one process on a shared loop.
+    # bots tick concurrently so that a slow exchange does not delay the others.
+    # a tick is waited for at most tick_timeout. a bot whose tick is still running
+    # is skipped until it returns, the others keep their schedule.
+    # a bot skipped for max_stuck_ticks ticks in a row is not recoverable in process
+    # (the thread can not be killed). the health check is not pinged any more so that
+    # the panic manager restarts the process
+    def __init__(self, bots=None, logger=None, loop_scheduler=None, positions_cache=None,
+                 tick_timeout=50, health_check_ping=None, max_stuck_ticks=None):
+        self._bots = bots
+        self._logger = logger
+        self._loop_scheduler = loop_scheduler
+        if self._loop_scheduler is None:
+            self._loop_scheduler = LoopScheduler(logger=logger)
+        # shared cache is fetched once here. updates by the bots in the same tick are skipped
+        self._positions_cache = positions_cache
+        self._tick_timeout = tick_timeout
+        # pinged when at least one bot finished its tick. the process exits only if all bots are stuck
+        self._health_check_ping = health_check_ping
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(bots)))
+        self._running = {}
+        self._max_stuck_ticks = max_stuck_ticks
+        self._stuck_ticks = [0] * len(bots)
+
+    def run(self):
+        while True:
+            self.tick()
+            self._loop_scheduler.wait()
+
+    def tick(self):
+        start = time.time()
+        if self._positions_cache is not None:
+            try:
+                self._positions_cache.update(start, force=True)
+            except Exception as e:
+                self._logger.error(e)
+                self._logger.error(traceback.format_exc())
+
+        futures = {}
+        for i, bot in enumerate(self._bots):
+            future = self._running.get(i)
+            if future is not None and not future.done():
+                self._stuck_ticks[i] += 1
+                self._logger.warn('bot {} tick still running. skip {}'.format(i, self._stuck_ticks[i]))
+                continue
+            self._stuck_ticks[i] = 0
+            futures[i] = self._executor.submit(bot.tick)
+        self._running.update(futures)
+
+        done, not_done = wait(list(futures.values()), timeout=self._tick_timeout)
+        for i, future in futures.items():
+            if future in not_done:
+                self._logger.error('bot {} tick timeout {}s. left running'.format(i, self._tick_timeout))
+                continue
+            # one bot must not stop the others
+            try:
+                future.result()
+            except Exception as e:
+                self._logger.error(e)
+                self._logger.error(traceback.format_exc())
+
+        stuck = [
+            i for i, count in enumerate(self._stuck_ticks)
+            if self._max_stuck_ticks is not None and count >= self._max_stuck_ticks
+        ]
+        if len(stuck) > 0:
+            self._logger.error('bots {} stuck for {} ticks. health check not pinged'.format(stuck, self._max_stuck_ticks))
+        elif len(done) > 0 and self._health_check_ping is not None:
+            self._health_check_ping()
+        self._logger.debug('scheduler tick {} bots {}s'.format(len(self._bots), time.time() - start))
@@ -0,0 +1,105 @@
+from collections import namedtuple
+import numpy as np
+
+# parallel id / value columns of positions (symbol ids) and weights (model ids)
+ENTRY_DTYPE = np.dtype([('id', np.int32), ('value', np.float64)])
+ORDER_DTYPE = np.dtype([
+    ('symbol_id', np.int32),
+    ('price', np.float64),
+    ('amount', np.float64),
+    ('is_buy', np.bool_),
+    ('duration', np.float64),
+])
+
+# alphapool row decoded once into interned arrays. RowCodec.decode returns the dict form
+CompactRow = namedtuple('CompactRow', ['timestamp', 'model_id', 'positions', 'weights', 'orders'])
+
+_empty_entries = np.zeros(0, dtype=ENTRY_DTYPE)
+_empty_orders = np.zeros(0, dtype=ORDER_DTYPE)
+_empty_entries.flags.writeable = False
+_empty_orders.flags.writeable = False
+
+
+class Interner:
+    # value <-> dense integer id. ids are never reused
+    def __init__(self):
+        self._values = []
+        self._ids = {}
+
+    def intern(self, value):
+        i = self._ids.get(value)
+        if i is None:
+            i = len(self._values)
+            self._ids[value] = i
+            self._values.append(value)
+        return i
+
+    def value(self, i):
+        return self._values[i]
+
+    def values(self, ids):
+        return [self._values[i] for i in ids]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class RowCodec:
+    def __init__(self):
+        self.symbols = Interner()
+        self.model_ids = Interner()
+
+    def encode(self, timestamp, model_id, positions, weights, orders):
+        return CompactRow(
+            timestamp,
+            self.model_ids.value(self.model_ids.intern(model_id)),
+            self._encode_entries(positions, self.symbols),
+            self._encode_entries(weights, self.model_ids),
+            self._encode_orders(orders),
+        )
+
+    def decode(self, row):
+        # dict form, for logs and tests
+        orders = {}
+        for x in row.orders:
+            orders.setdefault(self.symbols.value(x['symbol_id']), []).append({
+                'price': float(x['price']),
+                'amount': float(x['amount']),
+                'is_buy': bool(x['is_buy']),
+                'duration': float(x['duration']),
+            })
+        return CompactRow(
+            row.timestamp,
+            row.model_id,
+            self.to_dict(row.positions, self.symbols),
+            self.to_dict(row.weights, self.model_ids),
+            orders,
+        )
+
+    @staticmethod
+    def to_dict(entries, interner):
+        return dict(zip(interner.values(entries['id']), entries['value'].tolist()))
+
+    def _encode_entries(self, d, interner):
+        if len(d) == 0:
+            return _empty_entries
+        entries = np.empty(len(d), dtype=ENTRY_DTYPE)
+        entries['id'] = [interner.intern(x) for x in d]
+        entries['value'] = list(d.values())
+        return entries
+
+    def _encode_orders(self, orders):
+        rows = [
+            (self.symbols.intern(symbol), x['price'], x['amount'], x['is_buy'], x['duration'])
+            for symbol in orders
+            for x in orders[symbol]
+        ]
+        if len(rows) == 0:
+            return _empty_orders
+        return np.array(rows, dtype=ORDER_DTYPE)
+
+
+def rows_equal(a, b):
+    return (np.array_equal(a.positions, b.positions)
+            and np.array_equal(a.weights, b.weights)
+            and np.array_equal(a.orders, b.orders))
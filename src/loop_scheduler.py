@@ -0,0 +1,49 @@
+import math
+import time
+from .metrics import NullMetrics
+from .notifier import NullNotifier
+
+
+class LoopScheduler:
+    # wakes at absolute times k * interval + phase (unix time), so the cadence
+    # does not drift by the step duration. with interval 60 and phase 5 every wake
+    # is 5s after a minute boundary, including the 300s grid models publish on.
+    # a notification wakes early without moving the schedule.
+    # loop_lateness_seconds is the delay of grid wakes, loop_notify_latency_seconds
+    # the delay from the arrival of a notification
+    def __init__(self, interval=60, phase=0, notifier=None, logger=None, metrics=None):
+        self._interval = interval
+        self._phase = phase
+        self._notifier = NullNotifier() if notifier is None else notifier
+        self._logger = logger
+        self._metrics = NullMetrics() if metrics is None else metrics
+        self._next_at = None
+
+    def next_at(self, now):
+        # first wake strictly after now
+        return (math.floor((now - self._phase) / self._interval) + 1) * self._interval + self._phase
+
+    def wait(self):
+        # returns True when woken by a notification before the scheduled time
+        now = time.time()
+        if self._next_at is None:
+            self._next_at = self.next_at(now)
+
+        notified = self._notifier.wait(max(0.0, self._next_at - now))
+        now = time.time()
+        if notified:
+            # from the arrival of the notification (not its coalesce end) to the step
+            latency = now - self._notifier.notified_at
+            self._metrics.observe('loop_notify_latency_seconds', latency)
+            self._metrics.set_gauge('loop_notify_latency_seconds_last', latency)
+            self._logger.debug('loop notified latency {}'.format(latency))
+            if now < self._next_at:
+                return True
+
+        lateness = now - self._next_at
+        self._metrics.observe('loop_lateness_seconds', lateness)
+        self._metrics.set_gauge('loop_lateness_seconds_last', lateness)
+        self._logger.debug('loop scheduled at {} lateness {}'.format(self._next_at, lateness))
+        # slots missed by a long step are skipped
+        self._next_at = self.next_at(max(now, self._next_at))
+        return notified
@@ -1,4 +1,7 @@
+import atexit
 import os
+import ccxt
+import ccxt.async_support
 import dataset
 import tracemalloc
 from alphapool import Client
@@ -7,33 +10,68 @@ from .utils import (
 )
 from .logger import create_logger
 from .bot_maker import BotMaker
+from .bot_maker_async import AsyncBotMaker
 from .alphapool_mock import MockClient
+from .alphapool_query import (
+    PortfolioPositionsClient,
+    DatasetRowsSource,
+    FrameRowsSource,
+)
 from .panic_manager import PanicManager
 from .stock.stock_client import StockClient
 from .stock.bot_stock import BotStock
 from .smoother import Smoother, NullSmoother
+from .market_cache import MarketCache
+from .positions_cache import PositionsCache
+from .bot_scheduler import BotScheduler
+from .notifier import NullNotifier, FileNotifier, PostgresNotifier
+from .loop_scheduler import LoopScheduler
+from .metrics import Metrics, NullMetrics
+from .api_accounting import ApiAccounting
+from .rate_limiter import get_token_bucket
+from .order_book import (
+    RestOrderBookProvider,
+    StreamOrderBookProvider,
+    CcxtProOrderBookFeed,
+)
+
+
+# never shared between accounts in multi account mode
+ACCOUNT_ONLY_ENVS = [
+    'CCXT_API_KEY',
+    'CCXT_API_SECRET',
+    'CCXT_API_PASSWORD',
+    'CCXT_SUBACCOUNT',
+]
+
+
+def getenv(name, account=None, default=None):
+    # NAME_<ACCOUNT> overrides NAME in multi account mode
+    if account is None:
+        return os.getenv(name, default)
+    value = os.getenv('{}_{}'.format(name, account.upper()))
+    if value is None and name not in ACCOUNT_ONLY_ENVS:
+        value = os.getenv(name, default)
+    return value
 
 
 def start():
-    exchange = os.getenv('CCXT_EXCHANGE')
-    api_key = os.getenv('CCXT_API_KEY')
-    api_secret = os.getenv('CCXT_API_SECRET')
-    api_password = os.getenv('CCXT_API_PASSWORD')
-    subaccount = os.getenv('CCXT_SUBACCOUNT')
-    account_type = os.getenv('CCXT_ACCOUNT_TYPE')
-    api_base_url = os.getenv('CCXT_API_BASE_URL') # for stock
-    leverage = float(os.getenv('ALPHAPOOL_LEVERAGE'))
     log_level = os.getenv('ALPHAPOOL_LOG_LEVEL')
-    model_id = os.getenv('ALPHAPOOL_MODEL_ID')
-    unit_pos_halflife = float(os.getenv('ALPHAPOOL_UNIT_POS_HALFLIFE', '0'))
-    unit_pos_reset_threshold = float(os.getenv('ALPHAPOOL_UNIT_POS_RESET_THRESHOLD', '0.1'))
+    metrics_port = int(os.getenv('ALPHAPOOL_METRICS_PORT', '0'))
+    accounts = os.getenv('ALPHAPOOL_ACCOUNTS')
+    positions_query = os.getenv('ALPHAPOOL_POSITIONS_QUERY', 'all')
+    notifier_type = os.getenv('ALPHAPOOL_NOTIFIER', 'null')
+    notify_coalesce = float(os.getenv('ALPHAPOOL_NOTIFY_COALESCE', '2'))
+    loop_phase = float(os.getenv('ALPHAPOOL_LOOP_PHASE', '5'))
+    # rows published later than overlap after newer rows are picked up
+    # by the late re-fetch every late_interval. later than late_overlap they are missed
+    positions_overlap = float(os.getenv('ALPHAPOOL_POSITIONS_OVERLAP', str(2 * 60)))
+    positions_late_overlap = float(os.getenv('ALPHAPOOL_POSITIONS_LATE_OVERLAP', str(60 * 60)))
+    positions_late_interval = float(os.getenv('ALPHAPOOL_POSITIONS_LATE_INTERVAL', str(15 * 60)))
 
     logger = create_logger(log_level)
 
     panic_manager = PanicManager(logger=logger)
-    panic_manager.register('bot', 5 * 60, 5 * 60)
-    def health_check_ping():
-        panic_manager.ping('bot')
 
     database_url = os.getenv("ALPHAPOOL_DATABASE_URL")
     if database_url == 'mock':
@@ -42,6 +80,152 @@ def start():
         db = dataset.connect(database_url)
         alphapool_client = Client(db)
 
+    if accounts is not None:
+        accounts = [x.strip() for x in accounts.split(',') if x.strip() != '']
+
+    if positions_query == 'portfolio' and getenv('CCXT_EXCHANGE') not in ['kabucom']:
+        # only rows of the portfolios and their models are fetched
+        if accounts is None:
+            portfolio_model_ids = [getenv('ALPHAPOOL_MODEL_ID')]
+        else:
+            portfolio_model_ids = [getenv('ALPHAPOOL_MODEL_ID', x) for x in accounts]
+        logger.info('alphapool query portfolio {}'.format(portfolio_model_ids))
+        if database_url == 'mock':
+            source = FrameRowsSource(alphapool_client=alphapool_client)
+        else:
+            source = DatasetRowsSource(table=db['positions'])
+        alphapool_client = PortfolioPositionsClient(
+            source=source,
+            portfolio_model_ids=portfolio_model_ids,
+            logger=logger,
+        )
+
+    if notifier_type == 'postgres':
+        # needs a trigger which calls pg_notify(channel, NEW.model_id) on insert
+        notifier = PostgresNotifier(
+            database_url=database_url,
+            channel=os.getenv('ALPHAPOOL_NOTIFY_CHANNEL', 'alphapool_positions'),
+            logger=logger,
+            coalesce=notify_coalesce,
+            is_relevant=getattr(alphapool_client, 'is_relevant', None),
+        )
+        notifier.start()
+    elif notifier_type == 'file':
+        notifier = FileNotifier(
+            path=os.getenv('ALPHAPOOL_NOTIFY_PATH'),
+            logger=logger,
+            coalesce=notify_coalesce,
+        )
+        notifier.start()
+    else:
+        notifier = NullNotifier()
+    logger.info('notifier {}'.format(notifier_type))
+
+    if metrics_port > 0:
+        metrics = Metrics(logger=logger)
+        metrics.start_server(metrics_port)
+    else:
+        metrics = NullMetrics()
+
+    # seconds after each minute boundary (models publish on the 5 minute grid)
+    loop_scheduler = LoopScheduler(
+        interval=60,
+        phase=loop_phase,
+        notifier=notifier,
+        logger=logger,
+        metrics=metrics,
+    )
+
+    if accounts is None:
+        bot = create_bot(
+            logger=logger,
+            panic_manager=panic_manager,
+            alphapool_client=alphapool_client,
+            metrics=metrics,
+            loop_scheduler=loop_scheduler,
+            positions_cache=PositionsCache(
+                alphapool_client=alphapool_client,
+                logger=logger,
+                overlap=positions_overlap,
+                late_overlap=positions_late_overlap,
+                late_interval=positions_late_interval,
+            ),
+        )
+        bot.run()
+        return
+
+    # one process runs a bot per account.
+    # alphapool rows are fetched once per loop and markets once per exchange
+    logger.info('multi account mode accounts {}'.format(accounts))
+    positions_cache = PositionsCache(
+        alphapool_client=alphapool_client,
+        logger=logger,
+        overlap=positions_overlap,
+        late_overlap=positions_late_overlap,
+        late_interval=positions_late_interval,
+        min_update_interval=30,
+    )
+    market_caches = {}
+    # a stuck account is skipped by the scheduler. the process exits when the scheduler stops
+    # or an account is stuck for ALPHAPOOL_MAX_STUCK_TICKS ticks
+    panic_manager.register('scheduler', 5 * 60, 5 * 60)
+    bots = [
+        create_bot(
+            logger=logger.getChild(account),
+            panic_manager=panic_manager,
+            alphapool_client=alphapool_client,
+            metrics=metrics,
+            account=account,
+            positions_cache=positions_cache,
+            market_caches=market_caches,
+        )
+        for account in accounts
+    ]
+    BotScheduler(
+        bots=bots,
+        logger=logger,
+        loop_scheduler=loop_scheduler,
+        positions_cache=positions_cache,
+        tick_timeout=float(os.getenv('ALPHAPOOL_TICK_TIMEOUT', '50')),
+        health_check_ping=lambda: panic_manager.ping('scheduler'),
+        max_stuck_ticks=int(os.getenv('ALPHAPOOL_MAX_STUCK_TICKS', '5')),
+    ).run()
+
+
+def create_bot(logger=None, panic_manager=None, alphapool_client=None, metrics=None,
+               account=None, positions_cache=None, market_caches=None, loop_scheduler=None):
+    exchange = getenv('CCXT_EXCHANGE', account)
+    api_key = getenv('CCXT_API_KEY', account)
+    api_secret = getenv('CCXT_API_SECRET', account)
+    api_password = getenv('CCXT_API_PASSWORD', account)
+    subaccount = getenv('CCXT_SUBACCOUNT', account)
+    account_type = getenv('CCXT_ACCOUNT_TYPE', account)
+    api_base_url = getenv('CCXT_API_BASE_URL', account) # for stock
+    leverage = float(getenv('ALPHAPOOL_LEVERAGE', account))
+    model_id = getenv('ALPHAPOOL_MODEL_ID', account)
+    unit_pos_halflife = float(getenv('ALPHAPOOL_UNIT_POS_HALFLIFE', account, '0'))
+    unit_pos_reset_threshold = float(getenv('ALPHAPOOL_UNIT_POS_RESET_THRESHOLD', account, '0.1'))
+    unit_pos_reset_scope = getenv('ALPHAPOOL_UNIT_POS_RESET_SCOPE', account, 'global')
+    market_cache_ttl = float(getenv('ALPHAPOOL_MARKET_CACHE_TTL', account, str(60 * 60)))
+    order_concurrency = int(getenv('ALPHAPOOL_ORDER_CONCURRENCY', account, '4'))
+    order_rate = float(getenv('ALPHAPOOL_ORDER_RATE', account, '4'))
+    order_book_stream = int(getenv('ALPHAPOOL_ORDER_BOOK_STREAM', account, '0'))
+    order_book_max_age = float(getenv('ALPHAPOOL_ORDER_BOOK_MAX_AGE', account, '5'))
+    order_sync_mode = getenv('ALPHAPOOL_ORDER_SYNC_MODE', account, 'symbol')
+    engine = getenv('ALPHAPOOL_ENGINE', account, 'sync')
+    api_budget = float(getenv('ALPHAPOOL_API_BUDGET', account, '0'))
+
+    if account is not None and (exchange in ['kabucom'] or engine == 'async'):
+        raise ValueError('multi account mode supports sync ccxt bots only. account {}'.format(account))
+
+    if account is not None:
+        metrics = metrics.with_labels({'account': account})
+
+    tag = 'bot' if account is None else 'bot.{}'.format(account)
+    panic_manager.register(tag, 5 * 60, 5 * 60, fatal=account is None)
+    def health_check_ping():
+        panic_manager.ping(tag)
+
     if exchange in ['kabucom']:
         client = StockClient(
             api_key=api_key,
@@ -51,7 +235,7 @@ def start():
             logger=logger,
         )
 
-        bot = BotStock(
+        return BotStock(
             client=client,
             logger=logger,
             leverage=leverage,
@@ -59,39 +243,112 @@ def start():
             model_id=model_id,
             health_check_ping=health_check_ping,
         )
-    else:
-        client = create_ccxt_client(
+
+    client = create_ccxt_client(
+        exchange=exchange,
+        api_key=api_key,
+        api_secret=api_secret,
+        api_password=api_password,
+        subaccount=subaccount,
+        ccxt_module=ccxt.async_support if engine == 'async' else ccxt,
+    )
+
+    api_accounting = ApiAccounting(
+        logger=logger,
+        budget=api_budget if api_budget > 0 else None,
+        metrics=metrics,
+    )
+    api_accounting.install(client)
+
+    def create_order_client():
+        # each order submission thread owns a client. ccxt sync clients are not thread safe
+        order_client = create_ccxt_client(
             exchange=exchange,
             api_key=api_key,
             api_secret=api_secret,
             api_password=api_password,
             subaccount=subaccount,
         )
+        return api_accounting.install(order_client)
 
-        if unit_pos_halflife > 0:
-            logger.info(f'unit_pos_smoother enabled halflife {unit_pos_halflife} reset_threshold {unit_pos_reset_threshold}')
-            unit_pos_smoother = Smoother(
-                logger=logger,
-                halflife=unit_pos_halflife,
-                reset_threshold=unit_pos_reset_threshold,
-                save_path='./unit_pos_smoother_states.json'
-            )
+    if market_caches is not None and exchange in market_caches:
+        # markets are the same for all accounts of an exchange
+        market_cache = market_caches[exchange]
+    else:
+        if engine == 'async':
+            # refreshed lazily on the loop of the bot client
+            market_client = client
         else:
-            logger.info('unit_pos_smoother disabled')
-            unit_pos_smoother = NullSmoother()
+            # refreshed by a background thread. the client is its own (not thread safe)
+            # and unauthenticated because markets are public and shared between accounts
+            market_client = create_ccxt_client(exchange=exchange)
+        market_cache = MarketCache(
+            client=market_client,
+            logger=logger,
+            ttl=market_cache_ttl,
+        )
+        if engine != 'async':
+            market_cache.start()
+        if market_caches is not None:
+            market_caches[exchange] = market_cache
 
-        bot = BotMaker(
-            client=client,
+    if order_book_stream != 0:
+        logger.info(f'order book stream enabled max_age {order_book_max_age}')
+        order_book_provider = StreamOrderBookProvider(
+            feed=CcxtProOrderBookFeed(exchange=exchange, logger=logger),
+            fallback=RestOrderBookProvider(client=client),
+            max_age=order_book_max_age,
             logger=logger,
-            leverage=leverage,
-            alphapool_client=alphapool_client,
-            model_id=model_id,
-            health_check_ping=health_check_ping,
-            unit_pos_smoother=unit_pos_smoother,
-            ccxt_account_type=account_type,
         )
+    else:
+        order_book_provider = RestOrderBookProvider(client=client)
+
+    if unit_pos_halflife > 0:
+        logger.info(f'unit_pos_smoother enabled halflife {unit_pos_halflife} reset_threshold {unit_pos_reset_threshold} reset_scope {unit_pos_reset_scope}')
+        if account is None:
+            save_path = './unit_pos_smoother_states.json'
+        else:
+            save_path = f'./unit_pos_smoother_states_{account}.json'
+        unit_pos_smoother = Smoother(
+            logger=logger,
+            halflife=unit_pos_halflife,
+            reset_threshold=unit_pos_reset_threshold,
+            save_path=save_path,
+            reset_scope=unit_pos_reset_scope,
+        )
+        atexit.register(unit_pos_smoother.close)
+    else:
+        logger.info('unit_pos_smoother disabled')
+        unit_pos_smoother = NullSmoother()
+
+    if engine == 'async':
+        logger.info('async engine enabled')
+        bot_class = AsyncBotMaker
+    else:
+        bot_class = BotMaker
 
-    bot.run()
+    return bot_class(
+        client=client,
+        logger=logger,
+        leverage=leverage,
+        alphapool_client=alphapool_client,
+        model_id=model_id,
+        health_check_ping=health_check_ping,
+        unit_pos_smoother=unit_pos_smoother,
+        ccxt_account_type=account_type,
+        market_cache=market_cache,
+        order_concurrency=order_concurrency,
+        order_rate=order_rate,
+        # per account. accounts have their own api keys and rate limits
+        order_rate_limiter=get_token_bucket((exchange, account), rate=order_rate),
+        order_book_provider=order_book_provider,
+        order_sync_mode=order_sync_mode,
+        positions_cache=positions_cache,
+        metrics=metrics,
+        api_accounting=api_accounting,
+        loop_scheduler=loop_scheduler,
+        order_client_factory=None if engine == 'async' else create_order_client,
+    )
 
 
 tracemalloc_enabled = int(os.getenv('TRACEMALLOC_ENABLED', 0))
@@ -0,0 +1,163 @@
+import dataclasses
+import threading
+import time
+import traceback
+from .symbol_registry import SymbolRegistry
+from .utils import normalize_amount_by_limits
+
+
+class MarketCache:
+    def __init__(self, client=None, logger=None, ttl=60 * 60, retry_interval=60):
+        self._client = client
+        self._logger = logger
+        self._ttl = ttl
+        self._retry_interval = retry_interval
+        self._lock = threading.Lock()
+        # serializes loads of the refresh thread and get_markets. the client is not thread safe
+        self._load_lock = threading.Lock()
+        self._markets = None
+        self._ccxt_markets = None
+        self._symbol_registry = SymbolRegistry(getattr(client, 'id', None))
+        self._updated_at = None
+        self._thread = None
+
+    def start(self):
+        # refresh in background. get_markets never blocks after the first load
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def get_markets(self):
+        with self._lock:
+            markets = self._markets
+            updated_at = self._updated_at
+
+        if markets is None:
+            return self._load(updated_at)
+        if self._thread is None and time.time() - updated_at > self._ttl:
+            return self._load(updated_at)
+        return markets
+
+    async def get_markets_async(self):
+        # for async clients. refreshed lazily because the background thread is sync
+        with self._lock:
+            markets = self._markets
+            updated_at = self._updated_at
+
+        if markets is None or time.time() - updated_at > self._ttl:
+            return await self.refresh_async()
+        return markets
+
+    def get_ccxt_markets(self):
+        # raw ccxt markets of the last load. for client.set_markets
+        self.get_markets()
+        with self._lock:
+            return self._ccxt_markets
+
+    def get_symbol_registry(self, markets=None):
+        # registry built with the markets. markets of an older load get their own
+        with self._lock:
+            if markets is None or markets is self._markets:
+                return self._symbol_registry
+        return SymbolRegistry(self._client.id, markets)
+
+    def refresh(self):
+        with self._load_lock:
+            return self._set_markets(self._client.fetch_markets())
+
+    def _load(self, updated_at):
+        # loaded once when callers race. a load finished while waiting is reused
+        with self._load_lock:
+            with self._lock:
+                if self._updated_at != updated_at:
+                    return self._markets
+            return self._set_markets(self._client.fetch_markets())
+
+    async def refresh_async(self):
+        return self._set_markets(await self._client.fetch_markets())
+
+    def _set_markets(self, raw_markets):
+        markets = build_market_index(raw_markets, self._client.id)
+        symbol_registry = SymbolRegistry(self._client.id, markets)
+        with self._lock:
+            self._markets = markets
+            self._ccxt_markets = raw_markets
+            self._symbol_registry = symbol_registry
+            self._updated_at = time.time()
+        self._logger.info('market cache refreshed {} markets'.format(len(markets)))
+        return markets
+
+    def _run(self):
+        while True:
+            with self._lock:
+                updated_at = self._updated_at
+
+            if updated_at is None:
+                wait = 0
+            else:
+                wait = updated_at + self._ttl - time.time()
+
+            if wait > 0:
+                time.sleep(wait)
+                continue
+
+            try:
+                self._load(updated_at)
+            except Exception as e:
+                self._logger.error(e)
+                self._logger.error(traceback.format_exc())
+                time.sleep(self._retry_interval)
+
+
+@dataclasses.dataclass(frozen=True)
+class MarketInfo:
+    ccxt_symbol: str
+    id: str
+    contract_size: float
+    amount_min: float
+    amount_max: float
+    cost_min: float
+    amount_precision: float
+    price_precision: float
+    max_leverage: float
+
+    @classmethod
+    def from_market(cls, market):
+        limits = market['limits']
+        return cls(
+            ccxt_symbol=market['symbol'],
+            id=market['id'],
+            contract_size=market['contractSize'],
+            amount_min=limits['amount'].get('min'),
+            amount_max=limits['amount'].get('max'),
+            cost_min=limits.get('cost', {}).get('min'),
+            amount_precision=market['precision']['amount'],
+            price_precision=market['precision'].get('price'),
+            max_leverage=limits.get('leverage', {}).get('max'),
+        )
+
+    def normalize_amount(self, x, price=None, reduce_only=False):
+        return normalize_amount_by_limits(
+            x,
+            price=price,
+            amount_min=self.amount_min,
+            amount_max=self.amount_max,
+            cost_min=self.cost_min,
+            precision=self.amount_precision,
+            reduce_only=reduce_only,
+        )
+
+
+def build_market_index(markets, exchange):
+    index = {}
+    for market in markets:
+        market = fix_market(market, exchange)
+        index[market['symbol']] = MarketInfo.from_market(market)
+    return index
+
+
+def fix_market(market, exchange):
+    if exchange == 'bitflyer':
+        market['limits']['amount']['min'] = 0.01
+        market['precision'] = {'amount': 0.00000001, 'price': 1.0}
+        market['contractSize'] = 1.0
+    return market
@@ -0,0 +1,154 @@
+from collections import deque
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+import numpy as np
+
+QUANTILES = [0.5, 0.9, 0.99]
+
+
+class NullMetrics:
+    def span(self, name):
+        return contextlib.nullcontext()
+
+    def observe(self, name, value, labels=None):
+        pass
+
+    def set_gauge(self, name, value, labels=None):
+        pass
+
+    def render(self):
+        return ''
+
+    def with_labels(self, labels):
+        return self
+
+
+class Metrics:
+    # in-process metrics served as prometheus text.
+    # observations are rolling summaries over the last `window` values.
+    def __init__(self, logger=None, window=1000):
+        self._logger = logger
+        self._window = window
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._gauges = {}
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('step_phase_seconds', time.perf_counter() - start, labels={'phase': name})
+
+    def observe(self, name, value, labels=None):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = {'values': deque(maxlen=self._window), 'sum': 0.0, 'count': 0}
+                self._summaries[key] = summary
+            summary['values'].append(value)
+            summary['sum'] += value
+            summary['count'] += 1
+
+    def set_gauge(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[(name, _labels_key(labels))] = value
+
+    def render(self):
+        with self._lock:
+            summaries = {
+                key: (np.array(x['values']), x['sum'], x['count'])
+                for key, x in self._summaries.items()
+            }
+            gauges = dict(self._gauges)
+
+        lines = []
+        typed = set()
+        for (name, labels), (values, total, count) in sorted(summaries.items()):
+            name = 'alphapool_' + name
+            if name not in typed:
+                lines.append('# TYPE {} summary'.format(name))
+                typed.add(name)
+            for q, v in zip(QUANTILES, np.quantile(values, QUANTILES)):
+                lines.append('{}{} {}'.format(name, _format_labels(labels + (('quantile', str(q)),)), v))
+            lines.append('{}_sum{} {}'.format(name, _format_labels(labels), total))
+            lines.append('{}_count{} {}'.format(name, _format_labels(labels), count))
+        for (name, labels), value in sorted(gauges.items()):
+            name = 'alphapool_' + name
+            if name not in typed:
+                lines.append('# TYPE {} gauge'.format(name))
+                typed.add(name)
+            lines.append('{}{} {}'.format(name, _format_labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+    def with_labels(self, labels):
+        return LabeledMetrics(self, labels)
+
+    def start_server(self, port, host=''):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self._logger.info('metrics server started port {}'.format(server.server_address[1]))
+        return server
+
+
+class LabeledMetrics:
+    # adds labels (e.g. account) to every observation of a shared Metrics
+    def __init__(self, metrics, labels):
+        self._metrics = metrics
+        self._labels = dict(labels)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('step_phase_seconds', time.perf_counter() - start, labels={'phase': name})
+
+    def observe(self, name, value, labels=None):
+        self._metrics.observe(name, value, labels=self._merge(labels))
+
+    def set_gauge(self, name, value, labels=None):
+        self._metrics.set_gauge(name, value, labels=self._merge(labels))
+
+    def render(self):
+        return self._metrics.render()
+
+    def with_labels(self, labels):
+        return LabeledMetrics(self._metrics, self._merge(labels))
+
+    def _merge(self, labels):
+        if labels is None:
+            return self._labels
+        return {**self._labels, **labels}
+
+
+def _labels_key(labels):
+    if labels is None:
+        return ()
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if len(labels) == 0:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, v) for k, v in labels) + '}'
@@ -0,0 +1,129 @@
+import os
+import select
+import threading
+import time
+import traceback
+
+
+class NullNotifier:
+    # periodic loop only
+    notified_at = None
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return False
+
+
+class Notifier:
+    # wakes the loop before timeout when notified.
+    # notifications within coalesce seconds after the first one are merged
+    # so that a burst of published rows triggers a single step
+    def __init__(self, logger=None, coalesce=2.0):
+        self._logger = logger
+        self._coalesce = coalesce
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._first_at = None
+        # arrival time of the first notification of the last wake
+        self.notified_at = None
+
+    def notify(self):
+        with self._lock:
+            if self._first_at is None:
+                self._first_at = time.time()
+            self._event.set()
+
+    def wait(self, timeout):
+        # returns True when woken by a notification
+        if not self._event.wait(timeout):
+            return False
+        time.sleep(self._coalesce)
+        # the following step fetches all rows notified until here
+        with self._lock:
+            self._event.clear()
+            self.notified_at = self._first_at
+            self._first_at = None
+        self._logger.debug('notifier woken')
+        return True
+
+
+class FileNotifier(Notifier):
+    # notified when the file at path is modified (ex. touch). for tests and local runs
+    def __init__(self, path=None, logger=None, coalesce=2.0, poll_interval=0.5):
+        super().__init__(logger=logger, coalesce=coalesce)
+        self._path = path
+        self._poll_interval = poll_interval
+        self._mtime = self._get_mtime()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def poll(self):
+        mtime = self._get_mtime()
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self.notify()
+
+    def _get_mtime(self):
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _run(self):
+        while True:
+            self.poll()
+            time.sleep(self._poll_interval)
+
+
+class PostgresNotifier(Notifier):
+    # LISTEN on channel. payload is the model_id of the published row.
+    # is_relevant filters model_ids (None accepts all)
+    def __init__(self, database_url=None, channel='alphapool_positions', logger=None,
+                 coalesce=2.0, is_relevant=None, retry_interval=10):
+        super().__init__(logger=logger, coalesce=coalesce)
+        self._database_url = database_url
+        self._channel = channel
+        self._is_relevant = is_relevant
+        self._retry_interval = retry_interval
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def handle(self, payload):
+        if self._is_relevant is None or self._is_relevant(payload):
+            self.notify()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                self._logger.error(e)
+                self._logger.error(traceback.format_exc())
+            # notifications are lost while disconnected. the periodic loop covers them
+            time.sleep(self._retry_interval)
+
+    def _listen(self):
+        import psycopg2
+        from psycopg2 import sql
+
+        conn = psycopg2.connect(self._database_url)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL('LISTEN {}').format(sql.Identifier(self._channel)))
+            self._logger.info('postgres notifier listening {}'.format(self._channel))
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self.handle(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
@@ -0,0 +1,170 @@
+import asyncio
+import dataclasses
+import threading
+import time
+import traceback
+import ccxt.pro
+from .utils import create_ccxt_client
+
+
+class QuoteUnavailable(Exception):
+    # no fresh quote yet. the order is kept unsubmitted and retried next step
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class Quote:
+    best_bid: float
+    best_ask: float
+    timestamp: float
+
+    def age(self, now=None):
+        if now is None:
+            now = time.time()
+        return now - self.timestamp
+
+
+class RestOrderBookProvider:
+    def __init__(self, client=None):
+        self._client = client
+
+    def subscribe(self, ccxt_symbols):
+        pass
+
+    def quote_age(self, ccxt_symbol, now=None):
+        return 0.0
+
+    def get_quote(self, ccxt_symbol, client=None):
+        # client overrides the shared one for calls from order submission threads
+        client = self._client if client is None else client
+        return _order_book_to_quote(client.fetch_order_book(symbol=ccxt_symbol))
+
+    async def get_quote_async(self, ccxt_symbol):
+        return _order_book_to_quote(await self._client.fetch_order_book(symbol=ccxt_symbol))
+
+
+class StreamOrderBookProvider:
+    def __init__(self, feed=None, fallback=None, max_age=5, logger=None):
+        self._feed = feed
+        self._fallback = fallback
+        self._max_age = max_age
+        self._logger = logger
+        # rest fallback is critical like RestOrderBookProvider. it prices an order about to be placed
+        self._lock = threading.Lock()
+        self._quotes = {}
+        self._subscribed = set()
+        self._feed.start(self.on_quote)
+
+    def subscribe(self, ccxt_symbols):
+        with self._lock:
+            new_symbols = set(ccxt_symbols) - self._subscribed
+            self._subscribed |= new_symbols
+        if len(new_symbols) > 0:
+            self._logger.info('order book subscribe {}'.format(sorted(new_symbols)))
+            self._feed.subscribe(new_symbols)
+
+    def on_quote(self, ccxt_symbol, best_bid, best_ask, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self._quotes[ccxt_symbol] = Quote(
+                best_bid=best_bid,
+                best_ask=best_ask,
+                timestamp=timestamp,
+            )
+
+    def quote_age(self, ccxt_symbol, now=None):
+        with self._lock:
+            quote = self._quotes.get(ccxt_symbol)
+        if quote is None:
+            return None
+        return quote.age(now)
+
+    def get_quote(self, ccxt_symbol, client=None):
+        quote = self._get_fresh_quote(ccxt_symbol)
+        if quote is not None or self._fallback is None:
+            return quote
+        return self._fallback.get_quote(ccxt_symbol, client=client)
+
+    async def get_quote_async(self, ccxt_symbol):
+        quote = self._get_fresh_quote(ccxt_symbol)
+        if quote is not None or self._fallback is None:
+            return quote
+        return await self._fallback.get_quote_async(ccxt_symbol)
+
+    def _get_fresh_quote(self, ccxt_symbol):
+        with self._lock:
+            quote = self._quotes.get(ccxt_symbol)
+
+        if quote is not None and quote.age() <= self._max_age:
+            return quote
+
+        self._logger.info('order book stale {} age {}'.format(
+            ccxt_symbol, None if quote is None else quote.age()
+        ))
+        return None
+
+
+def _order_book_to_quote(ob):
+    return Quote(
+        best_bid=ob['bids'][0][0],
+        best_ask=ob['asks'][0][0],
+        timestamp=time.time(),
+    )
+
+
+class LocalOrderBookFeed:
+    # in-process stand-in for the websocket feed
+    def __init__(self):
+        self._handler = None
+        self.subscribed = set()
+
+    def start(self, handler):
+        self._handler = handler
+
+    def subscribe(self, ccxt_symbols):
+        self.subscribed |= set(ccxt_symbols)
+
+    def publish(self, ccxt_symbol, best_bid, best_ask, timestamp=None):
+        if ccxt_symbol not in self.subscribed:
+            return
+        self._handler(ccxt_symbol, best_bid, best_ask, timestamp)
+
+
+class CcxtProOrderBookFeed:
+    def __init__(self, exchange=None, logger=None, retry_interval=5):
+        self._exchange = exchange
+        self._logger = logger
+        self._retry_interval = retry_interval
+        self._handler = None
+        self._loop = None
+        self._client = None
+        self._started = threading.Event()
+
+    def start(self, handler):
+        self._handler = handler
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+        self._started.wait()
+
+    def subscribe(self, ccxt_symbols):
+        for ccxt_symbol in ccxt_symbols:
+            asyncio.run_coroutine_threadsafe(self._watch(ccxt_symbol), self._loop)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._client = create_ccxt_client(self._exchange, ccxt_module=ccxt.pro)
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _watch(self, ccxt_symbol):
+        while True:
+            try:
+                ob = await self._client.watch_order_book(ccxt_symbol)
+                if len(ob['bids']) > 0 and len(ob['asks']) > 0:
+                    self._handler(ccxt_symbol, ob['bids'][0][0], ob['asks'][0][0], time.time())
+            except Exception as e:
+                self._logger.error(e)
+                self._logger.error(traceback.format_exc())
+                await asyncio.sleep(self._retry_interval)
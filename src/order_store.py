@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+
+class OrderStore:
+    # Orders are keyed by identity (Order is a mutable dataclass).
+    # Every index is an insertion-ordered dict so iteration order matches a list.
+    # exchange_order_id must be changed through set_exchange_order_id.
+    def __init__(self, orders=None):
+        self._orders = {}
+        self._by_symbol = defaultdict(dict)
+        self._takers_by_symbol = defaultdict(dict)
+        self._makers = {}
+        self._unsubmitted = {}
+        self._by_exchange_order_id = {}
+
+        for order in orders or []:
+            self.add(order)
+
+    def add(self, order):
+        key = id(order)
+        self._orders[key] = order
+        self._by_symbol[order.symbol][key] = order
+        if order.price is None:
+            self._takers_by_symbol[order.symbol][key] = order
+        else:
+            self._makers[key] = order
+        if order.exchange_order_id is None:
+            self._unsubmitted[key] = order
+        else:
+            self._by_exchange_order_id[order.exchange_order_id] = order
+
+    def remove(self, order):
+        key = id(order)
+        del self._orders[key]
+        _discard(self._by_symbol, order.symbol, key)
+        if order.price is None:
+            _discard(self._takers_by_symbol, order.symbol, key)
+        else:
+            del self._makers[key]
+        if order.exchange_order_id is None:
+            del self._unsubmitted[key]
+        else:
+            del self._by_exchange_order_id[order.exchange_order_id]
+
+    def set_exchange_order_id(self, order, exchange_order_id):
+        key = id(order)
+        if order.exchange_order_id is None:
+            del self._unsubmitted[key]
+        else:
+            del self._by_exchange_order_id[order.exchange_order_id]
+        order.exchange_order_id = exchange_order_id
+        self._by_exchange_order_id[exchange_order_id] = order
+
+    def get_by_exchange_order_id(self, exchange_order_id):
+        return self._by_exchange_order_id.get(exchange_order_id)
+
+    def symbols(self):
+        return list(self._by_symbol.keys())
+
+    def by_symbol(self, symbol):
+        return list(self._by_symbol.get(symbol, {}).values())
+
+    def takers(self, symbol):
+        return list(self._takers_by_symbol.get(symbol, {}).values())
+
+    def makers(self):
+        return list(self._makers.values())
+
+    def unsubmitted(self):
+        return list(self._unsubmitted.values())
+
+    def __contains__(self, order):
+        return id(order) in self._orders
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __iter__(self):
+        return iter(list(self._orders.values()))
+
+    def __reversed__(self):
+        return iter(list(reversed(self._orders.values())))
+
+    def __repr__(self):
+        return repr(list(self._orders.values()))
+
+
+def _discard(index, symbol, key):
+    orders = index[symbol]
+    del orders[key]
+    if len(orders) == 0:
+        del index[symbol]
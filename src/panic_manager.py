@@ -10,14 +10,16 @@ class PanicManager:
         self.thread = threading.Thread(target=self.run)
         self.thread.start()
 
-    def register(self, tag=None, start_time=None, interval=None):
-        self.logger.debug('panic_manager register tag {} start_time {} sec interval {} sec'.format(tag, start_time, interval))
+    def register(self, tag=None, start_time=None, interval=None, fatal=True):
+        # non fatal monitors only log. used for one account of many in a process
+        self.logger.debug('panic_manager register tag {} start_time {} sec interval {} sec fatal {}'.format(tag, start_time, interval, fatal))
         with self.lock:
             self.monitors[tag] = {
                 'start_at': time.time(),
                 'ping_at': None,
                 'start_time': start_time,
-                'interval': interval
+                'interval': interval,
+                'fatal': fatal,
             }
 
     def ping(self, tag=None):
@@ -28,6 +30,15 @@ class PanicManager:
     def panic(self):
         os._exit(1)
 
+    def _panic(self, tag, monitor, kind, now):
+        if monitor['fatal']:
+            self.logger.error('{} {} delayed. exit'.format(tag, kind))
+            self.panic()
+            return
+        # logged again after another interval
+        self.logger.error('{} {} delayed'.format(tag, kind))
+        monitor['ping_at'] = now
+
     def run(self):
         while True:
             # self.logger.debug('panic_manager loop')
@@ -37,10 +48,8 @@ class PanicManager:
                     monitor = self.monitors[tag]
                     if monitor['ping_at']:
                         if now - monitor['ping_at'] > monitor['interval']:
-                            self.logger.error('{} ping delayed. exit'.format(tag))
-                            self.panic()
+                            self._panic(tag, monitor, 'ping', now)
                     else:
                         if now - monitor['start_at'] > monitor['start_time']:
-                            self.logger.error('{} start delayed. exit'.format(tag))
-                            self.panic()
+                            self._panic(tag, monitor, 'start', now)
             time.sleep(5)
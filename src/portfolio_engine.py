@@ -0,0 +1,90 @@
+import numpy as np
+from .compact_rows import Interner
+
+
+class PortfolioEngine:
+    # model x symbol position matrix with interned symbol ids.
+    # rows of removed models are reused.
+    # symbols can be shared with PositionsCache so that its ids are used as is
+    def __init__(self, symbols=None):
+        self._symbols = Interner() if symbols is None else symbols
+        self._model_rows = {}
+        self._free_rows = []
+        self._n_rows = 0
+        self._positions = np.zeros((0, 0))
+        self._present = np.zeros((0, 0), dtype=bool)
+
+    def intern_symbol(self, symbol):
+        return self._symbols.intern(symbol)
+
+    def update_model(self, model_id, positions):
+        symbol_ids = [self.intern_symbol(symbol) for symbol in positions]
+        self.update_model_ids(model_id, symbol_ids, list(positions.values()))
+
+    def update_model_ids(self, model_id, symbol_ids, values):
+        row = self._model_rows.get(model_id)
+        if row is None:
+            if len(self._free_rows) > 0:
+                row = self._free_rows.pop()
+            else:
+                row = self._n_rows
+                self._n_rows += 1
+            self._model_rows[model_id] = row
+        self._ensure_capacity(self._n_rows, len(self._symbols))
+
+        self._positions[row] = 0.0
+        self._present[row] = False
+        self._positions[row, symbol_ids] = values
+        self._present[row, symbol_ids] = True
+
+    def remove_model(self, model_id):
+        row = self._model_rows.pop(model_id, None)
+        if row is None:
+            return
+        self._positions[row] = 0.0
+        self._present[row] = False
+        self._free_rows.append(row)
+
+    def clear(self):
+        for model_id in list(self._model_rows):
+            self.remove_model(model_id)
+
+    def aggregate(self, weights):
+        # returns symbols held by weighted models and weights @ positions
+        rows = []
+        w = []
+        for model_id in weights:
+            row = self._model_rows.get(model_id)
+            if row is None:
+                continue
+            rows.append(row)
+            w.append(weights[model_id])
+
+        n_symbols = len(self._symbols)
+        if len(rows) == 0 or n_symbols == 0:
+            return [], np.zeros(0)
+
+        positions = self._positions[rows, :n_symbols]
+        symbol_ids = np.nonzero(self._present[rows, :n_symbols].any(axis=0))[0]
+        amounts = np.array(w) @ positions[:, symbol_ids]
+        return self._symbols.values(symbol_ids), amounts
+
+    def _ensure_capacity(self, n_rows, n_symbols):
+        capacity_rows, capacity_symbols = self._positions.shape
+        if n_rows <= capacity_rows and n_symbols <= capacity_symbols:
+            return
+        shape = (
+            max(n_rows, 2 * capacity_rows),
+            max(n_symbols, 2 * capacity_symbols),
+        )
+        positions = np.zeros(shape)
+        present = np.zeros(shape, dtype=bool)
+        positions[:capacity_rows, :capacity_symbols] = self._positions
+        present[:capacity_rows, :capacity_symbols] = self._present
+        self._positions = positions
+        self._present = present
+
+
+def to_exchange_amounts(amounts, leverage, unit_pos, contract_size):
+    # vectorized amount_to_exchange_amount
+    return amounts * leverage * unit_pos / contract_size
@@ -0,0 +1,226 @@
+from collections import deque
+import threading
+import pandas as pd
+from .compact_rows import CompactRow, RowCodec, rows_equal
+
+
+class PositionsCache:
+    # append-only store of alphapool rows keyed by (timestamp, model_id)
+    # columns are deques in timestamp order so that expired rows are evicted from the left in place.
+    # late rows of an update are merged with the right end in one pass.
+    # rows are kept as CompactRow. symbols and model_ids are interned by codec
+    # can be shared by bots in one process. update within min_update_interval
+    # of the previous one is skipped so that the bots fetch once per loop
+    def __init__(self, alphapool_client=None, logger=None,
+                 window=24 * 60 * 60, overlap=2 * 60, min_update_interval=0,
+                 late_overlap=60 * 60, late_interval=15 * 60):
+        self._alphapool_client = alphapool_client
+        self._logger = logger
+        self._window = window
+        # rows of other models may be published later with the same or slightly older timestamp.
+        # each update re-fetches overlap seconds before the watermark.
+        # every late_interval seconds late_overlap seconds are re-fetched instead
+        # so that rows published very late are picked up (late_overlap None disables)
+        self._overlap = overlap
+        self._late_overlap = late_overlap
+        self._late_interval = late_interval
+        self._late_fetched_at = None
+        self._min_update_interval = min_update_interval
+        self._lock = threading.RLock()
+        self._updated_at = None
+        self.codec = RowCodec()
+
+        self._timestamps = deque()
+        self._model_ids = deque()
+        self._positions = deque()
+        self._weights = deque()
+        self._orders = deque()
+        self._index = {}
+        self._offset = 0
+        self._watermark = None
+
+        # latest row per model at or before the last update time
+        self._latest = {}
+        self._pending = {}
+        self._version = 0
+        self._versions = {}
+
+    def update(self, now, force=False):
+        with self._lock:
+            if (not force and self._updated_at is not None
+                    and now - self._updated_at < self._min_update_interval):
+                return []
+            self._updated_at = now
+
+            if self._watermark is None:
+                min_timestamp = int(now - self._window)
+                self._late_fetched_at = now
+            else:
+                overlap = self._overlap
+                if (self._late_overlap is not None
+                        and now - self._late_fetched_at >= self._late_interval):
+                    overlap = max(overlap, self._late_overlap)
+                    self._late_fetched_at = now
+                min_timestamp = int(self._watermark.timestamp() - overlap)
+
+            df = self._alphapool_client.get_positions(min_timestamp=min_timestamp)
+            new_rows = self._append(df)
+            self._evict(now)
+            self._update_latest(new_rows, now)
+
+            self._logger.debug('positions cache fetched {} new {} total {} watermark {}'.format(
+                df.shape[0], len(new_rows), len(self), self._watermark
+            ))
+            return new_rows
+
+    def rows(self):
+        with self._lock:
+            rows = [self._row(i) for i in range(len(self._timestamps))]
+        yield from rows
+
+    def latest_rows(self):
+        with self._lock:
+            return dict(self._latest)
+
+    def changes(self, version):
+        # models whose latest row changed (or expired) after version
+        with self._lock:
+            changed = set([model_id for model_id, v in self._versions.items() if v > version])
+            return changed, self._version
+
+    def decode(self, row):
+        return self.codec.decode(row)
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def _append(self, df):
+        new_rows = []
+        if df.shape[0] == 0:
+            return new_rows
+
+        # rows older than the right end. merged in one pass after the loop
+        late_rows = {}
+        for (timestamp, model_id), positions, weights, orders in zip(
+            df.index,
+            df['positions'].values,
+            df['weights'].values,
+            df['orders'].values,
+        ):
+            row = self.codec.encode(timestamp, model_id, positions, weights, orders)
+            model_id = row.model_id
+            key = (timestamp, model_id)
+            i = self._index.get(key)
+            if i is not None:
+                i -= self._offset
+                if rows_equal(self._row(i), row):
+                    continue
+                # keep last like the previous drop duplicates
+                self._positions[i] = row.positions
+                self._weights[i] = row.weights
+                self._orders[i] = row.orders
+            elif key in late_rows:
+                if rows_equal(late_rows[key], row):
+                    continue
+                late_rows[key] = row
+            elif len(self._timestamps) > 0 and self._timestamps[-1] > timestamp:
+                late_rows[key] = row
+            else:
+                self._push(row)
+            new_rows.append(row)
+
+            if self._watermark is None or self._watermark < timestamp:
+                self._watermark = timestamp
+
+        if len(late_rows) > 0:
+            self._merge(sorted(late_rows.values(), key=lambda x: x.timestamp))
+        return new_rows
+
+    def _merge(self, rows):
+        # only the rows newer than the oldest late row are popped and pushed back.
+        # rows with the same timestamp keep their order, late ones go after them
+        tail = []
+        while len(self._timestamps) > 0 and self._timestamps[-1] > rows[0].timestamp:
+            tail.append(self._pop())
+        tail.reverse()
+
+        i = 0
+        j = 0
+        while i < len(tail) or j < len(rows):
+            if j == len(rows) or (i < len(tail) and tail[i].timestamp <= rows[j].timestamp):
+                self._push(tail[i])
+                i += 1
+            else:
+                self._push(rows[j])
+                j += 1
+
+    def _push(self, row):
+        self._index[(row.timestamp, row.model_id)] = self._offset + len(self._timestamps)
+        self._timestamps.append(row.timestamp)
+        self._model_ids.append(row.model_id)
+        self._positions.append(row.positions)
+        self._weights.append(row.weights)
+        self._orders.append(row.orders)
+
+    def _pop(self):
+        # index is rewritten when pushed back
+        return CompactRow(
+            self._timestamps.pop(),
+            self._model_ids.pop(),
+            self._positions.pop(),
+            self._weights.pop(),
+            self._orders.pop(),
+        )
+
+    def _update_latest(self, new_rows, now):
+        max_timestamp = pd.to_datetime(now, unit='s', utc=True)
+        for row in new_rows:
+            self._pending[(row.timestamp, row.model_id)] = row
+
+        for key in list(self._pending):
+            row = self._pending[key]
+            if row.timestamp > max_timestamp:
+                continue
+            del self._pending[key]
+            if key not in self._index:
+                # already expired
+                continue
+
+            latest = self._latest.get(row.model_id)
+            if latest is not None and latest.timestamp > row.timestamp:
+                continue
+            self._latest[row.model_id] = row
+            self._bump_version(row.model_id)
+
+    def _bump_version(self, model_id):
+        self._version += 1
+        self._versions[model_id] = self._version
+
+    def _evict(self, now):
+        min_timestamp = pd.to_datetime(now - self._window, unit='s', utc=True)
+        while len(self._timestamps) > 0 and self._timestamps[0] < min_timestamp:
+            timestamp = self._timestamps[0]
+            model_id = self._model_ids[0]
+            latest = self._latest.get(model_id)
+            if latest is not None and latest.timestamp == timestamp:
+                # inactive model
+                del self._latest[model_id]
+                self._bump_version(model_id)
+            self._pending.pop((timestamp, model_id), None)
+
+            del self._index[(timestamp, model_id)]
+            self._timestamps.popleft()
+            self._model_ids.popleft()
+            self._positions.popleft()
+            self._weights.popleft()
+            self._orders.popleft()
+            self._offset += 1
+
+    def _row(self, i):
+        return CompactRow(
+            self._timestamps[i],
+            self._model_ids[i],
+            self._positions[i],
+            self._weights[i],
+            self._orders[i],
+        )
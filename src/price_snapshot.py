@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+
+class PriceSnapshot:
+    def __init__(self, client=None, logger=None):
+        self._client = client
+        self._logger = logger
+        self._prices = {}
+        self._fetched_at = None
+
+    def fetch(self, ccxt_symbols):
+        ccxt_symbols = list(ccxt_symbols)
+        fetched_at = time.time()
+
+        tickers = {}
+        if self._use_bulk(ccxt_symbols):
+            tickers = self._client.fetch_tickers(ccxt_symbols)
+
+        for ccxt_symbol in ccxt_symbols:
+            if tickers.get(ccxt_symbol) is None:
+                # exchange without bulk endpoint or symbol missing from bulk response
+                tickers[ccxt_symbol] = self._client.fetch_ticker(ccxt_symbol)
+
+        return self._set_prices(ccxt_symbols, tickers, fetched_at)
+
+    async def fetch_async(self, ccxt_symbols):
+        ccxt_symbols = list(ccxt_symbols)
+        fetched_at = time.time()
+
+        tickers = {}
+        if self._use_bulk(ccxt_symbols):
+            tickers = await self._client.fetch_tickers(ccxt_symbols)
+
+        missing = [x for x in ccxt_symbols if tickers.get(x) is None]
+        for ccxt_symbol, ticker in zip(missing, await asyncio.gather(*[
+            self._client.fetch_ticker(x) for x in missing
+        ])):
+            tickers[ccxt_symbol] = ticker
+
+        return self._set_prices(ccxt_symbols, tickers, fetched_at)
+
+    def _use_bulk(self, ccxt_symbols):
+        return len(ccxt_symbols) > 0 and self._client.has.get('fetchTickers')
+
+    def _set_prices(self, ccxt_symbols, tickers, fetched_at):
+        prices = {x: tickers[x]['last'] for x in ccxt_symbols}
+        self._prices = prices
+        self._fetched_at = fetched_at
+        self._logger.debug('price snapshot {} symbols'.format(len(prices)))
+        return prices
+
+    def get_price(self, ccxt_symbol):
+        return self._prices[ccxt_symbol]
+
+    def age(self, now=None):
+        if self._fetched_at is None:
+            return None
+        if now is None:
+            now = time.time()
+        return now - self._fetched_at
@@ -2,31 +2,173 @@ import numpy as np
 import pandas as pd
 
 
-def calc_portfolio_positions(df):
+def calc_portfolio_positions(df, sparse=False, chunk_size=2 ** 24):
+    # positions of rows with w.<model> columns += sum of weight * positions of <model> at the same timestamp.
+    # computed as batched (rows x models) @ (models x symbols) products.
+    # sparse=True gathers only non-zero weights.
     df = df.copy()
     symbol_cols = [x for x in df.columns if x.startswith("p.")]
-    for col in df.columns:
-        if col.startswith("w."):
-            model_id = col.replace("w.", "")
+    weight_cols = [x for x in df.columns if x.startswith("w.")]
+    if len(symbol_cols) == 0 or len(weight_cols) == 0:
+        return df
+
+    codes, model_ids = pd.factorize(df.index.get_level_values('model_id'))
+    time_codes, times = pd.factorize(df.index.get_level_values('timestamp'))
+    # row of (model, timestamp)
+    table = np.full((len(model_ids), len(times)), -1, dtype=np.int64)
+    table[codes, time_codes] = np.arange(df.shape[0])
+
+    model_codes = {x: i for i, x in enumerate(model_ids)}
+    ref_codes = []
+    for col in weight_cols:
+        model_id = col.replace("w.", "")
+        if model_id not in model_codes or (table[model_codes[model_id]] < 0).any():
+            raise KeyError('positions of {} not found at some timestamps'.format(model_id))
+        ref_codes.append(model_codes[model_id])
+    ref_codes = np.array(ref_codes)
 
-            df2 = df.index.to_frame()
-            df2['model_id'] = model_id
-            idx = pd.MultiIndex.from_frame(df2)
+    positions = df[symbol_cols].to_numpy(dtype=float)
+    # only rows of portfolio models have weights. avoid materializing all weight columns
+    has_weight = np.zeros(df.shape[0], dtype=bool)
+    for col in weight_cols:
+        has_weight |= df[col].values != 0
+    rows = np.nonzero(has_weight)[0]
+    weights = df[weight_cols].iloc[rows].to_numpy(dtype=float)
 
-            df.loc[:, symbol_cols] += df[col].values.reshape(-1, 1) * df.loc[idx, symbol_cols].values
+    if np.isnan(positions).any() or _has_chained_weights(weights, codes[rows], ref_codes):
+        # w columns are applied in order. keep that when a weighted model is a portfolio itself
+        for ref_code, col in zip(ref_codes, weight_cols):
+            positions += df[col].values.reshape(-1, 1) * positions[table[ref_code, time_codes]]
+    else:
+        src = table[ref_codes[None, :], time_codes[rows][:, None]]
+        if sparse:
+            positions[rows] += _sparse_weighted_sum(weights, src, positions, chunk_size)
+        else:
+            positions[rows] += _dense_weighted_sum(weights, src, positions, chunk_size)
+
+    df.loc[:, symbol_cols] = positions
     return df
 
 
-def calc_model_ret(df):
-    model_ret = None
-    for col in df.columns:
-        if col.startswith("p."):
-            ret_col = col.replace("p.", "ret.")
-            if model_ret is None:
-                model_ret = df[col] * df[ret_col]
+def _has_chained_weights(weights, codes, ref_codes):
+    # True when rows of a model referenced by the k-th w column have weights in earlier w columns
+    nonzero = pd.DataFrame(weights != 0).groupby(codes).any()
+    for k, ref_code in enumerate(ref_codes):
+        if ref_code in nonzero.index and nonzero.loc[ref_code].values[:k].any():
+            return True
+    return False
+
+
+def _dense_weighted_sum(weights, src, positions, chunk_size):
+    n_refs = weights.shape[1]
+    n_symbols = positions.shape[1]
+    result = np.empty((weights.shape[0], n_symbols))
+    step = max(1, chunk_size // (n_refs * n_symbols))
+    for i in range(0, weights.shape[0], step):
+        result[i:i + step] = np.matmul(
+            weights[i:i + step, None, :],
+            positions[src[i:i + step]],
+        )[:, 0]
+    return result
+
+
+def _sparse_weighted_sum(weights, src, positions, chunk_size):
+    r, c = np.nonzero(weights)
+    result = np.zeros((weights.shape[0], positions.shape[1]))
+    step = max(1, chunk_size // positions.shape[1])
+    for i in range(0, len(r), step):
+        r_chunk = r[i:i + step]
+        c_chunk = c[i:i + step]
+        contrib = weights[r_chunk, c_chunk][:, None] * positions[src[r_chunk, c_chunk]]
+        # r is sorted. sum contiguous runs
+        starts = np.nonzero(np.r_[True, r_chunk[1:] != r_chunk[:-1]])[0]
+        result[r_chunk[starts]] += np.add.reduceat(contrib, starts, axis=0)
+    return result
+
+
+def calc_model_ret(df, dtype=np.float64, return_error_bound=False):
+    # sum of p.<symbol> * ret.<symbol> per row, unstacked to timestamp x model_id.
+    # dtype=np.float32 halves the memory. return_error_bound=True also returns
+    # an upper bound of the absolute rounding error per cell
+    model_codes, model_ids, time_codes, times = _factorize_index(df)
+    return _model_ret_frame(df, None, model_codes, model_ids, time_codes, times, dtype, return_error_bound)
+
+
+def iter_model_ret(df, window='1D', dtype=np.float64, return_error_bound=False):
+    # same as calc_model_ret but yields one frame per time window.
+    # columns are the same in all frames so that they can be concatenated
+    model_codes, model_ids, time_codes, times = _factorize_index(df)
+    window_codes = pd.factorize(times.floor(window), sort=True)[0]
+    row_windows = window_codes[time_codes]
+    order = np.argsort(row_windows, kind='stable')
+    bounds = np.searchsorted(row_windows[order], np.arange(window_codes.max() + 2))
+
+    for i in range(len(bounds) - 1):
+        rows = order[bounds[i]:bounds[i + 1]]
+        if len(rows) == 0:
+            continue
+        window_times = np.nonzero(window_codes == i)[0]
+        yield _model_ret_frame(
+            df, rows, model_codes[rows], model_ids,
+            time_codes[rows] - window_times[0], times[window_times[0]:window_times[-1] + 1],
+            dtype, return_error_bound,
+        )
+
+
+def _factorize_index(df):
+    # level 0 becomes columns like unstack(level=0).
+    # sorted levels are reused as is to keep attributes like freq
+    index = df.index.remove_unused_levels()
+    result = []
+    for i in range(2):
+        codes = index.codes[i]
+        level = index.levels[i]
+        if not level.is_monotonic_increasing:
+            codes, level = pd.factorize(index.get_level_values(i), sort=True)
+            level.name = index.names[i]
+        result += [np.asarray(codes), level]
+    return tuple(result)
+
+
+def _model_ret_frame(df, rows, model_codes, model_ids, time_codes, times, dtype, return_error_bound):
+    position_cols = [x for x in df.columns if x.startswith("p.")]
+    values = None
+    abs_values = None
+    for col in position_cols:
+        # accumulated column by column to keep a single row sized buffer
+        p = df[col].values
+        r = df[col.replace("p.", "ret.")].values
+        if rows is not None:
+            p = p[rows]
+            r = r[rows]
+        x = p.astype(dtype, copy=False) * r.astype(dtype, copy=False)
+        if values is None:
+            values = x
+        else:
+            values += x
+        if return_error_bound:
+            if abs_values is None:
+                abs_values = np.abs(x)
             else:
-                model_ret += df[col] * df[ret_col]
-    return model_ret.unstack(level=0)
+                abs_values += np.abs(x)
+
+    model_ret = _unstack(values, model_codes, model_ids, time_codes, times)
+    if not return_error_bound:
+        return model_ret
+
+    # each term has 3 roundings (2 casts and product) and the sum adds n - 1.
+    # abs_values itself is computed with the same error
+    n = len(position_cols) + 2
+    u = np.finfo(dtype).eps / 2
+    gamma = 2 * n * u / (1 - 2 * n * u)
+    error_bound = _unstack(abs_values.astype(np.float64) * gamma, model_codes, model_ids, time_codes, times)
+    return model_ret, error_bound
+
+
+def _unstack(values, model_codes, model_ids, time_codes, times):
+    result = np.full((len(times), len(model_ids)), np.nan, dtype=values.dtype)
+    result[time_codes, model_codes] = values
+    return pd.DataFrame(result, index=times, columns=model_ids)
 
 
 def preprocess_df(df, execution_time):
@@ -65,30 +207,80 @@ def convert_to_executable_time(df, execution_delay):
 
 
 def asfreq_positions(df, freq, max_timestamp):
-    dfs = []
-    min_t = df.index.get_level_values('timestamp').min()
-    for model_id, df_model in df.groupby("model_id"):
-        df_model = df_model.reset_index().copy()
-        df_model = df_model.drop_duplicates("timestamp", keep="last")
-        df_model = df_model.set_index("timestamp").sort_index()
-
-        t = min_t - pd.to_timedelta(freq)
-        df_model.loc[t] = df_model.iloc[0]
-        for col in df_model.columns:
-            if col.startswith("p.") or col.startswith("w."):
-                df_model.loc[t, col] = 0.0
-        t = max_timestamp + pd.to_timedelta(freq)
-        df_model.loc[t] = df_model.iloc[0]
-        for col in df_model.columns:
-            if col.startswith("p.") or col.startswith("w."):
-                df_model.loc[t, col] = np.nan
-
-        df_model = df_model.sort_index()
-        df_model = df_model.asfreq(freq, method="ffill")
-        df_model = df_model.loc[
-            (df_model.index <= max_timestamp)
-        ]
-
-        dfs.append(df_model)
-
-    return pd.concat(dfs).reset_index().set_index(["model_id", "timestamp"])
+    # as-of join of every model onto one shared grid.
+    # grid starts one bar before the first timestamp where all models are flat
+    columns = list(df.columns)
+    position_cols = [x for x in columns if x.startswith("p.") or x.startswith("w.")]
+
+    timestamps = df.index.get_level_values('timestamp')
+    freq_ns = pd.to_timedelta(freq).value
+    grid = pd.date_range(timestamps.min() - pd.to_timedelta(freq), max_timestamp, freq=freq, name='timestamp')
+    if len(grid) == 0:
+        # max_timestamp is before the grid start
+        return _empty_asfreq_positions(df, columns)
+
+    model_ids, codes = np.unique(df.index.get_level_values('model_id').values, return_inverse=True)
+    t = _to_ns(timestamps)
+    # first grid index at which the row is visible
+    bars = -((grid[0].value - t) // freq_ns)
+
+    # drop duplicated timestamps with keep="last". lexsort is stable
+    order = np.lexsort((np.arange(len(df)), t, codes))
+    kept = np.ones(len(order), dtype=bool)
+    kept[:-1] = (codes[order[1:]] != codes[order[:-1]]) | (t[order[1:]] != t[order[:-1]])
+    order = order[kept]
+    codes = codes[order]
+    bars = bars[order]
+
+    # latest row per (model, bar) inside the grid
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (codes[1:] != codes[:-1]) | (bars[1:] != bars[:-1])
+    visible = np.nonzero(last & (bars < len(grid)))[0]
+
+    # row positions increase with time within a model so ffill is a running max
+    rows = np.full((len(model_ids), len(grid)), -1, dtype=np.int64)
+    rows[codes[visible], bars[visible]] = visible
+    rows = np.maximum.accumulate(rows, axis=1).ravel()
+    before_first = rows < 0
+
+    # before the first row, positions are zero and other columns are from the first row
+    first_rows = np.searchsorted(codes, np.arange(len(model_ids)))
+    rows[before_first] = np.repeat(first_rows, len(grid))[before_first]
+    rows = order[rows]
+
+    n_models = len(model_ids)
+    n_grid = len(grid)
+    index = pd.MultiIndex(
+        levels=[model_ids, grid],
+        codes=[np.repeat(np.arange(n_models), n_grid), np.tile(np.arange(n_grid), n_models)],
+        names=["model_id", "timestamp"],
+    )
+
+    # positions are gathered as one block to avoid per column copies
+    positions = df[position_cols].to_numpy(dtype=float)[rows]
+    positions[before_first] = 0.0
+    result = pd.DataFrame(positions, index=index, columns=position_cols)
+    other_cols = [x for x in columns if x not in position_cols]
+    for col in other_cols:
+        result[col] = df[col].values[rows]
+    if len(other_cols) > 0:
+        result = result[columns]
+    return result
+
+
+def _empty_asfreq_positions(df, columns):
+    index = pd.MultiIndex(
+        levels=[[], []],
+        codes=[[], []],
+        names=["model_id", "timestamp"],
+    )
+    result = pd.DataFrame(index=index)
+    for col in columns:
+        result[col] = df[col].values[:0]
+    return result
+
+
+def _to_ns(timestamps):
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_convert('UTC').tz_localize(None)
+    return timestamps.values.astype('datetime64[ns]').view(np.int64)
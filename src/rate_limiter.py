@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self._rate = rate
+        self._capacity = rate if capacity is None else capacity
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            wait = self._take(tokens)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        while True:
+            wait = self._take(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def _take(self, tokens):
+        # returns seconds to wait before retry. 0 when taken
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity,
+                self._tokens + (now - self._updated_at) * self._rate
+            )
+            self._updated_at = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self._rate
+
+
+_token_buckets = {}
+_token_buckets_lock = threading.Lock()
+
+
+def get_token_bucket(key, rate, capacity=None):
+    # shared by all bots using the same key
+    with _token_buckets_lock:
+        if key not in _token_buckets:
+            _token_buckets[key] = TokenBucket(rate, capacity=capacity)
+        return _token_buckets[key]
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from ..utils import ccxt_symbol_to_symbol
+
+
+class ReplayAlphapoolClient:
+    # replays a recorded get_positions frame up to the simulated now
+    def __init__(self, df=None, clock=None):
+        df = df.sort_index()
+        self._df = df
+        self._clock = clock
+        self._timestamps = df.index.get_level_values('timestamp').view('int64') / 1e9
+
+    def get_positions(self, min_timestamp=None):
+        start = 0
+        if min_timestamp is not None:
+            start = self._timestamps.searchsorted(min_timestamp, side='left')
+        end = self._timestamps.searchsorted(self._clock.time(), side='right')
+        return self._df.iloc[start:end]
+
+
+def synthetic_positions(prices, n_models, interval=300,
+                        portfolio_model_id='pf-replay', order_ratio=0.1, seed=0):
+    # each model holds random positions in a random subset of symbols
+    # and sometimes places a limit order near the price.
+    # the portfolio model weights all models equally.
+    rs = np.random.RandomState(seed)
+    symbols = [ccxt_symbol_to_symbol(x) for x in prices.columns]
+    model_ids = ['model{}'.format(i) for i in range(n_models)]
+    model_symbols = [
+        list(rs.choice(len(symbols), size=max(1, len(symbols) // 2), replace=False))
+        for _ in model_ids
+    ]
+    weights = {model_id: 1.0 / n_models for model_id in model_ids}
+
+    rows = []
+    start = int(prices.index[0]) // interval * interval
+    for t in range(start, int(prices.index[-1]) + 1, interval):
+        price = prices.values[max(0, prices.index.searchsorted(t, side='right') - 1)]
+        for model_id, cols in zip(model_ids, model_symbols):
+            positions = {
+                symbols[i]: float(x)
+                for i, x in zip(cols, rs.normal(0, 1.0 / len(cols), size=len(cols)))
+            }
+            orders = {}
+            if rs.uniform() < order_ratio:
+                i = cols[rs.randint(len(cols))]
+                is_buy = bool(rs.uniform() < 0.5)
+                orders[symbols[i]] = [{
+                    'price': float(price[i] * (0.999 if is_buy else 1.001)),
+                    'amount': float(abs(rs.normal(0, 0.1))),
+                    'is_buy': is_buy,
+                    'duration': 3600,
+                }]
+            rows.append({
+                'model_id': model_id,
+                'timestamp': t,
+                'positions': positions,
+                'weights': {},
+                'orders': orders,
+            })
+        rows.append({
+            'model_id': portfolio_model_id,
+            'timestamp': t,
+            'positions': {},
+            'weights': weights,
+            'orders': {},
+        })
+
+    df = pd.DataFrame(rows)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, unit='s')
+    return df.set_index(['timestamp', 'model_id']).sort_index()
+
+
+def load_positions(path):
+    # pickle of a recorded get_positions frame
+    return pd.read_pickle(path)
@@ -0,0 +1,127 @@
+import json
+import os
+import time
+from unittest import mock
+import numpy as np
+from ..bot_maker import BotMaker
+from ..logger import create_logger
+from ..rate_limiter import TokenBucket
+from ..smoother import NullSmoother
+from .alphapool_replay import ReplayAlphapoolClient, synthetic_positions, load_positions
+from .sim_exchange import SimClock, SimExchange, synthetic_prices, load_prices
+
+DEFAULT_START = 1600000200
+
+
+def run_replay(n_models=10, n_symbols=10, n_steps=1000, interval=60,
+               latency=0.0, rate_limit=None, order_rate=4.0, order_sync_mode='symbol',
+               prices=None, positions=None, seed=0, logger=None):
+    # runs BotMaker._step n_steps times in simulated time
+    if prices is None:
+        ccxt_symbols = ['S{}/USDT:USDT'.format(i) for i in range(n_symbols)]
+        prices = synthetic_prices(
+            ccxt_symbols,
+            start=DEFAULT_START,
+            end=DEFAULT_START + n_steps * interval,
+            interval=interval,
+            seed=seed,
+        )
+    if positions is None:
+        positions = synthetic_positions(prices, n_models=n_models, seed=seed)
+
+    start = float(prices.index[0])
+    n_steps = min(n_steps, int((prices.index[-1] - start) // interval) + 1)
+
+    clock = SimClock(start)
+    exchange = SimExchange(
+        prices=prices,
+        clock=clock,
+        latency=latency,
+        rate_limit=rate_limit,
+    )
+    bot = BotMaker(
+        client=exchange,
+        logger=logger,
+        leverage=1.0,
+        alphapool_client=ReplayAlphapoolClient(df=positions, clock=clock),
+        model_id='pf-replay',
+        health_check_ping=lambda: None,
+        unit_pos_smoother=NullSmoother(),
+        order_concurrency=1,
+        # not shared with real clients. waits in simulated time
+        order_rate_limiter=TokenBucket(rate=order_rate),
+        order_sync_mode=order_sync_mode,
+    )
+
+    step_seconds = []
+    errors = 0
+    with mock.patch('time.time', clock.time), \
+            mock.patch('time.monotonic', clock.time), \
+            mock.patch('time.sleep', clock.sleep):
+        for i in range(n_steps):
+            exchange.advance(start + i * interval)
+            step_start = time.perf_counter()
+            try:
+                bot._step()
+            except Exception as e:
+                errors += 1
+                logger.debug('replay step error {}'.format(e))
+            step_seconds.append(time.perf_counter() - step_start)
+            bot._remove_old_data()
+
+    step_seconds = np.array(step_seconds)
+    api_calls = sum(exchange.api_calls.values())
+    return {
+        'models': positions.index.get_level_values('model_id').nunique() - 1,
+        'symbols': prices.shape[1],
+        'steps': n_steps,
+        'errors': errors,
+        'step_seconds': {
+            'total': float(step_seconds.sum()),
+            'mean': float(step_seconds.mean()),
+            'p50': float(np.quantile(step_seconds, 0.5)),
+            'p99': float(np.quantile(step_seconds, 0.99)),
+            'max': float(step_seconds.max()),
+        },
+        'api_calls': {
+            'total': api_calls,
+            'per_step': api_calls / n_steps,
+            'by_method': dict(sorted(exchange.api_calls.items())),
+        },
+        'orders': {
+            'created': exchange.created_orders,
+            'rejected': exchange.rejected_orders,
+            'filled': exchange.filled_orders,
+            'per_step': exchange.created_orders / n_steps,
+        },
+        'collateral': float(exchange.fapiPrivateV2GetAccount()['totalMarginBalance']),
+    }
+
+
+def start():
+    log_level = os.getenv('ALPHAPOOL_LOG_LEVEL', 'warning')
+    prices_path = os.getenv('ALPHAPOOL_REPLAY_PRICES')
+    positions_path = os.getenv('ALPHAPOOL_REPLAY_POSITIONS')
+    rate_limit = int(os.getenv('ALPHAPOOL_REPLAY_RATE_LIMIT', '0'))
+
+    logger = create_logger(log_level)
+
+    report = run_replay(
+        n_models=int(os.getenv('ALPHAPOOL_REPLAY_MODELS', '10')),
+        n_symbols=int(os.getenv('ALPHAPOOL_REPLAY_SYMBOLS', '10')),
+        n_steps=int(os.getenv('ALPHAPOOL_REPLAY_STEPS', '1000')),
+        interval=int(os.getenv('ALPHAPOOL_REPLAY_INTERVAL', '60')),
+        latency=float(os.getenv('ALPHAPOOL_REPLAY_LATENCY', '0')),
+        order_rate=float(os.getenv('ALPHAPOOL_ORDER_RATE', '4')),
+        rate_limit=rate_limit if rate_limit > 0 else None,
+        order_sync_mode=os.getenv('ALPHAPOOL_ORDER_SYNC_MODE', 'symbol'),
+        prices=None if prices_path is None else load_prices(prices_path),
+        positions=None if positions_path is None else load_positions(positions_path),
+        seed=int(os.getenv('ALPHAPOOL_REPLAY_SEED', '0')),
+        logger=logger,
+    )
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == '__main__':
+    start()
@@ -0,0 +1,271 @@
+from collections import Counter, defaultdict
+import itertools
+import threading
+import ccxt
+import numpy as np
+import pandas as pd
+
+
+class SimClock:
+    # simulated time patched into time.time by the harness
+    def __init__(self, t):
+        self._t = t
+        self._lock = threading.Lock()
+
+    def time(self):
+        with self._lock:
+            return self._t
+
+    def sleep(self, seconds):
+        with self._lock:
+            self._t += seconds
+
+    def advance_to(self, t):
+        with self._lock:
+            self._t = max(self._t, t)
+
+
+class SimExchange:
+    # ccxt compatible subset used by BotMaker with id binance.
+    # post-only orders rest until the price path trades through them.
+    def __init__(self, prices=None, clock=None, collateral=10000.0,
+                 latency=0.0, rate_limit=None, rate_limit_window=60,
+                 spread=0.0002, contract_size=1.0):
+        self.id = 'binance'
+        self.has = {
+            'fetchTickers': True,
+            'fetchOrders': True,
+        }
+        self.options = {}
+        self._prices = prices
+        self._clock = clock
+        self._cash = collateral
+        self._latency = latency
+        self._rate_limit = rate_limit
+        self._rate_limit_window = rate_limit_window
+        self._spread = spread
+        self._contract_size = contract_size
+        self._lock = threading.RLock()
+
+        self._t_index = 0
+        self._symbols = list(prices.columns)
+        self._positions = defaultdict(float)
+        self._entry_prices = defaultdict(float)
+        self._orders = {}
+        self._open_order_ids = set()
+        self._order_ids = itertools.count(1)
+        self._call_times = []
+
+        self.api_calls = Counter()
+        self.created_orders = 0
+        self.rejected_orders = 0
+        self.filled_orders = 0
+
+    # simulation
+
+    def advance(self, t):
+        # move price path to t and fill crossed orders
+        with self._lock:
+            self._clock.advance_to(t)
+            index = self._prices.index.searchsorted(t, side='right') - 1
+            self._t_index = max(0, index)
+            for order_id in sorted(self._open_order_ids):
+                self._try_fill(self._orders[order_id])
+
+    def _price(self, symbol):
+        return float(self._prices[symbol].values[self._t_index])
+
+    def _best_bid_ask(self, symbol):
+        price = self._price(symbol)
+        return price * (1 - self._spread / 2), price * (1 + self._spread / 2)
+
+    def _try_fill(self, order):
+        best_bid, best_ask = self._best_bid_ask(order['symbol'])
+        if order['side'] == 'buy':
+            crossed = best_ask <= order['price']
+        else:
+            crossed = best_bid >= order['price']
+        if not crossed:
+            return
+
+        signed_amount = order['amount'] * (1 if order['side'] == 'buy' else -1)
+        if order['reduceOnly']:
+            pos = self._positions[order['symbol']]
+            if pos * signed_amount >= 0:
+                signed_amount = 0.0
+            else:
+                signed_amount = np.sign(signed_amount) * min(abs(signed_amount), abs(pos))
+        self._trade(order['symbol'], signed_amount, order['price'])
+        order['filled'] = order['amount']
+        order['status'] = 'closed'
+        self._open_order_ids.discard(order['id'])
+        self.filled_orders += 1
+
+    def _trade(self, symbol, signed_amount, price):
+        # realize pnl with average entry price
+        pos = self._positions[symbol]
+        entry = self._entry_prices[symbol]
+        new_pos = pos + signed_amount
+        if pos * signed_amount < 0:
+            closed = min(abs(pos), abs(signed_amount))
+            self._cash += closed * np.sign(pos) * (price - entry) * self._contract_size
+        if new_pos == 0:
+            entry = 0.0
+        elif pos * new_pos <= 0:
+            entry = price
+        elif abs(new_pos) > abs(pos):
+            entry = (entry * pos + price * signed_amount) / new_pos
+        self._positions[symbol] = new_pos
+        self._entry_prices[symbol] = entry
+
+    def _call(self, name):
+        self.api_calls[name] += 1
+        if self._latency > 0:
+            self._clock.sleep(self._latency)
+        if self._rate_limit is None:
+            return
+        now = self._clock.time()
+        with self._lock:
+            self._call_times = [x for x in self._call_times if x > now - self._rate_limit_window]
+            if len(self._call_times) >= self._rate_limit:
+                raise ccxt.RateLimitExceeded('sim rate limit exceeded {}'.format(name))
+            self._call_times.append(now)
+
+    # ccxt api
+
+    def fetch_markets(self):
+        self._call('fetch_markets')
+        return [{
+            'symbol': symbol,
+            'id': symbol.split('/')[0] + 'USDT',
+            'contractSize': self._contract_size,
+            'limits': {
+                'amount': {'min': 0.001, 'max': 1e9},
+                'cost': {'min': 5.0},
+                'leverage': {'min': 1.0, 'max': 125.0},
+            },
+            'precision': {'amount': 3, 'price': 1},
+        } for symbol in self._symbols]
+
+    def fapiPrivateV2GetAccount(self, params={}):
+        self._call('fapiPrivateV2GetAccount')
+        with self._lock:
+            unrealized = sum(
+                pos * (self._price(symbol) - self._entry_prices[symbol]) * self._contract_size
+                for symbol, pos in self._positions.items()
+            )
+            return {'totalMarginBalance': str(self._cash + unrealized)}
+
+    def fetch_positions(self, symbols=None, params={}):
+        self._call('fetch_positions')
+        with self._lock:
+            return [{
+                'symbol': symbol,
+                'side': 'long' if pos > 0 else 'short',
+                'contracts': abs(pos),
+            } for symbol, pos in self._positions.items() if pos != 0]
+
+    def fetch_tickers(self, symbols=None, params={}):
+        self._call('fetch_tickers')
+        with self._lock:
+            if symbols is None:
+                symbols = self._symbols
+            return {x: {'symbol': x, 'last': self._price(x)} for x in symbols}
+
+    def fetch_ticker(self, symbol, params={}):
+        self._call('fetch_ticker')
+        with self._lock:
+            return {'symbol': symbol, 'last': self._price(symbol)}
+
+    def fetch_order_book(self, symbol, limit=None, params={}):
+        self._call('fetch_order_book')
+        with self._lock:
+            best_bid, best_ask = self._best_bid_ask(symbol)
+            return {'bids': [[best_bid, 1e9]], 'asks': [[best_ask, 1e9]]}
+
+    def set_leverage(self, leverage, symbol=None, params={}):
+        self._call('set_leverage')
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self._call('create_order')
+        with self._lock:
+            best_bid, best_ask = self._best_bid_ask(symbol)
+            if price is None:
+                # priceMatch QUEUE
+                price = best_bid if side == 'buy' else best_ask
+            order = {
+                'id': str(next(self._order_ids)),
+                'symbol': symbol,
+                'side': side,
+                'amount': float(amount),
+                'price': price,
+                'filled': 0.0,
+                'status': 'open',
+                'reduceOnly': params.get('reduceOnly') == 'true',
+                'timestamp': int(self._clock.time() * 1000),
+            }
+            self._orders[order['id']] = order
+            self.created_orders += 1
+
+            # GTX rejects orders which would take liquidity
+            if (side == 'buy' and price >= best_ask) or (side == 'sell' and price <= best_bid):
+                order['status'] = 'expired'
+                self.rejected_orders += 1
+            else:
+                self._open_order_ids.add(order['id'])
+            return dict(order)
+
+    def cancel_order(self, id, symbol=None, params={}):
+        self._call('cancel_order')
+        with self._lock:
+            order = self._orders.get(id)
+            if order is None or order['status'] != 'open':
+                raise ccxt.OrderNotFound('sim order not found {}'.format(id))
+            order['status'] = 'canceled'
+            self._open_order_ids.discard(id)
+            return dict(order)
+
+    def fetch_order(self, id, symbol=None, params={}):
+        self._call('fetch_order')
+        with self._lock:
+            if id not in self._orders:
+                raise ccxt.OrderNotFound('sim order not found {}'.format(id))
+            return dict(self._orders[id])
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._call('fetch_open_orders')
+        with self._lock:
+            return [
+                dict(self._orders[x]) for x in sorted(self._open_order_ids)
+                if symbol is None or self._orders[x]['symbol'] == symbol
+            ]
+
+    def fetch_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._call('fetch_orders')
+        with self._lock:
+            return [
+                dict(x) for x in self._orders.values()
+                if (symbol is None or x['symbol'] == symbol)
+                and (since is None or x['timestamp'] >= since)
+            ]
+
+    def fetch_closed_orders(self, symbol=None, since=None, limit=None, params={}):
+        return [x for x in self.fetch_orders(symbol, since, limit, params) if x['status'] != 'open']
+
+
+def synthetic_prices(ccxt_symbols, start, end, interval=60, volatility=0.001, seed=0):
+    # geometric random walk per symbol indexed by unix time
+    rs = np.random.RandomState(seed)
+    index = np.arange(start, end + interval, interval, dtype=float)
+    returns = rs.normal(0, volatility, size=(index.shape[0], len(ccxt_symbols)))
+    initial = 10 ** rs.uniform(0, 4, size=len(ccxt_symbols))
+    prices = initial * np.exp(np.cumsum(returns, axis=0))
+    return pd.DataFrame(prices, index=index, columns=ccxt_symbols)
+
+
+def load_prices(path):
+    # csv with timestamp (unix seconds), symbol (ccxt symbol), price columns
+    df = pd.read_csv(path)
+    df = df.pivot_table(index='timestamp', columns='symbol', values='price')
+    df.index = df.index.astype(float)
+    return df.sort_index().ffill().bfill()
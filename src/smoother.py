@@ -2,60 +2,211 @@ import json
 import os
 import tempfile
 import time
+import numpy as np
 
 
 class NullSmoother:
     def step(self, key, value, t=None):
         return value
 
+    def step_many(self, keys, values, t=None):
+        return np.array(values, dtype=float)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
 
 class Smoother:
-    def __init__(self, logger, halflife, reset_threshold, save_path):
+    # states are persisted write-behind.
+    # step only marks keys dirty. flush appends them to a journal
+    # (save_path + '.journal') and the journal is compacted into save_path
+    # with an atomic os.replace when it grows beyond compact_threshold lines.
+    # journal entries are absolute values, so replaying a journal over
+    # a snapshot taken after it gives the same states.
+    # reset_scope 'global' clears all keys when one jumps. 'key' restarts only that key
+    def __init__(self, logger, halflife, reset_threshold, save_path,
+                 compact_threshold=1000, reset_scope='global'):
+        if reset_scope not in ['key', 'global']:
+            raise ValueError('unknown reset_scope {}'.format(reset_scope))
         self._logger = logger
         self._halflife = halflife
         self._reset_threshold = reset_threshold
+        self._reset_scope = reset_scope
         self._save_path = save_path
+        self._compact_threshold = compact_threshold
+        self._journal_path = None if save_path is None else save_path + '.journal'
+        self._journal_lines = 0
+        self._pending = []
+        self._clear()
 
         try:
             with open(save_path) as f:
-                self._states = json.load(f)
-            _validate_states(self._states)
+                states = json.load(f)
+            _validate_states(states)
+            for key in states:
+                self._set(key, states[key]['value'], states[key]['t'])
         except:
-            self._states = {}
+            self._clear()
+
+        if self._journal_path is not None and os.path.exists(self._journal_path):
+            self._replay_journal()
+            # drops a torn last line before appending
+            self._compact()
+
+    @property
+    def _states(self):
+        return {
+            key: {
+                'value': float(self._values[i]),
+                't': float(self._ts[i]),
+            }
+            for i, key in enumerate(self._keys)
+        }
 
     def step(self, key, value, t=None):
+        return float(self.step_many([key], [value], t=t)[0])
+
+    def step_many(self, keys, values, t=None):
+        # ewma of all keys in one pass. returns smoothed values in the order of keys
         if t is None:
             t = time.time()
 
-        value = float(value)
+        values = np.array(values, dtype=float)
         t = float(t)
 
-        if key in self._states:
-            old_value = self._states[key]['value']
-            if abs(value - old_value) > self._reset_threshold * old_value:
-                self._logger.info(f'Smoother reset key {key} value {value} old_value {old_value}')
-                self._states = {}
+        indices = np.array([self._key_index.get(key, -1) for key in keys], dtype=np.int64)
+        exists = indices >= 0
+        old_values = self._values[indices[exists]]
+        reset = np.zeros(len(keys), dtype=bool)
+        reset[exists] = np.abs(values[exists] - old_values) > self._reset_threshold * old_values
 
-        if key not in self._states:
-            self._states[key] = {
-                'value': value,
-                't': t,
-            }
-        else:
-            s = self._states[key]
-            elapsed = t - s['t']
-            alpha = 1 - 0.5 ** (elapsed / self._halflife)
-            s['value'] = (1 - alpha) * s['value'] + alpha * value
-            s['t'] = t
+        if self._reset_scope == 'global' and reset.any():
+            # same as step for each key in order. the first reset clears all keys.
+            # keys before it are smoothed but not kept, keys after it start from their values
+            first = np.nonzero(reset)[0][0]
+            self._log_reset(keys[first], values[first], self._values[indices[first]])
+            smoothed = values.copy()
+            before = exists[:first]
+            smoothed[:first][before] = self._ewma(indices[:first][before], values[:first][before], t)
+            self._clear()
+            for key, value in zip(keys[first:], values[first:]):
+                self._set(key, value, t)
+            if self._save_path is not None:
+                self._pending = [None] + list(keys[first:])
+            return smoothed
+
+        for i in np.nonzero(reset)[0]:
+            self._log_reset(keys[i], values[i], self._values[indices[i]])
+        update = exists & ~reset
+
+        for i in np.nonzero(~exists)[0]:
+            indices[i] = self._add(keys[i])
+
+        self._values[indices[update]] = self._ewma(indices[update], values[update], t)
+        self._values[indices[~update]] = values[~update]
+        self._ts[indices] = t
 
         if self._save_path is not None:
-            with tempfile.TemporaryDirectory() as dir:
-                tmp_path = os.path.join(dir, 'states.json')
-                with open(tmp_path, 'w') as f:
-                    json.dump(self._states, f, indent=4, sort_keys=True)
-                os.replace(tmp_path, self._save_path)
+            self._pending += list(keys)
+
+        return self._values[indices]
+
+    def _ewma(self, indices, values, t):
+        elapsed = t - self._ts[indices]
+        alpha = 1 - 0.5 ** (elapsed / self._halflife)
+        return (1 - alpha) * self._values[indices] + alpha * values
 
-        return self._states[key]['value']
+    def _log_reset(self, key, value, old_value):
+        self._logger.info(f'Smoother reset key {key} value {value} old_value {old_value}')
+
+    def _clear(self):
+        self._keys = []
+        self._key_index = {}
+        self._values = np.zeros(0)
+        self._ts = np.zeros(0)
+
+    def _add(self, key):
+        index = self._key_index.get(key)
+        if index is None:
+            index = len(self._keys)
+            self._keys.append(key)
+            self._key_index[key] = index
+            self._values = np.append(self._values, np.nan)
+            self._ts = np.append(self._ts, np.nan)
+        return index
+
+    def _set(self, key, value, t):
+        index = self._add(key)
+        self._values[index] = float(value)
+        self._ts[index] = float(t)
+
+    def flush(self):
+        if self._save_path is None or len(self._pending) == 0:
+            return
+
+        lines = []
+        written = set()
+        # later entries win. only the last of each key after the last reset is needed
+        for key in reversed(self._pending):
+            if key is None:
+                lines.append('null\n')
+                break
+            if key in written:
+                continue
+            written.add(key)
+            i = self._key_index[key]
+            lines.append(json.dumps([key, float(self._values[i]), float(self._ts[i])]) + '\n')
+        self._pending = []
+
+        with open(self._journal_path, 'a') as f:
+            f.write(''.join(reversed(lines)))
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_lines += len(lines)
+
+        if self._journal_lines >= self._compact_threshold:
+            self._compact()
+
+    def close(self):
+        if self._save_path is None:
+            return
+        self.flush()
+        self._compact()
+
+    def _replay_journal(self):
+        with open(self._journal_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if entry is None:
+                        self._clear()
+                        continue
+                    key, value, t = entry
+                    self._set(key, value, t)
+                except Exception as e:
+                    # only the last line can be torn by a crash during append
+                    self._logger.warning(f'Smoother journal broken line ignored {e}')
+                    break
+
+    def _compact(self):
+        dir = os.path.dirname(os.path.abspath(self._save_path))
+        fd, tmp_path = tempfile.mkstemp(dir=dir, prefix='.smoother')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._states, f, separators=(',', ':'), sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._save_path)
+        except:
+            os.remove(tmp_path)
+            raise
+        # a crash before this replays the journal over the new snapshot, which is harmless
+        if os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
+        self._journal_lines = 0
 
 
 def _validate_states(states):
@@ -0,0 +1,50 @@
+import sys
+from .utils import ccxt_symbol_suffix, ccxt_symbol_to_symbol
+
+
+class SymbolRegistry:
+    # symbol <-> ccxt symbol tables of one exchange built once per markets load.
+    # symbols missing from the markets are converted by suffix once
+    def __init__(self, exchange=None, ccxt_symbols=()):
+        self._exchange = exchange
+        self._suffix = None
+        self._to_ccxt = {}
+        self._to_symbol = {}
+        self._known = set()
+
+        for ccxt_symbol in ccxt_symbols:
+            if not ccxt_symbol.endswith(self.suffix()):
+                continue
+            ccxt_symbol = sys.intern(ccxt_symbol)
+            symbol = sys.intern(ccxt_symbol[:-len(self._suffix)])
+            self._to_ccxt[symbol] = ccxt_symbol
+            self._to_symbol[ccxt_symbol] = symbol
+            self._known.add(symbol)
+
+    def suffix(self):
+        # resolved lazily. unsupported exchanges fail on first conversion like symbol_to_ccxt_symbol
+        if self._suffix is None:
+            self._suffix = ccxt_symbol_suffix(self._exchange)
+        return self._suffix
+
+    def __len__(self):
+        return len(self._known)
+
+    def to_ccxt(self, symbol):
+        ccxt_symbol = self._to_ccxt.get(symbol)
+        if ccxt_symbol is None:
+            ccxt_symbol = sys.intern(symbol + self.suffix())
+            symbol = sys.intern(symbol)
+            self._to_ccxt[symbol] = ccxt_symbol
+            self._to_symbol.setdefault(ccxt_symbol, symbol)
+        return ccxt_symbol
+
+    def to_symbol(self, ccxt_symbol):
+        symbol = self._to_symbol.get(ccxt_symbol)
+        if symbol is None:
+            symbol = sys.intern(ccxt_symbol_to_symbol(ccxt_symbol))
+            self._to_symbol[sys.intern(ccxt_symbol)] = symbol
+        return symbol
+
+    def exists(self, symbol):
+        return symbol in self._known
@@ -5,7 +5,7 @@ import numpy as np
 from ccxt.base.errors import BadRequest
 
 def create_ccxt_client(exchange, api_key=None, api_secret=None,
-                       api_password=None, subaccount=None):
+                       api_password=None, subaccount=None, ccxt_module=ccxt):
     headers = {}
     options = {}
 
@@ -14,7 +14,7 @@ def create_ccxt_client(exchange, api_key=None, api_secret=None,
     if exchange == 'binance':
         options['defaultType'] = 'future'
 
-    client = getattr(ccxt, exchange)({
+    client = getattr(ccxt_module, exchange)({
         'apiKey': api_key,
         'secret': api_secret,
         'password': api_password,
@@ -24,50 +24,71 @@ def create_ccxt_client(exchange, api_key=None, api_secret=None,
 
     if exchange == 'binance':
         _override_binance_create_order_request(client)
+        # account-wide open orders sync
+        client.options['warnOnFetchOpenOrdersWithoutSymbol'] = False
 
     return client
 
-def symbol_to_ccxt_symbol(symbol, exchange):
-    if exchange == 'ftx':
-        return symbol + '/USD:USD'
-    elif exchange == 'binance':
-        return symbol + '/USDT:USDT'
-    elif exchange == 'bybit':
-        return symbol + '/USDT:USDT'
-    elif exchange == 'okx':
-        return symbol + '/USDT:USDT'
-    elif exchange == 'kucoinfutures':
-        return symbol + '/USDT:USDT'
-    elif exchange == 'bitflyer':
-        return symbol + '/JPY:JPY'
-    else:
+# quote suffix of the linear perpetual ccxt symbols traded on each exchange
+CCXT_SYMBOL_SUFFIXES = {
+    'ftx': '/USD:USD',
+    'binance': '/USDT:USDT',
+    'bybit': '/USDT:USDT',
+    'okx': '/USDT:USDT',
+    'kucoinfutures': '/USDT:USDT',
+    'bitflyer': '/JPY:JPY',
+}
+
+def ccxt_symbol_suffix(exchange):
+    suffix = CCXT_SYMBOL_SUFFIXES.get(exchange)
+    if suffix is None:
         raise Exception('not implemented')
+    return suffix
+
+
+def symbol_to_ccxt_symbol(symbol, exchange):
+    return symbol + ccxt_symbol_suffix(exchange)
 
 
 def ccxt_symbol_to_symbol(symbol):
+    # memoized per exchange and markets load by SymbolRegistry
     return symbol.replace('/USD:USD', '').replace('/USDT', '').replace(':USDT', '').replace('/JPY:JPY', '')
 
 
 def normalize_amount(x, price=None, market=None, reduce_only=False):
-    if x < 0:
-        return -normalize_amount(-x, price=price, market=market, reduce_only=reduce_only)
-
     limits = market['limits']['amount']
     cost_limits = market['limits']['cost']
+    return normalize_amount_by_limits(
+        x,
+        price=price,
+        amount_min=limits.get('min'),
+        amount_max=limits.get('max'),
+        cost_min=cost_limits.get('min'),
+        precision=market['precision']['amount'],
+        reduce_only=reduce_only,
+    )
+
+
+def normalize_amount_by_limits(x, price=None, amount_min=None, amount_max=None,
+                               cost_min=None, precision=None, reduce_only=False):
+    if x < 0:
+        return -normalize_amount_by_limits(
+            -x, price=price, amount_min=amount_min, amount_max=amount_max,
+            cost_min=cost_min, precision=precision, reduce_only=reduce_only)
 
     if not reduce_only:
-        if 'min' in cost_limits and cost_limits['min'] is not None:
-            if x * price < 2 * cost_limits['min']:  # 2: safety factor
+        if cost_min is not None:
+            if x * price < 2 * cost_min:  # 2: safety factor
                 x = 0.0
 
-        if 'min' in limits and limits['min'] is not None:
-            if x < limits['min']:
+        if amount_min is not None:
+            if x < amount_min:
                 x = 0.0
 
-    if 'max' in limits and limits['max'] is not None:
-        x = min(limits['max'], x)
+    if amount_max is not None:
+        x = min(amount_max, x)
 
-    return round_precision(x, market['precision']['amount'])
+    return round_precision(x, precision)
 
 
 def round_precision(x, precision):
@@ -80,19 +101,32 @@ def round_precision(x, precision):
 def fetch_positions(client):
     if client.id == 'bitflyer':
         res = client.privateGetGetpositions({'product_code': 'FX_BTC_JPY'})
-        pos = 0.0
-        for item in res:
-            pos += float(item['size']) * (1 if item['side'] == 'BUY' else -1)
-        df = pd.DataFrame([
-            {
-                'symbol': 'BTC/JPY:JPY',
-                'position': pos,
-            }
-        ])
-        df = df.set_index('symbol')
-        return df
-
-    poss = client.fetch_positions()
+        return _bitflyer_positions_to_df(res)
+    return _positions_to_df(client.fetch_positions())
+
+
+async def fetch_positions_async(client):
+    if client.id == 'bitflyer':
+        res = await client.privateGetGetpositions({'product_code': 'FX_BTC_JPY'})
+        return _bitflyer_positions_to_df(res)
+    return _positions_to_df(await client.fetch_positions())
+
+
+def _bitflyer_positions_to_df(res):
+    pos = 0.0
+    for item in res:
+        pos += float(item['size']) * (1 if item['side'] == 'BUY' else -1)
+    df = pd.DataFrame([
+        {
+            'symbol': 'BTC/JPY:JPY',
+            'position': pos,
+        }
+    ])
+    df = df.set_index('symbol')
+    return df
+
+
+def _positions_to_df(poss):
     df = pd.DataFrame(poss)
     if df.shape[0] == 0:
         return pd.DataFrame(columns=['symbol', 'position']).set_index('symbol')
@@ -111,29 +145,51 @@ def fetch_tickers(client):
 
 
 def fetch_collateral(client, account_type=None):
+    method, params, parse = _collateral_request(client, account_type)
+    return parse(method(params))
+
+
+async def fetch_collateral_async(client, account_type=None):
+    method, params, parse = _collateral_request(client, account_type)
+    return parse(await method(params))
+
+
+def _collateral_request(client, account_type):
     if client.id == 'ftx':
-        res = client.privateGetAccount()
-        return float(res['result']['collateral'])
+        return (
+            client.privateGetAccount, {},
+            lambda res: float(res['result']['collateral'])
+        )
     elif client.id == 'binance':
-        res = client.fapiPrivateV2GetAccount()
-        return float(res['totalMarginBalance'])
+        return (
+            client.fapiPrivateV2GetAccount, {},
+            lambda res: float(res['totalMarginBalance'])
+        )
     elif client.id == 'bybit':
-        res = client.privateGetV5AccountWalletBalance({
-            'accountType': 'UNIFIED' if account_type == 'unified' else 'CONTRACT',
-            'coin': 'USDT',
-        })
-        return float(res['result']['list'][0]['coin'][0]['equity'])
+        return (
+            client.privateGetV5AccountWalletBalance, {
+                'accountType': 'UNIFIED' if account_type == 'unified' else 'CONTRACT',
+                'coin': 'USDT',
+            },
+            lambda res: float(res['result']['list'][0]['coin'][0]['equity'])
+        )
     elif client.id == 'okx':
-        res = client.privateGetAccountBalance()
-        return float(res['data'][0]['totalEq'])
+        return (
+            client.privateGetAccountBalance, {},
+            lambda res: float(res['data'][0]['totalEq'])
+        )
     elif client.id == 'kucoinfutures':
-        res = client.futuresPrivateGetAccountOverview({
-            'currency': 'USDT'
-        })
-        return float(res['data']['accountEquity'])
+        return (
+            client.futuresPrivateGetAccountOverview, {
+                'currency': 'USDT'
+            },
+            lambda res: float(res['data']['accountEquity'])
+        )
     elif client.id == 'bitflyer':
-        res = client.privateGetGetcollateral()
-        return float(res['collateral']) + float(res['open_position_pnl'])
+        return (
+            client.privateGetGetcollateral, {},
+            lambda res: float(res['collateral']) + float(res['open_position_pnl'])
+        )
     else:
         raise Exception('not implemented')
 
@@ -151,19 +207,15 @@ def cancel_all_orders(client, symbol):
 
 
 def set_leverage(client, market, leverage, logger=None):
-    symbol = market['symbol']
-    max_leverage = market['limits']['leverage']['max']
-    if max_leverage is not None:
-        leverage = min(leverage, max_leverage)
+    symbol = market.ccxt_symbol
+    leverage = _cap_leverage(market, leverage)
 
     if client.id == 'kucoinfutures':
-        tiers = client.fetch_market_leverage_tiers(symbol)
-        tiers = [x for x in tiers if x['maxLeverage'] >= leverage]
-        tier = min(tiers, key=itemgetter('maxLeverage'))
+        tier = _select_leverage_tier(client.fetch_market_leverage_tiers(symbol), leverage)
         if logger is not None:
             logger.debug(f'futuresPrivatePostPositionRiskLimitLevelChange symbol {symbol} tier {tier}')
         client.futuresPrivatePostPositionRiskLimitLevelChange({
-            'symbol': market['id'],
+            'symbol': market.id,
             'level': tier['tier'],
         })
         return
@@ -176,6 +228,39 @@ def set_leverage(client, market, leverage, logger=None):
         raise
 
 
+async def set_leverage_async(client, market, leverage, logger=None):
+    symbol = market.ccxt_symbol
+    leverage = _cap_leverage(market, leverage)
+
+    if client.id == 'kucoinfutures':
+        tier = _select_leverage_tier(await client.fetch_market_leverage_tiers(symbol), leverage)
+        if logger is not None:
+            logger.debug(f'futuresPrivatePostPositionRiskLimitLevelChange symbol {symbol} tier {tier}')
+        await client.futuresPrivatePostPositionRiskLimitLevelChange({
+            'symbol': market.id,
+            'level': tier['tier'],
+        })
+        return
+
+    try:
+        await client.set_leverage(leverage, symbol)
+    except BadRequest as e:
+        if 'leverage not modified' in e.args[0]:
+            return
+        raise
+
+
+def _cap_leverage(market, leverage):
+    if market.max_leverage is not None:
+        leverage = min(leverage, market.max_leverage)
+    return leverage
+
+
+def _select_leverage_tier(tiers, leverage):
+    tiers = [x for x in tiers if x['maxLeverage'] >= leverage]
+    return min(tiers, key=itemgetter('maxLeverage'))
+
+
 def _override_binance_create_order_request(client):
     old_method = client.create_order_request
 
@@ -0,0 +1,78 @@
+from unittest import TestCase
+import dataset
+import pandas as pd
+import sqlalchemy
+from src.alphapool_query import DatasetRowsSource
+
+
+def create_table(json_type=sqlalchemy.JSON, timestamp_type=sqlalchemy.BigInteger):
+    # same columns as the alphapool positions table
+    db = dataset.connect('sqlite:///:memory:')
+    metadata = sqlalchemy.MetaData()
+    sqlalchemy.Table(
+        'positions', metadata,
+        sqlalchemy.Column('model_id', sqlalchemy.String(64)),
+        sqlalchemy.Column('timestamp', timestamp_type),
+        sqlalchemy.Column('positions', json_type),
+        sqlalchemy.Column('weights', json_type),
+        sqlalchemy.Column('orders', json_type),
+    )
+    metadata.create_all(db.executable)
+    return db['positions']
+
+
+def to_datetime(t):
+    return pd.to_datetime(t, utc=True, unit='s')
+
+
+class TestAlphapoolQueryDatasetRowsSource(TestCase):
+    def test_fetch(self):
+        table = create_table()
+        table.insert_many([
+            {'model_id': 'model1', 'timestamp': 0, 'positions': {'BTC': 2.0}, 'weights': {}, 'orders': {}},
+            {'model_id': 'model1', 'timestamp': 300, 'positions': {'BTC': 1.0}, 'weights': {}, 'orders': {'BTC': []}},
+            {'model_id': 'model2', 'timestamp': 300, 'positions': {'ETH': 1.0}, 'weights': {}, 'orders': None},
+            {'model_id': 'model3', 'timestamp': 300, 'positions': {'XRP': 1.0}, 'weights': {}, 'orders': {}},
+            {'model_id': 'pf', 'timestamp': 600, 'positions': {}, 'weights': {'model1': 1.0}, 'orders': {}},
+        ])
+        source = DatasetRowsSource(table=table)
+
+        df = source.fetch(300, ['model1', 'model2'], ['positions', 'orders'])
+        self.assertEqual(list(df.index), [
+            (to_datetime(300), 'model1'),
+            (to_datetime(300), 'model2'),
+        ])
+        self.assertEqual(list(df['positions']), [{'BTC': 1.0}, {'ETH': 1.0}])
+        self.assertEqual(list(df['orders']), [{'BTC': []}, {}])
+        # not fetched
+        self.assertEqual(list(df['weights']), [{}, {}])
+
+        df = source.fetch(None, ['pf'], ['weights'])
+        self.assertEqual(list(df.index), [(to_datetime(600), 'pf')])
+        self.assertEqual(list(df['weights']), [{'model1': 1.0}])
+
+    def test_not_dict(self):
+        # json stored as text must not be read as empty positions
+        table = create_table(json_type=sqlalchemy.Text)
+        table.insert({'model_id': 'model1', 'timestamp': 300, 'positions': '{"BTC": 1.0}', 'weights': '{}', 'orders': '{}'})
+        source = DatasetRowsSource(table=table)
+
+        with self.assertRaises(ValueError):
+            source.fetch(None, ['model1'], ['positions', 'orders'])
+
+    def test_datetime_timestamp(self):
+        table = create_table(timestamp_type=sqlalchemy.DateTime)
+        table.insert_many([
+            {'model_id': 'model1', 'timestamp': to_datetime(t).to_pydatetime().replace(tzinfo=None),
+             'positions': {'BTC': 1.0}, 'weights': {}, 'orders': {}}
+            for t in [0, 300]
+        ])
+        source = DatasetRowsSource(table=table)
+
+        df = source.fetch(300, ['model1'], ['positions'])
+        self.assertEqual(list(df.index), [(to_datetime(300), 'model1')])
+
+    def test_timestamp_type_not_supported(self):
+        table = create_table(timestamp_type=sqlalchemy.String(32))
+        with self.assertRaises(ValueError):
+            DatasetRowsSource(table=table)
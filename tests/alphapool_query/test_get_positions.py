@@ -0,0 +1,151 @@
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+import pandas as pd
+from src.alphapool_query import PortfolioPositionsClient, FrameRowsSource
+from src.logger import create_logger
+from src.positions_cache import PositionsCache
+
+
+def create_df(rows):
+    df = pd.DataFrame(rows, columns=['model_id', 'timestamp', 'positions', 'weights', 'orders'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, unit='s')
+    return df.set_index(['timestamp', 'model_id']).sort_index()
+
+
+class RecordingSource(FrameRowsSource):
+    def __init__(self, alphapool_client):
+        super().__init__(alphapool_client=alphapool_client)
+        self.calls = []
+
+    def fetch(self, min_timestamp, model_ids, columns):
+        self.calls.append((min_timestamp, sorted(model_ids), columns))
+        return super().fetch(min_timestamp, model_ids, columns)
+
+
+class StoredClient:
+    def __init__(self, df):
+        self.df = df
+
+    def get_positions(self, min_timestamp=None):
+        timestamps = self.df.index.get_level_values('timestamp')
+        return self.df.loc[timestamps >= pd.to_datetime(min_timestamp, unit='s', utc=True)]
+
+
+class TestAlphapoolQueryGetPositions(TestCase):
+    def test_ok(self):
+        alphapool_client = StoredClient(create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {'BTC': []}),
+            ('model2', 300, {'ETH': 1.0}, {}, {}),
+            ('model3', 300, {'XRP': 1.0}, {}, {}),
+            ('pf', 300, {}, {'model1': 0.5, 'model2': 0.5}, {}),
+            ('pf-other', 300, {}, {'model3': 1.0}, {}),
+        ]))
+        source = RecordingSource(alphapool_client)
+        client = PortfolioPositionsClient(
+            source=source,
+            portfolio_model_ids=['pf'],
+            logger=create_logger('debug'),
+            window=1000,
+        )
+
+        with mock.patch('time.time', MagicMock(return_value=1000)):
+            df = client.get_positions(min_timestamp=0)
+        self.assertEqual(source.calls, [
+            (0, ['pf'], ['weights']),
+            (0, ['model1', 'model2'], ['positions', 'orders']),
+        ])
+        pd.testing.assert_frame_equal(df, create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {'BTC': []}),
+            ('model2', 300, {'ETH': 1.0}, {}, {}),
+            ('pf', 300, {}, {'model1': 0.5, 'model2': 0.5}, {}),
+        ]))
+
+        # model3 is added and backfilled for the window
+        alphapool_client.df = pd.concat([alphapool_client.df, create_df([
+            ('model1', 600, {'BTC': 2.0}, {}, {}),
+            ('model3', 600, {'XRP': 2.0}, {}, {}),
+            ('pf', 600, {}, {'model3': 1.0}, {}),
+        ])]).sort_index()
+        source.calls = []
+        with mock.patch('time.time', MagicMock(return_value=1200)):
+            df = client.get_positions(min_timestamp=500)
+        self.assertEqual(source.calls, [
+            (500, ['pf'], ['weights']),
+            (500, ['model1', 'model2'], ['positions', 'orders']),
+            (200, ['model3'], ['positions', 'orders']),
+        ])
+        self.assertEqual(sorted(df.index.tolist()), sorted(create_df([
+            ('model1', 600, {}, {}, {}),
+            ('model3', 300, {}, {}, {}),
+            ('model3', 600, {}, {}, {}),
+            ('pf', 600, {}, {}, {}),
+        ]).index.tolist()))
+
+        # weights older than the window are forgotten
+        source.calls = []
+        with mock.patch('time.time', MagicMock(return_value=1400)):
+            client.get_positions(min_timestamp=500)
+        self.assertEqual(source.calls, [
+            (500, ['pf'], ['weights']),
+            (500, ['model3'], ['positions', 'orders']),
+        ])
+
+    def test_positions_cache(self):
+        alphapool_client = StoredClient(create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {}),
+            ('model2', 300, {'ETH': 1.0}, {}, {}),
+            ('pf', 300, {}, {'model1': 1.0}, {}),
+        ]))
+        cache = PositionsCache(
+            alphapool_client=PortfolioPositionsClient(
+                source=FrameRowsSource(alphapool_client=alphapool_client),
+                portfolio_model_ids=['pf'],
+                logger=create_logger('debug'),
+            ),
+            logger=create_logger('debug'),
+        )
+        with mock.patch('time.time', MagicMock(return_value=1000)):
+            cache.update(1000)
+        self.assertEqual(sorted(cache.latest_rows()), ['model1', 'pf'])
+
+    def test_backfill_evicted_by_timestamp(self):
+        alphapool_client = StoredClient(create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {}),
+            ('model2', 300, {'ETH': 1.0}, {}, {}),
+            ('pf', 300, {}, {'model1': 1.0}, {}),
+            ('model1', 900, {'BTC': 2.0}, {}, {}),
+        ]))
+        cache = PositionsCache(
+            alphapool_client=PortfolioPositionsClient(
+                source=FrameRowsSource(alphapool_client=alphapool_client),
+                portfolio_model_ids=['pf'],
+                logger=create_logger('debug'),
+                window=1000,
+            ),
+            logger=create_logger('debug'),
+            window=1000,
+        )
+        with mock.patch('time.time', MagicMock(return_value=1000)):
+            cache.update(1000)
+
+        # model2 is added to the weights later and backfilled behind the newer rows
+        alphapool_client.df = pd.concat([alphapool_client.df, create_df([
+            ('pf', 1000, {}, {'model1': 0.5, 'model2': 0.5}, {}),
+        ])]).sort_index()
+        with mock.patch('time.time', MagicMock(return_value=1100)):
+            cache.update(1100)
+        self.assertEqual([(x.timestamp.value // 10 ** 9, x.model_id) for x in cache.rows()], [
+            (300, 'model1'),
+            (300, 'pf'),
+            (300, 'model2'),
+            (900, 'model1'),
+            (1000, 'pf'),
+        ])
+
+        with mock.patch('time.time', MagicMock(return_value=1400)):
+            cache.update(1400)
+        self.assertEqual([(x.timestamp.value // 10 ** 9, x.model_id) for x in cache.rows()], [
+            (900, 'model1'),
+            (1000, 'pf'),
+        ])
+        self.assertEqual(sorted(cache.latest_rows()), ['model1', 'pf'])
@@ -0,0 +1,84 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import MagicMock, AsyncMock
+import ccxt
+import ccxt.async_support
+from src.api_accounting import ApiAccounting, ApiBudgetExceeded
+from src.logger import create_logger
+from src.utils import create_ccxt_client
+
+
+def create_client(ccxt_module=ccxt, mock_class=MagicMock):
+    client = create_ccxt_client(exchange='binance', ccxt_module=ccxt_module)
+    client.fetch = mock_class(return_value={'serverTime': 0})
+    client.last_response_headers = {'X-MBX-USED-WEIGHT-1M': '12'}
+    return client
+
+
+class TestApiAccounting(TestCase):
+    def test_count(self):
+        client = create_client()
+        accounting = ApiAccounting(logger=create_logger('debug'))
+        accounting.install(client)
+
+        client.fapiPublicGetTime()
+        client.fapiPublicGetTime()
+        accounting.log_summary()
+
+        summary = accounting.summary()
+        self.assertEqual(summary['loop']['GET fapiPublic time']['count'], 2)
+        self.assertEqual(summary['loop_cost'], 2)
+        self.assertEqual(summary['weights'], {'x-mbx-used-weight-1m': '12'})
+
+        accounting.begin_loop()
+        summary = accounting.summary()
+        self.assertEqual(summary['loop'], {})
+        self.assertEqual(summary['total']['GET fapiPublic time']['count'], 2)
+
+    def test_error(self):
+        client = create_client()
+        client.fetch = MagicMock(side_effect=ccxt.NetworkError('error'))
+        accounting = ApiAccounting(logger=create_logger('debug'))
+        accounting.install(client)
+
+        with self.assertRaises(ccxt.NetworkError):
+            client.fapiPublicGetTime()
+
+        stats = accounting.summary()['loop']['GET fapiPublic time']
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['errors'], 1)
+
+    def test_budget(self):
+        client = create_client()
+        accounting = ApiAccounting(logger=create_logger('debug'), budget=1)
+        accounting.install(client)
+
+        client.fapiPublicGetTime()
+        with accounting.non_critical():
+            with self.assertRaises(ApiBudgetExceeded):
+                client.fapiPublicGetTime()
+        # critical calls are never deferred
+        client.fapiPublicGetTime()
+
+        summary = accounting.summary()
+        self.assertEqual(client.fetch.call_count, 2)
+        self.assertEqual(summary['deferred'], 1)
+
+        accounting.begin_loop()
+        with accounting.non_critical():
+            client.fapiPublicGetTime()
+
+    def test_async(self):
+        client = create_client(ccxt.async_support, AsyncMock)
+        accounting = ApiAccounting(logger=create_logger('debug'), budget=1)
+        accounting.install(client)
+
+        async def run():
+            await client.fapiPublicGetTime()
+            with accounting.non_critical():
+                with self.assertRaises(ApiBudgetExceeded):
+                    await client.fapiPublicGetTime()
+            await client.close()
+
+        asyncio.run(run())
+        self.assertEqual(accounting.summary()['loop']['GET fapiPublic time']['count'], 1)
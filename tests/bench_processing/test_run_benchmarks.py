@@ -0,0 +1,15 @@
+from unittest import TestCase
+from src.bench_processing import run_benchmarks
+
+
+class TestBenchProcessingRunBenchmarks(TestCase):
+    def test_ok(self):
+        report = run_benchmarks(n_models=3, n_symbols=4, days=0.1, n_portfolios=1)
+        self.assertEqual(
+            [x['name'] for x in report['results']],
+            ['preprocess_df', 'asfreq_positions', 'calc_portfolio_positions', 'calc_model_ret', 'pipeline'],
+        )
+        for result in report['results']:
+            self.assertGreater(result['seconds'], 0)
+            self.assertGreater(result['peak_memory_bytes'], 0)
+        self.assertEqual(report['params']['models'], 3)
@@ -3,6 +3,8 @@ from unittest.mock import MagicMock
 import pandas as pd
 from src.bot_maker import BotMaker
 from src.logger import create_logger
+from src.order_book import StreamOrderBookProvider, LocalOrderBookFeed
+from src.smoother import NullSmoother
 from src.utils import create_ccxt_client
 
 
@@ -10,14 +12,29 @@ get_account_response_binance = {
     'totalMarginBalance': '10000.0',
 }
 
+fetch_markets_response_binance = [{
+    'symbol': 'BTC/USDT:USDT',
+    'id': 'BTCUSDT',
+    'contractSize': 1.0,
+    'limits': {
+        'amount': {'min': 0.001, 'max': 1000.0},
+        'cost': {'min': 5.0},
+        'leverage': {'min': 1.0, 'max': 125.0},
+    },
+    'precision': {'amount': 3, 'price': 1},
+}]
+
 fetch_positions_response_binance = [{
-    'symbol': 'BTC/USDT',
+    'symbol': 'BTC/USDT:USDT',
     'side': 'long',
     'contracts': 1,
 }]
 
-fetch_ticker_response_binance = {
-    'last': 10000.0
+fetch_tickers_response_binance = {
+    'BTC/USDT:USDT': {
+        'symbol': 'BTC/USDT:USDT',
+        'last': 10000.0,
+    }
 }
 
 fetch_order_book_response_binance = {
@@ -32,6 +49,38 @@ fetch_order_book_response_binance = {
 }
 
 
+def create_alphapool_positions():
+    t = pd.to_datetime('2020/01/01 00:00:00', utc=True).timestamp()
+    df = pd.DataFrame([
+        {
+            'model_id': 'model1',
+            'timestamp': t,
+            'positions': {
+                'BTC': 2.0
+            },
+            'weights': {},
+            'orders': {
+                'BTC': [{
+                    'price': 10000.0,
+                    'amount': 0.5,
+                    'is_buy': True,
+                    'duration': 3600 * 4,
+                }]
+            }
+        }, {
+            'model_id': 'pf-portfolio1',
+            'timestamp': t,
+            'positions': {},
+            'weights': {
+                'model1': 1.0
+            },
+            'orders': {}
+        }
+    ])
+    df['timestamp'] = pd.to_datetime(df["timestamp"], utc=True, unit='s')
+    return df.set_index(['timestamp', 'model_id']).sort_index()
+
+
 class TestBotMakerStep(TestCase):
     @mock.patch('time.time', mock.MagicMock(return_value=pd.to_datetime('2020/01/01 3:00:00', utc=True).timestamp()))
     def test_step_binance(self):
@@ -39,8 +88,9 @@ class TestBotMakerStep(TestCase):
 
         client = create_ccxt_client(exchange='binance')
         client.fapiPrivateV2GetAccount = MagicMock(return_value=get_account_response_binance)
+        client.fetch_markets = MagicMock(return_value=fetch_markets_response_binance)
         client.fetch_positions = MagicMock(return_value=fetch_positions_response_binance)
-        client.fetch_ticker = MagicMock(return_value=fetch_ticker_response_binance)
+        client.fetch_tickers = MagicMock(return_value=fetch_tickers_response_binance)
         client.fetch_order_book = MagicMock(return_value=fetch_order_book_response_binance)
         client.create_order = MagicMock()
         client.set_leverage = MagicMock()
@@ -77,16 +127,112 @@ class TestBotMakerStep(TestCase):
             leverage=1.0,
             model_id='pf-portfolio1',
             alphapool_client=alphapool_client,
+            unit_pos_smoother=NullSmoother(),
         )
 
         bot._step()
 
         client.create_order.assert_called_with(
-            'BTC/USDT',
+            'BTC/USDT:USDT',
             'limit',
             'buy',
             1.0,
-            9000.0,
-            { 'timeInForce': 'GTX', 'reduceOnly': 'false' }
+            None,
+            { 'timeInForce': 'GTX', 'reduceOnly': 'false', 'priceMatch': 'QUEUE' }
         )
-        client.set_leverage.assert_called_with(10, 'BTC/USDT')
+        client.set_leverage.assert_called_with(10, 'BTC/USDT:USDT')
+        client.fetch_tickers.assert_called_once_with(['BTC/USDT:USDT'])
+
+    @mock.patch('time.time', mock.MagicMock(return_value=pd.to_datetime('2020/01/01 00:01:00', utc=True).timestamp()))
+    def test_step_order_book_stream(self):
+        logger = create_logger('debug')
+
+        client = create_ccxt_client(exchange='binance')
+        client.fapiPrivateV2GetAccount = MagicMock(return_value=get_account_response_binance)
+        client.fetch_markets = MagicMock(return_value=fetch_markets_response_binance)
+        client.fetch_positions = MagicMock(return_value=fetch_positions_response_binance)
+        client.fetch_tickers = MagicMock(return_value=fetch_tickers_response_binance)
+        client.fetch_order_book = MagicMock()
+        client.create_order = MagicMock(return_value={'id': 'order1'})
+        client.set_leverage = MagicMock()
+
+        alphapool_client = MagicMock()
+        alphapool_client.get_positions = MagicMock(return_value=create_alphapool_positions())
+
+        feed = LocalOrderBookFeed()
+        bot = BotMaker(
+            client=client,
+            logger=logger,
+            leverage=1.0,
+            model_id='pf-portfolio1',
+            alphapool_client=alphapool_client,
+            unit_pos_smoother=NullSmoother(),
+            order_book_provider=StreamOrderBookProvider(
+                feed=feed,
+                logger=logger,
+            ),
+        )
+        feed.subscribe(['BTC/USDT:USDT'])
+        feed.publish('BTC/USDT:USDT', 9000.0, 11000.0)
+
+        bot._step()
+
+        # maker order: min(best_bid, price), taker order: bbo
+        client.create_order.assert_has_calls([
+            mock.call(
+                'BTC/USDT:USDT',
+                'limit',
+                'buy',
+                0.5,
+                9000.0,
+                { 'timeInForce': 'GTX', 'reduceOnly': 'false' }
+            ),
+            mock.call(
+                'BTC/USDT:USDT',
+                'limit',
+                'buy',
+                1.0,
+                None,
+                { 'timeInForce': 'GTX', 'reduceOnly': 'false', 'priceMatch': 'QUEUE' }
+            ),
+        ], any_order=True)
+        client.fetch_order_book.assert_not_called()
+
+    def test_step_no_model_update(self):
+        logger = create_logger('debug')
+
+        client = create_ccxt_client(exchange='binance')
+        client.fapiPrivateV2GetAccount = MagicMock(return_value=get_account_response_binance)
+        client.fetch_markets = MagicMock(return_value=fetch_markets_response_binance)
+        client.fetch_positions = MagicMock(return_value=fetch_positions_response_binance)
+        client.fetch_tickers = MagicMock(return_value=fetch_tickers_response_binance)
+        client.fetch_order_book = MagicMock(return_value=fetch_order_book_response_binance)
+        client.fetch_open_orders = MagicMock(return_value=[])
+        client.fetch_order = MagicMock(return_value={'status': 'open', 'filled': 0.0})
+        client.cancel_order = MagicMock()
+        client.create_order = MagicMock(return_value={'id': 'order1'})
+        client.set_leverage = MagicMock()
+
+        alphapool_client = MagicMock()
+        alphapool_client.get_positions = MagicMock(return_value=create_alphapool_positions())
+
+        bot = BotMaker(
+            client=client,
+            logger=logger,
+            leverage=1.0,
+            model_id='pf-portfolio1',
+            alphapool_client=alphapool_client,
+            unit_pos_smoother=NullSmoother(),
+        )
+
+        t = pd.to_datetime('2020/01/01 00:01:00', utc=True).timestamp()
+        with mock.patch('time.time', mock.MagicMock(return_value=t)):
+            bot._step()
+        self.assertEqual(bot._positions, {'model1': {'BTC': 2.0}, 'pf-portfolio1': {}})
+        self.assertEqual(bot._weights, {'model1': 1.0})
+
+        bot._positions = {'model1': {'BTC': 3.0}, 'pf-portfolio1': {}}
+        with mock.patch('time.time', mock.MagicMock(return_value=t + 60)):
+            bot._step()
+        # not reprocessed
+        self.assertEqual(bot._positions, {'model1': {'BTC': 3.0}, 'pf-portfolio1': {}})
@@ -0,0 +1,85 @@
+import asyncio
+from unittest import TestCase, mock
+from unittest.mock import MagicMock, AsyncMock
+import ccxt
+import ccxt.async_support
+import pandas as pd
+from src.bot_maker import BotMaker
+from src.bot_maker_async import AsyncBotMaker
+from src.logger import create_logger
+from src.smoother import NullSmoother
+from src.utils import create_ccxt_client
+from .test_step import (
+    get_account_response_binance,
+    fetch_markets_response_binance,
+    fetch_positions_response_binance,
+    fetch_tickers_response_binance,
+    fetch_order_book_response_binance,
+    create_alphapool_positions,
+)
+
+
+def create_client(ccxt_module, mock_class):
+    client = create_ccxt_client(exchange='binance', ccxt_module=ccxt_module)
+    client.fapiPrivateV2GetAccount = mock_class(return_value=get_account_response_binance)
+    client.fetch_markets = mock_class(return_value=fetch_markets_response_binance)
+    client.fetch_positions = mock_class(return_value=fetch_positions_response_binance)
+    client.fetch_tickers = mock_class(return_value=fetch_tickers_response_binance)
+    client.fetch_order_book = mock_class(return_value=fetch_order_book_response_binance)
+    client.fetch_open_orders = mock_class(return_value=[])
+    client.cancel_order = mock_class()
+    client.create_order = mock_class(return_value={'id': 'order1'})
+    client.set_leverage = mock_class()
+    return client
+
+
+def create_bot(bot_class, client):
+    alphapool_client = MagicMock()
+    alphapool_client.get_positions = MagicMock(return_value=create_alphapool_positions())
+    return bot_class(
+        client=client,
+        logger=create_logger('debug'),
+        leverage=1.0,
+        model_id='pf-portfolio1',
+        alphapool_client=alphapool_client,
+        unit_pos_smoother=NullSmoother(),
+    )
+
+
+class TestBotMakerStepAsync(TestCase):
+    @mock.patch('time.time', mock.MagicMock(return_value=pd.to_datetime('2020/01/01 00:01:00', utc=True).timestamp()))
+    def test_same_as_sync(self):
+        sync_client = create_client(ccxt, MagicMock)
+        sync_bot = create_bot(BotMaker, sync_client)
+        sync_bot._step()
+
+        async_client = create_client(ccxt.async_support, AsyncMock)
+        async_bot = create_bot(AsyncBotMaker, async_client)
+        asyncio.run(async_bot._step_async())
+
+        self.assertEqual(async_client.create_order.await_count, 2)
+        self.assertCountEqual(
+            async_client.create_order.await_args_list,
+            sync_client.create_order.call_args_list,
+        )
+        async_client.set_leverage.assert_awaited_once_with(10, 'BTC/USDT:USDT')
+        async_client.fetch_tickers.assert_awaited_once_with(['BTC/USDT:USDT'])
+        self.assertEqual(
+            [x.exchange_order_id for x in async_bot._limit_orders],
+            [x.exchange_order_id for x in sync_bot._limit_orders],
+        )
+
+    @mock.patch('time.time', mock.MagicMock(return_value=pd.to_datetime('2020/01/01 00:01:00', utc=True).timestamp()))
+    def test_create_order_error(self):
+        client = create_client(ccxt.async_support, AsyncMock)
+        client.create_order = AsyncMock(side_effect=[{'id': 'order1'}, Exception('error')])
+        bot = create_bot(AsyncBotMaker, client)
+
+        with self.assertRaises(Exception):
+            asyncio.run(bot._step_async())
+
+        # created order is tracked, failed order is retried next step
+        self.assertEqual(
+            sorted([str(x.exchange_order_id) for x in bot._limit_orders]),
+            ['None', 'order1'],
+        )
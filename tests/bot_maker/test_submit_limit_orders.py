@@ -0,0 +1,283 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock
+from src.api_accounting import ApiAccounting, ApiBudgetExceeded
+from src.bot_maker import BotMaker, Order
+from src.logger import create_logger
+from src.market_cache import MarketInfo
+from src.order_book import Quote, StreamOrderBookProvider, LocalOrderBookFeed
+from src.order_store import OrderStore
+from src.utils import create_ccxt_client
+from .test_sync_limit_orders import create_binance_market
+
+
+def create_order(symbol, exchange_order_id=None):
+    return Order(
+        timestamp=0,
+        symbol=symbol,
+        price=None,
+        amount=1.0,
+        is_buy=True,
+        reduce_only=False,
+        duration=300,
+        executed_amount=0.0,
+        exchange_order_id=exchange_order_id,
+    )
+
+
+def create_market(ccxt_symbol):
+    return MarketInfo(
+        ccxt_symbol=ccxt_symbol,
+        id=ccxt_symbol,
+        contract_size=1.0,
+        amount_min=0.001,
+        amount_max=1000.0,
+        cost_min=5.0,
+        amount_precision=0.001,
+        price_precision=0.1,
+        max_leverage=125.0,
+    )
+
+
+class TestBotMakerSubmitLimitOrders(TestCase):
+    def create_bot(self):
+        client = MagicMock()
+        client.id = 'binance'
+        return BotMaker(
+            client=client,
+            logger=create_logger('debug'),
+            leverage=1.0,
+            order_concurrency=2,
+            order_rate=1000,
+        )
+
+    def test_ok(self):
+        bot = self.create_bot()
+        bot._limit_orders = OrderStore([
+            create_order('BTC'),
+            create_order('ETH'),
+            create_order('XRP', exchange_order_id='submitted'),
+            create_order('SOL'),
+        ])
+
+        def _create_order(market=None, **kwargs):
+            if market == 'ETH/USDT:USDT':
+                return None
+            return {'id': 'id-' + market}
+
+        bot._create_order = MagicMock(side_effect=_create_order)
+        markets = {x: x for x in ['BTC/USDT:USDT', 'ETH/USDT:USDT', 'XRP/USDT:USDT', 'SOL/USDT:USDT']}
+        bot._submit_limit_orders(markets)
+
+        self.assertEqual(bot._create_order.call_count, 3)
+        self.assertEqual(
+            [(x.symbol, x.exchange_order_id) for x in bot._limit_orders],
+            [
+                ('BTC', 'id-BTC/USDT:USDT'),
+                ('XRP', 'submitted'),
+                ('SOL', 'id-SOL/USDT:USDT'),
+            ]
+        )
+
+    def test_error(self):
+        bot = self.create_bot()
+        bot._limit_orders = OrderStore([
+            create_order('BTC'),
+            create_order('ETH'),
+        ])
+
+        def _create_order(market=None, **kwargs):
+            if market == 'ETH/USDT:USDT':
+                raise Exception('post only rejected')
+            return {'id': 'id-' + market}
+
+        bot._create_order = MagicMock(side_effect=_create_order)
+        markets = {x: x for x in ['BTC/USDT:USDT', 'ETH/USDT:USDT']}
+        with self.assertRaises(Exception):
+            bot._submit_limit_orders(markets)
+
+        self.assertEqual(
+            [(x.symbol, x.exchange_order_id) for x in bot._limit_orders],
+            [
+                ('BTC', 'id-BTC/USDT:USDT'),
+                ('ETH', None),
+            ]
+        )
+
+    def test_deferred(self):
+        bot = self.create_bot()
+        bot._limit_orders = OrderStore([
+            create_order('BTC'),
+            create_order('ETH'),
+        ])
+
+        def _create_order(market=None, **kwargs):
+            if market == 'ETH/USDT:USDT':
+                raise ApiBudgetExceeded('api budget exceeded')
+            return {'id': 'id-' + market}
+
+        bot._create_order = MagicMock(side_effect=_create_order)
+        markets = {x: x for x in ['BTC/USDT:USDT', 'ETH/USDT:USDT']}
+        bot._submit_limit_orders(markets)
+
+        # not raised. deferred order is kept unsubmitted
+        self.assertEqual(
+            [(x.symbol, x.exchange_order_id) for x in bot._limit_orders],
+            [
+                ('BTC', 'id-BTC/USDT:USDT'),
+                ('ETH', None),
+            ]
+        )
+
+    def test_quote_unavailable(self):
+        # the order waits for a fresh quote instead of being dropped
+        client = MagicMock()
+        client.id = 'binance'
+        client.create_order = MagicMock(side_effect=lambda symbol, *args: {'id': 'id-' + symbol})
+        feed = LocalOrderBookFeed()
+        logger = create_logger('debug')
+        bot = BotMaker(
+            client=client,
+            logger=logger,
+            leverage=1.0,
+            order_rate=1000,
+            order_book_provider=StreamOrderBookProvider(feed=feed, max_age=5, logger=logger),
+        )
+        order = create_order('BTC')
+        order.price = 99.0
+        bot._limit_orders = OrderStore([order])
+        markets = {'BTC/USDT:USDT': create_market('BTC/USDT:USDT')}
+
+        bot._submit_limit_orders(markets)
+        client.create_order.assert_not_called()
+        self.assertEqual([(x.symbol, x.exchange_order_id) for x in bot._limit_orders], [('BTC', None)])
+
+        feed.publish('BTC/USDT:USDT', 99.0, 101.0)
+        bot._submit_limit_orders(markets)
+        client.create_order.assert_called_once()
+        self.assertEqual(
+            [(x.symbol, x.exchange_order_id) for x in bot._limit_orders],
+            [('BTC', 'id-BTC/USDT:USDT')],
+        )
+
+    def test_client_per_thread(self):
+        # concurrent submissions never share a sync ccxt client
+        shared_client = MagicMock()
+        shared_client.id = 'binance'
+        shared_client.fetch_markets = MagicMock(return_value=[create_binance_market('BTC')])
+        clients = []
+        lock = threading.Lock()
+
+        def create_client():
+            client = MagicMock()
+            client.id = 'binance'
+            client.fetch_order_book = MagicMock(return_value={
+                'bids': [[99.0, 1.0]],
+                'asks': [[101.0, 1.0]],
+            })
+            threads = set()
+
+            def create_order(symbol, *args):
+                threads.add(threading.get_ident())
+                time.sleep(0.01)
+                return {'id': 'id-' + symbol}
+
+            client.create_order = MagicMock(side_effect=create_order)
+            client.threads = threads
+            with lock:
+                clients.append(client)
+            return client
+
+        bot = BotMaker(
+            client=shared_client,
+            logger=create_logger('debug'),
+            leverage=1.0,
+            order_concurrency=2,
+            order_rate=1000,
+            order_client_factory=create_client,
+        )
+        symbols = ['S{}'.format(i) for i in range(8)]
+        bot._limit_orders = OrderStore([create_order(x) for x in symbols])
+        markets = {
+            x + '/USDT:USDT': create_market(x + '/USDT:USDT')
+            for x in symbols
+        }
+        bot._submit_limit_orders(markets)
+
+        self.assertEqual(
+            [x.exchange_order_id for x in bot._limit_orders],
+            ['id-{}/USDT:USDT'.format(x) for x in symbols],
+        )
+        shared_client.create_order.assert_not_called()
+        shared_client.fetch_order_book.assert_not_called()
+        self.assertLessEqual(len(clients), 2)
+        for client in clients:
+            self.assertEqual(len(client.threads), 1)
+        self.assertEqual(sum(x.create_order.call_count for x in clients), len(symbols))
+        # seeded from the shared markets instead of loading them per client
+        shared_client.fetch_markets.assert_called_once()
+        for client in clients:
+            client.set_markets.assert_called_once_with(shared_client.fetch_markets.return_value)
+            client.load_markets.assert_not_called()
+            client.fetch_markets.assert_not_called()
+
+    def test_serial_without_client_factory(self):
+        client = MagicMock()
+        client.id = 'binance'
+        client.fetch_order_book = MagicMock(return_value={
+            'bids': [[99.0, 1.0]],
+            'asks': [[101.0, 1.0]],
+        })
+        client.create_order = MagicMock(side_effect=lambda symbol, *args: {'id': 'id-' + symbol})
+        bot = BotMaker(
+            client=client,
+            logger=create_logger('debug'),
+            leverage=1.0,
+            order_concurrency=4,
+            order_rate=1000,
+        )
+        bot._limit_orders = OrderStore([create_order('BTC')])
+        bot._submit_limit_orders({'BTC/USDT:USDT': create_market('BTC/USDT:USDT')})
+
+        self.assertIsNone(bot._order_executor)
+        self.assertEqual(client.create_order.call_count, 1)
+
+    def test_budget_exceeded(self):
+        # orders and their leverage setup are placed when the budget is used up
+        client = create_ccxt_client('binance', api_key='key', api_secret='secret')
+        client.set_markets([create_binance_market('BTC')])
+        client.fetch = MagicMock(return_value={
+            'orderId': 1,
+            'symbol': 'BTCUSDT',
+            'status': 'NEW',
+            'price': '99.0',
+            'origQty': '1.0',
+            'executedQty': '0.0',
+            'side': 'BUY',
+            'type': 'LIMIT',
+            'updateTime': 0,
+        })
+        api_accounting = ApiAccounting(logger=create_logger('debug'), budget=0.5)
+        api_accounting.install(client)
+        order_book_provider = MagicMock()
+        order_book_provider.get_quote = MagicMock(return_value=Quote(best_bid=99.0, best_ask=101.0, timestamp=0))
+        bot = BotMaker(
+            client=client,
+            logger=create_logger('debug'),
+            leverage=1.0,
+            order_rate=1000,
+            order_book_provider=order_book_provider,
+            api_accounting=api_accounting,
+        )
+        order = create_order('BTC')
+        order.price = 99.0
+        bot._limit_orders = OrderStore([order])
+        bot._submit_limit_orders({'BTC/USDT:USDT': create_market('BTC/USDT:USDT')})
+
+        self.assertEqual([x.exchange_order_id for x in bot._limit_orders], ['1'])
+        self.assertEqual(client.fetch.call_count, 2)
+        self.assertIn('/leverage', client.fetch.call_args_list[0].args[0])
+        self.assertIn('/order', client.fetch.call_args_list[1].args[0])
+        self.assertEqual(bot._leverage_set, {'BTC/USDT:USDT'})
+        self.assertEqual(api_accounting.summary()['deferred'], 0)
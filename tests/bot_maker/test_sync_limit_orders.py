@@ -0,0 +1,205 @@
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+from ccxt.base.errors import ArgumentsRequired, NotSupported
+from src.bot_maker import BotMaker, Order
+from src.logger import create_logger
+from src.order_store import OrderStore
+from src.utils import create_ccxt_client
+
+
+def create_order(symbol, exchange_order_id):
+    return Order(
+        timestamp=1000.0,
+        symbol=symbol,
+        price=100.0,
+        amount=1.0,
+        is_buy=True,
+        reduce_only=False,
+        duration=300,
+        executed_amount=0.0,
+        exchange_order_id=exchange_order_id,
+    )
+
+
+def create_exchange_order(id, symbol, status, filled):
+    return {'id': id, 'symbol': symbol, 'status': status, 'filled': filled}
+
+
+def create_binance_market(base):
+    return {
+        'id': base + 'USDT',
+        'symbol': base + '/USDT:USDT',
+        'base': base,
+        'quote': 'USDT',
+        'settle': 'USDT',
+        'baseId': base,
+        'quoteId': 'USDT',
+        'settleId': 'USDT',
+        'type': 'swap',
+        'spot': False,
+        'margin': False,
+        'swap': True,
+        'future': False,
+        'option': False,
+        'contract': True,
+        'linear': True,
+        'inverse': False,
+        'contractSize': 1.0,
+        'active': True,
+        'precision': {'amount': 3, 'price': 1},
+        'limits': {'amount': {'min': 0.001, 'max': 1000.0}, 'cost': {'min': 5.0}},
+        'info': {'orderTypes': ['LIMIT', 'MARKET']},
+    }
+
+
+def create_binance_order(id, symbol, status, filled):
+    return {
+        'symbol': symbol,
+        'orderId': int(id),
+        'status': status,
+        'executedQty': str(filled),
+        'origQty': '1.0',
+        'price': '100.0',
+        'side': 'BUY',
+        'type': 'LIMIT',
+        'time': 1000000,
+        'updateTime': 1000000,
+    }
+
+
+class TestBotMakerSyncLimitOrders(TestCase):
+    def create_bot(self, order_sync_mode):
+        client = MagicMock()
+        client.id = 'binance'
+        client.has = {'fetchOrders': True}
+        bot = BotMaker(
+            client=client,
+            logger=create_logger('debug'),
+            leverage=1.0,
+            order_sync_mode=order_sync_mode,
+        )
+        bot._limit_orders = OrderStore([
+            create_order('BTC', '1'),
+            create_order('ETH', '2'),
+            create_order('XRP', '3'),
+        ])
+        return client, bot
+
+    @mock.patch('time.time', mock.MagicMock(return_value=1100.0))
+    def test_symbol(self):
+        client, bot = self.create_bot('symbol')
+        client.fetch_open_orders = MagicMock(side_effect=lambda symbol: {
+            'BTC/USDT:USDT': [create_exchange_order('1', 'BTC/USDT:USDT', 'open', 0.5)],
+            'ETH/USDT:USDT': [],
+            'XRP/USDT:USDT': [create_exchange_order('4', 'XRP/USDT:USDT', 'open', 0.0)],
+        }[symbol])
+        client.fetch_order = MagicMock(side_effect=lambda id, symbol: {
+            '2': create_exchange_order('2', 'ETH/USDT:USDT', 'closed', 1.0),
+            '3': create_exchange_order('3', 'XRP/USDT:USDT', 'canceled', 0.0),
+        }[id])
+
+        self.assertTrue(bot._sync_limit_orders())
+
+        self.assertEqual(client.fetch_open_orders.call_count, 3)
+        self.assertEqual(client.fetch_order.call_count, 2)
+        client.fetch_orders.assert_not_called()
+        client.cancel_order.assert_called_once_with('4', symbol='XRP/USDT:USDT')
+        self.assertEqual(dict(bot._exchange_positions), {'BTC': 0.5, 'ETH': 1.0, 'XRP': 0.0})
+
+    @mock.patch('time.time', mock.MagicMock(return_value=1100.0))
+    def test_account(self):
+        client, bot = self.create_bot('account')
+        client.fetch_open_orders = MagicMock(return_value=[
+            create_exchange_order('1', 'BTC/USDT:USDT', 'open', 0.5),
+            create_exchange_order('4', 'XRP/USDT:USDT', 'open', 0.0),
+            create_exchange_order('5', 'DOGE/USDT:USDT', 'open', 0.0),
+        ])
+        client.fetch_orders = MagicMock(return_value=[
+            create_exchange_order('2', 'ETH/USDT:USDT', 'closed', 1.0),
+        ])
+        client.fetch_order = MagicMock(return_value=create_exchange_order('3', 'XRP/USDT:USDT', 'canceled', 0.0))
+
+        self.assertTrue(bot._sync_limit_orders())
+
+        client.fetch_open_orders.assert_called_once_with()
+        client.fetch_orders.assert_called_once_with(symbol=None, since=1000000)
+        client.fetch_order.assert_called_once_with('3', symbol='XRP/USDT:USDT')
+        # untracked symbol is not touched
+        client.cancel_order.assert_called_once_with('4', symbol='XRP/USDT:USDT')
+        self.assertEqual(dict(bot._exchange_positions), {'BTC': 0.5, 'ETH': 1.0, 'XRP': 0.0})
+
+    @mock.patch('time.time', mock.MagicMock(return_value=1100.0))
+    def test_account_history_not_supported(self):
+        client, bot = self.create_bot('account')
+        client.fetch_open_orders = MagicMock(return_value=[])
+        client.fetch_orders = MagicMock(side_effect=NotSupported('not supported'))
+        client.fetch_order = MagicMock(side_effect=lambda id, symbol: create_exchange_order(id, symbol, 'canceled', 1.0))
+
+        bot._sync_limit_orders()
+        bot._sync_limit_orders()
+
+        client.fetch_orders.assert_called_once()
+        self.assertEqual(client.fetch_order.call_count, 6)
+
+    @mock.patch('time.time', mock.MagicMock(return_value=1100.0))
+    def test_account_history_arguments_required(self):
+        client, bot = self.create_bot('account')
+        client.fetch_open_orders = MagicMock(return_value=[])
+
+        def fetch_orders(symbol=None, since=None):
+            if symbol is None:
+                raise ArgumentsRequired('symbol required')
+            return [create_exchange_order(
+                {'BTC/USDT:USDT': '1', 'ETH/USDT:USDT': '2', 'XRP/USDT:USDT': '3'}[symbol],
+                symbol, 'closed', 1.0,
+            )]
+
+        client.fetch_orders = MagicMock(side_effect=fetch_orders)
+
+        bot._sync_limit_orders()
+        bot._sync_limit_orders()
+
+        # retried per symbol in the same sync, not per order. the next sync starts per symbol
+        symbols = ['BTC/USDT:USDT', 'ETH/USDT:USDT', 'XRP/USDT:USDT']
+        self.assertEqual(
+            [x.kwargs['symbol'] for x in client.fetch_orders.call_args_list],
+            [None] + symbols + symbols,
+        )
+        client.fetch_order.assert_not_called()
+        self.assertEqual(dict(bot._exchange_positions), {'BTC': 1.0, 'ETH': 1.0, 'XRP': 1.0})
+
+    @mock.patch('time.time', mock.MagicMock(return_value=1100.0))
+    def test_account_binance(self):
+        # binance fetch_orders needs a symbol. history is fetched per symbol, not per order
+        client = create_ccxt_client('binance')
+        client.set_markets([create_binance_market(x) for x in ['BTC', 'ETH', 'XRP']])
+        client.fapiPrivateGetOpenOrders = MagicMock(return_value=[
+            create_binance_order('1', 'BTCUSDT', 'PARTIALLY_FILLED', 0.5),
+        ])
+        client.fapiPrivateGetAllOrders = MagicMock(side_effect=lambda request: {
+            'ETHUSDT': [create_binance_order('2', 'ETHUSDT', 'FILLED', 1.0)],
+            'XRPUSDT': [create_binance_order('3', 'XRPUSDT', 'CANCELED', 0.0)],
+        }[request['symbol']])
+        client.fapiPrivateGetOrder = MagicMock()
+        bot = BotMaker(
+            client=client,
+            logger=create_logger('debug'),
+            leverage=1.0,
+            order_sync_mode='account',
+        )
+        bot._limit_orders = OrderStore([
+            create_order('BTC', '1'),
+            create_order('ETH', '2'),
+            create_order('XRP', '3'),
+        ])
+
+        self.assertTrue(bot._sync_limit_orders())
+
+        self.assertEqual(
+            sorted(x.args[0]['symbol'] for x in client.fapiPrivateGetAllOrders.call_args_list),
+            ['ETHUSDT', 'XRPUSDT'],
+        )
+        self.assertEqual(client.fapiPrivateGetAllOrders.call_args_list[0].args[0]['startTime'], 1000000)
+        client.fapiPrivateGetOrder.assert_not_called()
+        self.assertEqual(dict(bot._exchange_positions), {'BTC': 0.5, 'ETH': 1.0, 'XRP': 0.0})
+        self.assertEqual([x.symbol for x in bot._limit_orders], ['BTC', 'ETH'])
@@ -0,0 +1,180 @@
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+import threading
+import time
+import ccxt
+import pandas as pd
+from src.bot_maker import BotMaker
+from src.bot_scheduler import BotScheduler
+from src.logger import create_logger
+from src.market_cache import MarketCache
+from src.positions_cache import PositionsCache
+from src.smoother import NullSmoother
+from ..bot_maker.test_step import create_alphapool_positions
+from ..bot_maker.test_step_async import create_client
+
+
+class TestBotSchedulerTick(TestCase):
+    @mock.patch('time.time', mock.MagicMock(return_value=pd.to_datetime('2020/01/01 00:01:00', utc=True).timestamp()))
+    def test_shared_caches(self):
+        logger = create_logger('debug')
+        alphapool_client = MagicMock()
+        alphapool_client.get_positions = MagicMock(return_value=create_alphapool_positions())
+        positions_cache = PositionsCache(
+            alphapool_client=alphapool_client,
+            logger=logger,
+            min_update_interval=30,
+        )
+        clients = [create_client(ccxt, MagicMock) for _ in range(2)]
+        market_cache = MarketCache(client=clients[0], logger=logger)
+        pings = []
+
+        bots = [
+            BotMaker(
+                client=client,
+                logger=logger.getChild('account{}'.format(i)),
+                leverage=1.0,
+                model_id='pf-portfolio1',
+                alphapool_client=alphapool_client,
+                health_check_ping=lambda i=i: pings.append(i),
+                unit_pos_smoother=NullSmoother(),
+                market_cache=market_cache,
+                positions_cache=positions_cache,
+            )
+            for i, client in enumerate(clients)
+        ]
+        scheduler = BotScheduler(bots=bots, logger=logger)
+        scheduler.tick()
+
+        alphapool_client.get_positions.assert_called_once()
+        clients[0].fetch_markets.assert_called_once()
+        clients[1].fetch_markets.assert_not_called()
+        for client in clients:
+            self.assertEqual(client.create_order.call_count, 2)
+        self.assertEqual(sorted(pings), [0, 1])
+
+    @mock.patch('time.time', mock.MagicMock(return_value=pd.to_datetime('2020/01/01 00:01:00', utc=True).timestamp()))
+    def test_symbol_not_exist_logged_per_account(self):
+        # the symbol registry is shared. each account still logs why its symbol is dropped
+        logger = create_logger('debug')
+        df = create_alphapool_positions()
+        df['positions'] = [{'BTC': 2.0, 'ETH': 1.0}, {}]
+        alphapool_client = MagicMock()
+        alphapool_client.get_positions = MagicMock(return_value=df)
+        positions_cache = PositionsCache(alphapool_client=alphapool_client, logger=logger)
+        clients = [create_client(ccxt, MagicMock) for _ in range(2)]
+        market_cache = MarketCache(client=clients[0], logger=logger)
+        bots = [
+            BotMaker(
+                client=client,
+                logger=logger.getChild('account{}'.format(i)),
+                leverage=1.0,
+                model_id='pf-portfolio1',
+                alphapool_client=alphapool_client,
+                unit_pos_smoother=NullSmoother(),
+                market_cache=market_cache,
+                positions_cache=positions_cache,
+            )
+            for i, client in enumerate(clients)
+        ]
+        scheduler = BotScheduler(bots=bots, logger=logger)
+
+        with self.assertLogs(bots[0]._logger, 'WARNING') as logs0, \
+                self.assertLogs(bots[1]._logger, 'WARNING') as logs1:
+            scheduler.tick()
+        for logs in [logs0, logs1]:
+            self.assertEqual(
+                [x for x in logs.output if 'not exist' in x],
+                ['WARNING:{}:symbol ETH/USDT:USDT not exist. skip'.format(logs.records[0].name)],
+            )
+
+    def test_error_isolated(self):
+        bots = [MagicMock(), MagicMock()]
+        bots[0].tick = MagicMock(side_effect=Exception('error'))
+        scheduler = BotScheduler(bots=bots, logger=create_logger('debug'))
+        scheduler.tick()
+        scheduler.tick()
+        self.assertEqual(bots[0].tick.call_count, 2)
+        self.assertEqual(bots[1].tick.call_count, 2)
+
+    def test_positions_cache_forced(self):
+        logger = create_logger('debug')
+        alphapool_client = MagicMock()
+        alphapool_client.get_positions = MagicMock(return_value=create_alphapool_positions())
+        positions_cache = PositionsCache(
+            alphapool_client=alphapool_client,
+            logger=logger,
+            min_update_interval=30,
+        )
+        bot = MagicMock()
+        bot.tick = MagicMock(side_effect=lambda: positions_cache.update(time.time()))
+        scheduler = BotScheduler(bots=[bot], logger=logger, positions_cache=positions_cache)
+
+        # notified ticks within min_update_interval still fetch once
+        for t in [1000, 1010]:
+            with mock.patch('time.time', MagicMock(return_value=t)):
+                scheduler.tick()
+        self.assertEqual(alphapool_client.get_positions.call_count, 2)
+
+    def test_timeout(self):
+        # a stuck bot does not delay the others and is skipped until it returns
+        release = threading.Event()
+        bots = [MagicMock(), MagicMock()]
+        bots[0].tick = MagicMock(side_effect=lambda: release.wait(10))
+        pings = []
+        scheduler = BotScheduler(
+            bots=bots,
+            logger=create_logger('debug'),
+            tick_timeout=0.1,
+            health_check_ping=lambda: pings.append(1),
+        )
+
+        start = time.perf_counter()
+        scheduler.tick()
+        scheduler.tick()
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(bots[0].tick.call_count, 1)
+        self.assertEqual(bots[1].tick.call_count, 2)
+        self.assertEqual(len(pings), 2)
+
+        release.set()
+        time.sleep(0.1)
+        scheduler.tick()
+        self.assertEqual(bots[0].tick.call_count, 2)
+
+    def test_all_stuck(self):
+        release = threading.Event()
+        bot = MagicMock()
+        bot.tick = MagicMock(side_effect=lambda: release.wait(10))
+        pings = []
+        scheduler = BotScheduler(
+            bots=[bot],
+            logger=create_logger('debug'),
+            tick_timeout=0.1,
+            health_check_ping=lambda: pings.append(1),
+        )
+        scheduler.tick()
+        scheduler.tick()
+        release.set()
+        # not pinged so that the panic manager restarts the process
+        self.assertEqual(pings, [])
+
+    def test_stuck_past_threshold(self):
+        # one stuck account escalates to a process restart after max_stuck_ticks
+        release = threading.Event()
+        bots = [MagicMock(), MagicMock()]
+        bots[0].tick = MagicMock(side_effect=lambda: release.wait(10))
+        pings = []
+        scheduler = BotScheduler(
+            bots=bots,
+            logger=create_logger('debug'),
+            tick_timeout=0.1,
+            health_check_ping=lambda: pings.append(1),
+            max_stuck_ticks=2,
+        )
+        # timed out, skipped once, skipped twice
+        for _ in range(3):
+            scheduler.tick()
+        release.set()
+        self.assertEqual(bots[1].tick.call_count, 3)
+        self.assertEqual(len(pings), 2)
@@ -0,0 +1,53 @@
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+from src.compact_rows import RowCodec, CompactRow, Interner, rows_equal
+
+
+class TestCompactRowsRowCodec(TestCase):
+    def test_round_trip(self):
+        codec = RowCodec()
+        timestamp = pd.to_datetime(300, utc=True, unit='s')
+        positions = {'BTC': 0.5, 'ETH': -0.25}
+        weights = {'model1': 0.3, 'model2': 0.7}
+        orders = {
+            'BTC': [
+                {'price': 100.0, 'amount': 0.1, 'is_buy': True, 'duration': 3600.0},
+                {'price': 110.0, 'amount': 0.2, 'is_buy': False, 'duration': 300.0},
+            ],
+            'XRP': [
+                {'price': 0.5, 'amount': 10.0, 'is_buy': False, 'duration': 60.0},
+            ],
+        }
+
+        row = codec.encode(timestamp, 'model1', positions, weights, orders)
+        self.assertEqual(codec.decode(row), CompactRow(timestamp, 'model1', positions, weights, orders))
+
+        # symbols of positions and orders share ids, model ids of weights and rows too
+        self.assertEqual(codec.symbols.values(range(len(codec.symbols))), ['BTC', 'ETH', 'XRP'])
+        self.assertEqual(codec.model_ids.values(range(len(codec.model_ids))), ['model1', 'model2'])
+        self.assertEqual(row.orders['symbol_id'].tolist(), [0, 0, 2])
+
+        # re-encoding gives equal arrays
+        self.assertTrue(rows_equal(row, codec.encode(timestamp, 'model1', positions, weights, orders)))
+        self.assertFalse(rows_equal(row, codec.encode(timestamp, 'model1', {'BTC': 0.5}, weights, orders)))
+
+    def test_empty(self):
+        codec = RowCodec()
+        timestamp = pd.to_datetime(300, utc=True, unit='s')
+
+        row = codec.encode(timestamp, 'pf', {}, {}, {})
+        self.assertEqual(codec.decode(row), CompactRow(timestamp, 'pf', {}, {}, {}))
+        self.assertEqual(len(row.positions), 0)
+        self.assertEqual(len(row.orders), 0)
+        # shared empty arrays must not be modified in place
+        self.assertFalse(row.positions.flags.writeable)
+
+    def test_to_dict(self):
+        interner = Interner()
+        codec = RowCodec()
+        entries = codec._encode_entries({'a': 1.0, 'b': 2.0}, interner)
+        self.assertEqual(entries['id'].tolist(), [0, 1])
+        self.assertEqual(RowCodec.to_dict(entries, interner), {'a': 1.0, 'b': 2.0})
+        self.assertEqual(RowCodec.to_dict(entries[::-1], interner), {'b': 2.0, 'a': 1.0})
+        self.assertIsInstance(entries['value'], np.ndarray)
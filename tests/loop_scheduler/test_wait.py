@@ -0,0 +1,85 @@
+from unittest import TestCase, mock
+from src.logger import create_logger
+from src.loop_scheduler import LoopScheduler
+from src.metrics import Metrics
+
+
+class FakeNotifier:
+    # advances the clock. notified at the given times
+    def __init__(self, clock, notify_at=()):
+        self.clock = clock
+        self.notify_at = list(notify_at)
+        self.timeouts = []
+        self.notified_at = None
+
+    def wait(self, timeout):
+        self.timeouts.append(timeout)
+        end = self.clock[0] + timeout
+        if len(self.notify_at) > 0 and self.notify_at[0] < end:
+            self.notified_at = self.notify_at.pop(0)
+            # woken after 2s of coalescing
+            self.clock[0] = max(self.clock[0], self.notified_at + 2)
+            return True
+        self.clock[0] = end
+        return False
+
+
+class TestLoopSchedulerWait(TestCase):
+    def create(self, clock, notify_at=()):
+        notifier = FakeNotifier(clock, notify_at)
+        metrics = Metrics(logger=create_logger('debug'))
+        scheduler = LoopScheduler(
+            interval=60,
+            phase=5,
+            notifier=notifier,
+            logger=create_logger('debug'),
+            metrics=metrics,
+        )
+        return scheduler, notifier, metrics
+
+    def test_next_at(self):
+        scheduler, _, _ = self.create([0])
+        self.assertEqual(scheduler.next_at(0), 5)
+        self.assertEqual(scheduler.next_at(5), 65)
+        self.assertEqual(scheduler.next_at(299), 305)
+
+    def test_no_drift(self):
+        clock = [1000.0]
+        scheduler, notifier, metrics = self.create(clock)
+        with mock.patch('time.time', lambda: clock[0]):
+            wakes = []
+            for step_seconds in [3, 10, 20]:
+                clock[0] += step_seconds
+                self.assertFalse(scheduler.wait())
+                wakes.append(clock[0])
+        self.assertEqual(wakes, [1025, 1085, 1145])
+        self.assertEqual(notifier.timeouts, [22, 50, 40])
+        self.assertIn('alphapool_loop_lateness_seconds_count 3', metrics.render())
+
+    def test_overrun(self):
+        # a step longer than interval runs the next tick immediately and skips missed slots
+        clock = [1000.0]
+        scheduler, notifier, metrics = self.create(clock)
+        with mock.patch('time.time', lambda: clock[0]):
+            clock[0] += 1
+            scheduler.wait()
+            clock[0] += 130
+            scheduler.wait()
+            self.assertEqual(clock[0], 1155)
+            self.assertIn('alphapool_loop_lateness_seconds_last 70', metrics.render())
+            scheduler.wait()
+            self.assertEqual(clock[0], 1205)
+
+    def test_notified(self):
+        clock = [1000.0]
+        scheduler, notifier, metrics = self.create(clock, notify_at=[1010])
+        with mock.patch('time.time', lambda: clock[0]):
+            self.assertTrue(scheduler.wait())
+            self.assertEqual(clock[0], 1012)
+            clock[0] += 5
+            # schedule not moved
+            self.assertFalse(scheduler.wait())
+            self.assertEqual(clock[0], 1025)
+        self.assertIn('alphapool_loop_lateness_seconds_count 1', metrics.render())
+        self.assertIn('alphapool_loop_notify_latency_seconds_count 1', metrics.render())
+        self.assertIn('alphapool_loop_notify_latency_seconds_last 2', metrics.render())
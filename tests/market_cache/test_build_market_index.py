@@ -0,0 +1,55 @@
+from unittest import TestCase
+from src.market_cache import build_market_index, MarketInfo
+
+markets = [{
+    'symbol': 'BTC/USDT:USDT',
+    'id': 'BTCUSDT',
+    'contractSize': 1.0,
+    'limits': {
+        'amount': {'min': 0.001, 'max': 1000.0},
+        'cost': {'min': 5.0},
+        'leverage': {'min': 1.0, 'max': 125.0},
+    },
+    'precision': {'amount': 3, 'price': 1},
+}]
+
+
+class TestMarketCacheBuildMarketIndex(TestCase):
+    def test_ok(self):
+        index = build_market_index(markets, 'binance')
+        self.assertEqual(index, {
+            'BTC/USDT:USDT': MarketInfo(
+                ccxt_symbol='BTC/USDT:USDT',
+                id='BTCUSDT',
+                contract_size=1.0,
+                amount_min=0.001,
+                amount_max=1000.0,
+                cost_min=5.0,
+                amount_precision=3,
+                price_precision=1,
+                max_leverage=125.0,
+            )
+        })
+
+    def test_bitflyer(self):
+        index = build_market_index([{
+            'symbol': 'BTC/JPY:JPY',
+            'id': 'FX_BTC_JPY',
+            'contractSize': None,
+            'limits': {
+                'amount': {'min': None, 'max': None},
+                'cost': {'min': None},
+            },
+            'precision': {},
+        }], 'bitflyer')
+        market = index['BTC/JPY:JPY']
+        self.assertEqual(market.amount_min, 0.01)
+        self.assertEqual(market.amount_precision, 0.00000001)
+        self.assertEqual(market.contract_size, 1.0)
+        self.assertIsNone(market.max_leverage)
+
+    def test_normalize_amount(self):
+        market = build_market_index(markets, 'binance')['BTC/USDT:USDT']
+        self.assertEqual(market.normalize_amount(0.1234, price=10000), 0.123)
+        self.assertEqual(market.normalize_amount(-0.1234, price=10000), -0.123)
+        self.assertEqual(market.normalize_amount(0.0001, price=10000), 0)
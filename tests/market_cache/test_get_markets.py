@@ -0,0 +1,44 @@
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+import threading
+from src.logger import create_logger
+from src.market_cache import MarketCache
+from .test_build_market_index import markets
+
+
+class TestMarketCacheGetMarkets(TestCase):
+    def test_ttl(self):
+        client = MagicMock()
+        client.id = 'binance'
+        client.fetch_markets = MagicMock(return_value=markets)
+        cache = MarketCache(client=client, logger=create_logger('debug'), ttl=60)
+
+        with mock.patch('time.time', MagicMock(return_value=1000)):
+            self.assertIn('BTC/USDT:USDT', cache.get_markets())
+            cache.get_markets()
+        self.assertEqual(client.fetch_markets.call_count, 1)
+
+        with mock.patch('time.time', MagicMock(return_value=1061)):
+            cache.get_markets()
+        self.assertEqual(client.fetch_markets.call_count, 2)
+
+    def test_startup_race(self):
+        # the refresh thread and the first get_markets load once
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch_markets():
+            started.set()
+            release.wait(10)
+            return markets
+
+        client = MagicMock()
+        client.id = 'binance'
+        client.fetch_markets = MagicMock(side_effect=fetch_markets)
+        cache = MarketCache(client=client, logger=create_logger('debug'))
+        cache.start()
+        self.assertTrue(started.wait(10))
+
+        threading.Timer(0.1, release.set).start()
+        self.assertIn('BTC/USDT:USDT', cache.get_markets())
+        self.assertEqual(client.fetch_markets.call_count, 1)
@@ -0,0 +1,68 @@
+from unittest import TestCase
+import urllib.request
+from src.logger import create_logger
+from src.metrics import Metrics, NullMetrics
+
+
+class TestMetrics(TestCase):
+    def test_span(self):
+        metrics = Metrics(logger=create_logger('debug'))
+        with metrics.span('fetch_collateral'):
+            pass
+        with metrics.span('fetch_collateral'):
+            pass
+
+        text = metrics.render()
+        self.assertIn('# TYPE alphapool_step_phase_seconds summary', text)
+        self.assertIn('alphapool_step_phase_seconds{phase="fetch_collateral",quantile="0.5"}', text)
+        self.assertIn('alphapool_step_phase_seconds_count{phase="fetch_collateral"} 2', text)
+
+    def test_rolling_window(self):
+        metrics = Metrics(logger=create_logger('debug'), window=2)
+        for x in [100, 1, 1]:
+            metrics.observe('orders_per_step', x)
+
+        text = metrics.render()
+        # quantiles from the last 2 values, sum and count cumulative
+        self.assertIn('alphapool_orders_per_step{quantile="0.99"} 1.0', text)
+        self.assertIn('alphapool_orders_per_step_sum 102', text)
+        self.assertIn('alphapool_orders_per_step_count 3', text)
+
+    def test_gauge(self):
+        metrics = Metrics(logger=create_logger('debug'))
+        metrics.set_gauge('loop_lag_seconds_last', 1.5)
+        self.assertIn('alphapool_loop_lag_seconds_last 1.5', metrics.render())
+
+    def test_server(self):
+        metrics = Metrics(logger=create_logger('debug'))
+        metrics.set_gauge('orders_last_step', 2)
+        server = metrics.start_server(0, host='127.0.0.1')
+        try:
+            url = 'http://127.0.0.1:{}/metrics'.format(server.server_address[1])
+            with urllib.request.urlopen(url) as res:
+                self.assertIn('alphapool_orders_last_step 2', res.read().decode())
+        finally:
+            server.shutdown()
+
+    def test_null(self):
+        metrics = NullMetrics()
+        with metrics.span('step'):
+            pass
+        metrics.observe('orders_per_step', 1)
+        self.assertEqual(metrics.render(), '')
+
+    def test_with_labels(self):
+        metrics = Metrics(logger=create_logger('debug'))
+        for account, created in [('a', 1), ('b', 2)]:
+            account_metrics = metrics.with_labels({'account': account})
+            account_metrics.set_gauge('orders_last_step', created)
+            with account_metrics.span('fetch_collateral'):
+                pass
+
+        # accounts do not overwrite each other
+        text = metrics.render()
+        self.assertIn('alphapool_orders_last_step{account="a"} 1', text)
+        self.assertIn('alphapool_orders_last_step{account="b"} 2', text)
+        self.assertIn('alphapool_step_phase_seconds_count{account="a",phase="fetch_collateral"} 1', text)
+        self.assertIn('alphapool_step_phase_seconds_count{account="b",phase="fetch_collateral"} 1', text)
+        self.assertIs(NullMetrics().with_labels({'account': 'a'}).__class__, NullMetrics)
@@ -0,0 +1,63 @@
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+import os
+import tempfile
+import threading
+import time
+from src.logger import create_logger
+from src.notifier import NullNotifier, Notifier, FileNotifier, PostgresNotifier
+
+
+class TestNotifierWait(TestCase):
+    def test_null(self):
+        sleep = MagicMock()
+        with mock.patch('time.sleep', sleep):
+            self.assertFalse(NullNotifier().wait(60))
+        sleep.assert_called_once_with(60)
+
+    def test_timeout(self):
+        notifier = Notifier(logger=create_logger('debug'), coalesce=0)
+        self.assertFalse(notifier.wait(0.01))
+
+    def test_notify(self):
+        notifier = Notifier(logger=create_logger('debug'), coalesce=0)
+        threading.Timer(0.05, notifier.notify).start()
+        start = time.monotonic()
+        self.assertTrue(notifier.wait(10))
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_coalesce(self):
+        # notifications during the step and the coalesce window wake once
+        notifier = Notifier(logger=create_logger('debug'), coalesce=0.1)
+        notified_at = time.time()
+        notifier.notify()
+        threading.Timer(0.05, notifier.notify).start()
+        self.assertTrue(notifier.wait(10))
+        # arrival of the first one
+        self.assertLess(abs(notifier.notified_at - notified_at), 0.04)
+        self.assertFalse(notifier.wait(0.01))
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as dir:
+            path = os.path.join(dir, 'notify')
+            notifier = FileNotifier(path=path, logger=create_logger('debug'), coalesce=0)
+            notifier.poll()
+            self.assertFalse(notifier.wait(0.01))
+
+            with open(path, 'w') as f:
+                f.write('1')
+            notifier.poll()
+            self.assertTrue(notifier.wait(0.01))
+            notifier.poll()
+            self.assertFalse(notifier.wait(0.01))
+
+    def test_postgres_relevant(self):
+        notifier = PostgresNotifier(
+            logger=create_logger('debug'),
+            coalesce=0,
+            is_relevant=lambda model_id: model_id == 'model1',
+        )
+        notifier.handle('model2')
+        self.assertFalse(notifier.wait(0.01))
+        notifier.handle('model1')
+        self.assertTrue(notifier.wait(0.01))
@@ -0,0 +1,69 @@
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+from src.logger import create_logger
+from src.order_book import (
+    StreamOrderBookProvider,
+    LocalOrderBookFeed,
+    RestOrderBookProvider,
+    Quote,
+)
+
+
+class TestOrderBookStreamOrderBookProvider(TestCase):
+    def create_provider(self, fallback=None):
+        feed = LocalOrderBookFeed()
+        provider = StreamOrderBookProvider(
+            feed=feed,
+            fallback=fallback,
+            max_age=5,
+            logger=create_logger('debug'),
+        )
+        return feed, provider
+
+    @mock.patch('time.time', mock.MagicMock(return_value=100.0))
+    def test_ok(self):
+        feed, provider = self.create_provider()
+        provider.subscribe(['BTC/USDT:USDT'])
+        self.assertEqual(feed.subscribed, {'BTC/USDT:USDT'})
+
+        feed.publish('BTC/USDT:USDT', 9000.0, 11000.0, timestamp=98.0)
+        feed.publish('ETH/USDT:USDT', 900.0, 1100.0, timestamp=98.0)
+
+        self.assertEqual(provider.get_quote('BTC/USDT:USDT'), Quote(
+            best_bid=9000.0,
+            best_ask=11000.0,
+            timestamp=98.0,
+        ))
+        self.assertEqual(provider.quote_age('BTC/USDT:USDT'), 2.0)
+        self.assertIsNone(provider.quote_age('ETH/USDT:USDT'))
+        self.assertIsNone(provider.get_quote('ETH/USDT:USDT'))
+
+    @mock.patch('time.time', mock.MagicMock(return_value=100.0))
+    def test_stale(self):
+        feed, provider = self.create_provider()
+        provider.subscribe(['BTC/USDT:USDT'])
+        feed.publish('BTC/USDT:USDT', 9000.0, 11000.0, timestamp=94.0)
+
+        self.assertEqual(provider.quote_age('BTC/USDT:USDT'), 6.0)
+        self.assertIsNone(provider.get_quote('BTC/USDT:USDT'))
+
+    @mock.patch('time.time', mock.MagicMock(return_value=100.0))
+    def test_fallback(self):
+        client = MagicMock()
+        client.fetch_order_book = MagicMock(return_value={
+            'asks': [[11000.0, 1]],
+            'bids': [[9000.0, 1]],
+        })
+        feed, provider = self.create_provider(fallback=RestOrderBookProvider(client=client))
+        provider.subscribe(['BTC/USDT:USDT'])
+
+        self.assertEqual(provider.get_quote('BTC/USDT:USDT'), Quote(
+            best_bid=9000.0,
+            best_ask=11000.0,
+            timestamp=100.0,
+        ))
+        client.fetch_order_book.assert_called_once_with(symbol='BTC/USDT:USDT')
+
+        feed.publish('BTC/USDT:USDT', 9001.0, 10999.0)
+        self.assertEqual(provider.get_quote('BTC/USDT:USDT').best_bid, 9001.0)
+        client.fetch_order_book.assert_called_once()
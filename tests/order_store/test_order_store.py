@@ -0,0 +1,79 @@
+from unittest import TestCase
+from src.bot_maker import Order
+from src.order_store import OrderStore
+
+
+def create_order(symbol, price=None, exchange_order_id=None):
+    return Order(
+        timestamp=0,
+        symbol=symbol,
+        price=price,
+        amount=1.0,
+        is_buy=True,
+        reduce_only=False,
+        duration=300,
+        executed_amount=0.0,
+        exchange_order_id=exchange_order_id,
+    )
+
+
+class TestOrderStore(TestCase):
+    def test_order(self):
+        orders = [
+            create_order('BTC'),
+            create_order('ETH', price=1000.0),
+            create_order('BTC', price=10000.0, exchange_order_id='1'),
+        ]
+        store = OrderStore(orders)
+
+        self.assertEqual(len(store), 3)
+        self.assertEqual([id(x) for x in store], [id(x) for x in orders])
+        self.assertEqual([id(x) for x in reversed(store)], [id(x) for x in orders[::-1]])
+        self.assertEqual(store.symbols(), ['BTC', 'ETH'])
+        self.assertEqual([id(x) for x in store.by_symbol('BTC')], [id(orders[0]), id(orders[2])])
+        self.assertEqual([id(x) for x in store.takers('BTC')], [id(orders[0])])
+        self.assertEqual(store.takers('ETH'), [])
+        self.assertEqual([id(x) for x in store.makers()], [id(orders[1]), id(orders[2])])
+        self.assertEqual([id(x) for x in store.unsubmitted()], [id(orders[0]), id(orders[1])])
+        self.assertIs(store.get_by_exchange_order_id('1'), orders[2])
+
+    def test_identical_orders(self):
+        order1 = create_order('BTC')
+        order2 = create_order('BTC')
+        store = OrderStore([order1, order2])
+
+        store.remove(order2)
+
+        self.assertIn(order1, store)
+        self.assertNotIn(order2, store)
+        self.assertEqual(len(store.takers('BTC')), 1)
+
+    def test_remove(self):
+        order = create_order('BTC', price=10000.0, exchange_order_id='1')
+        store = OrderStore([order])
+
+        store.remove(order)
+
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.symbols(), [])
+        self.assertEqual(store.makers(), [])
+        self.assertIsNone(store.get_by_exchange_order_id('1'))
+
+    def test_remove_while_iterating(self):
+        orders = [create_order('BTC'), create_order('ETH'), create_order('XRP')]
+        store = OrderStore(orders)
+
+        for order in reversed(store):
+            store.remove(order)
+
+        self.assertEqual(len(store), 0)
+
+    def test_set_exchange_order_id(self):
+        order = create_order('BTC')
+        store = OrderStore([order])
+
+        store.set_exchange_order_id(order, '1')
+
+        self.assertEqual(order.exchange_order_id, '1')
+        self.assertEqual(store.unsubmitted(), [])
+        self.assertIs(store.get_by_exchange_order_id('1'), order)
@@ -0,0 +1,56 @@
+from unittest import TestCase
+import numpy as np
+from src.portfolio_engine import PortfolioEngine, to_exchange_amounts
+
+
+class TestPortfolioEngineAggregate(TestCase):
+    def test_ok(self):
+        engine = PortfolioEngine()
+        engine.update_model('model1', {'BTC': 1.0, 'ETH': -2.0})
+        engine.update_model('model2', {'ETH': 1.0, 'XRP': 0.0})
+        engine.update_model('model3', {'SOL': 5.0})
+
+        symbols, amounts = engine.aggregate({'model1': 0.5, 'model2': 2.0, 'unknown': 1.0})
+
+        self.assertEqual(symbols, ['BTC', 'ETH', 'XRP'])
+        np.testing.assert_allclose(amounts, [0.5, 1.0, 0.0])
+
+    def test_update_remove(self):
+        engine = PortfolioEngine()
+        engine.update_model('model1', {'BTC': 1.0, 'ETH': -2.0})
+        engine.update_model('model2', {'ETH': 1.0})
+
+        engine.update_model('model1', {'BTC': 3.0})
+        symbols, amounts = engine.aggregate({'model1': 1.0, 'model2': 1.0})
+        self.assertEqual(symbols, ['BTC', 'ETH'])
+        np.testing.assert_allclose(amounts, [3.0, 1.0])
+
+        engine.remove_model('model2')
+        engine.update_model('model3', {'XRP': 2.0})
+        symbols, amounts = engine.aggregate({'model1': 1.0, 'model2': 1.0, 'model3': 1.0})
+        self.assertEqual(symbols, ['BTC', 'XRP'])
+        np.testing.assert_allclose(amounts, [3.0, 2.0])
+
+        engine.clear()
+        symbols, amounts = engine.aggregate({'model1': 1.0})
+        self.assertEqual(symbols, [])
+        self.assertEqual(len(amounts), 0)
+
+    def test_grow(self):
+        engine = PortfolioEngine()
+        for i in range(100):
+            engine.update_model('model{}'.format(i), {'S{}'.format(i): 1.0, 'BTC': 1.0})
+
+        symbols, amounts = engine.aggregate({'model{}'.format(i): 1.0 for i in range(100)})
+
+        self.assertEqual(len(symbols), 101)
+        self.assertEqual(amounts[symbols.index('BTC')], 100.0)
+        self.assertEqual(amounts[symbols.index('S99')], 1.0)
+
+    def test_to_exchange_amounts(self):
+        np.testing.assert_allclose(to_exchange_amounts(
+            np.array([1.0, -2.0]),
+            leverage=2.0,
+            unit_pos=np.array([0.5, 10.0]),
+            contract_size=np.array([1.0, 10.0]),
+        ), [1.0, -4.0])
@@ -0,0 +1,220 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+import pandas as pd
+from src.logger import create_logger
+from src.compact_rows import CompactRow
+from src.positions_cache import PositionsCache
+
+
+def create_df(rows):
+    df = pd.DataFrame(rows, columns=['model_id', 'timestamp', 'positions', 'weights', 'orders'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, unit='s')
+    return df.set_index(['timestamp', 'model_id']).sort_index()
+
+
+def to_datetime(t):
+    return pd.to_datetime(t, utc=True, unit='s')
+
+
+class TestPositionsCacheUpdate(TestCase):
+    def test_ok(self):
+        alphapool_client = MagicMock()
+        cache = PositionsCache(
+            alphapool_client=alphapool_client,
+            logger=create_logger('debug'),
+            window=1000,
+            overlap=300,
+        )
+
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {}),
+            ('model2', 300, {'BTC': 2.0}, {}, {}),
+        ]))
+        new_rows = cache.update(1000)
+        alphapool_client.get_positions.assert_called_with(min_timestamp=0)
+        self.assertEqual(len(new_rows), 2)
+        self.assertEqual(len(cache), 2)
+
+        # overlap rows are deduplicated, late row of model2 is added
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {}),
+            ('model1', 600, {'BTC': 3.0}, {}, {}),
+            ('model2', 300, {'BTC': 4.0}, {}, {}),
+        ]))
+        new_rows = cache.update(1200)
+        alphapool_client.get_positions.assert_called_with(min_timestamp=0)
+        self.assertEqual([cache.decode(x) for x in new_rows], [
+            CompactRow(to_datetime(300), 'model2', {'BTC': 4.0}, {}, {}),
+            CompactRow(to_datetime(600), 'model1', {'BTC': 3.0}, {}, {}),
+        ])
+        self.assertEqual(len(cache), 3)
+
+        # expired rows are evicted
+        alphapool_client.get_positions = MagicMock(return_value=create_df([]))
+        self.assertEqual(cache.update(1400), [])
+        alphapool_client.get_positions.assert_called_with(min_timestamp=300)
+        self.assertEqual([cache.decode(x) for x in cache.rows()], [
+            CompactRow(to_datetime(600), 'model1', {'BTC': 3.0}, {}, {}),
+        ])
+
+    def test_latest_rows(self):
+        alphapool_client = MagicMock()
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {}),
+            ('model2', 300, {'BTC': 2.0}, {}, {}),
+            ('model1', 600, {'BTC': 3.0}, {}, {}),
+            ('model2', 900, {'BTC': 4.0}, {}, {}),
+        ]))
+        cache = PositionsCache(
+            alphapool_client=alphapool_client,
+            logger=create_logger('debug'),
+            window=1000,
+        )
+
+        cache.update(600)
+        self.assertEqual({k: cache.decode(v) for k, v in cache.latest_rows().items()}, {
+            'model1': CompactRow(to_datetime(600), 'model1', {'BTC': 3.0}, {}, {}),
+            'model2': CompactRow(to_datetime(300), 'model2', {'BTC': 2.0}, {}, {}),
+        })
+        changed, version = cache.changes(0)
+        self.assertEqual(changed, {'model1', 'model2'})
+
+        # no new row
+        cache.update(700)
+        self.assertEqual(cache.changes(version), (set(), version))
+
+        # future row becomes visible
+        cache.update(900)
+        changed, version = cache.changes(version)
+        self.assertEqual(changed, {'model2'})
+        self.assertEqual(cache.decode(cache.latest_rows()['model2']).positions, {'BTC': 4.0})
+
+        # model1 expired
+        alphapool_client.get_positions = MagicMock(return_value=create_df([]))
+        cache.update(1700)
+        changed, version = cache.changes(version)
+        self.assertEqual(changed, {'model1'})
+        self.assertEqual(list(cache.latest_rows()), ['model2'])
+
+    def test_min_update_interval(self):
+        alphapool_client = MagicMock()
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {}),
+        ]))
+        cache = PositionsCache(
+            alphapool_client=alphapool_client,
+            logger=create_logger('debug'),
+            window=1000,
+            overlap=300,
+            min_update_interval=30,
+        )
+        self.assertEqual(len(cache.update(1000)), 1)
+        self.assertEqual(cache.update(1020), [])
+        self.assertEqual(alphapool_client.get_positions.call_count, 1)
+        cache.update(1030)
+        self.assertEqual(alphapool_client.get_positions.call_count, 2)
+
+    def test_min_timestamp(self):
+        # steady state refreshes fetch only rows near the watermark
+        alphapool_client = MagicMock()
+        cache = PositionsCache(
+            alphapool_client=alphapool_client,
+            logger=create_logger('debug'),
+        )
+
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model1', 600, {'BTC': 1.0}, {}, {}),
+            ('model1', 900, {'BTC': 2.0}, {}, {}),
+        ]))
+        cache.update(1000)
+        alphapool_client.get_positions.assert_called_with(min_timestamp=1000 - 24 * 60 * 60)
+
+        alphapool_client.get_positions = MagicMock(return_value=create_df([]))
+        cache.update(1060)
+        alphapool_client.get_positions.assert_called_with(min_timestamp=900 - 120)
+
+    def test_late_row(self):
+        alphapool_client = MagicMock()
+        cache = PositionsCache(
+            alphapool_client=alphapool_client,
+            logger=create_logger('debug'),
+            window=2000,
+        )
+
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model1', 300, {'BTC': 1.0}, {}, {}),
+            ('model1', 900, {'BTC': 2.0}, {}, {}),
+        ]))
+        cache.update(1000)
+
+        alphapool_client.get_positions = MagicMock(return_value=create_df([]))
+        cache.update(1200)
+        alphapool_client.get_positions.assert_called_with(min_timestamp=900 - 120)
+
+        # published 5 minutes late. picked up by the late re-fetch
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model2', 600, {'BTC': 3.0}, {}, {}),
+        ]))
+        cache.update(1900)
+        alphapool_client.get_positions.assert_called_with(min_timestamp=900 - 3600)
+        self.assertEqual([(x.timestamp, x.model_id) for x in cache.rows()], [
+            (to_datetime(300), 'model1'),
+            (to_datetime(600), 'model2'),
+            (to_datetime(900), 'model1'),
+        ])
+
+        # evicted by timestamp although appended last
+        alphapool_client.get_positions = MagicMock(return_value=create_df([]))
+        new_rows = cache.update(2700)
+        alphapool_client.get_positions.assert_called_with(min_timestamp=900 - 120)
+        self.assertEqual(new_rows, [])
+        self.assertEqual([(x.timestamp, x.model_id) for x in cache.rows()], [
+            (to_datetime(900), 'model1'),
+        ])
+        self.assertEqual(set(cache.latest_rows()), {'model1'})
+
+    def test_backfill(self):
+        # rows of an added model are merged for the whole window
+        alphapool_client = MagicMock()
+        cache = PositionsCache(
+            alphapool_client=alphapool_client,
+            logger=create_logger('debug'),
+            window=2000,
+        )
+
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model1', t, {'BTC': 1.0}, {}, {}) for t in [300, 600, 900, 1200]
+        ]))
+        cache.update(1200)
+
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model2', t, {'ETH': 1.0}, {}, {}) for t in [300, 600, 900]
+        ] + [
+            ('model3', t, {'XRP': 1.0}, {}, {}) for t in [450, 1200]
+        ]))
+        new_rows = cache.update(1300)
+        self.assertEqual(len(new_rows), 5)
+        expected = [
+            (to_datetime(300), 'model1'),
+            (to_datetime(300), 'model2'),
+            (to_datetime(450), 'model3'),
+            (to_datetime(600), 'model1'),
+            (to_datetime(600), 'model2'),
+            (to_datetime(900), 'model1'),
+            (to_datetime(900), 'model2'),
+            (to_datetime(1200), 'model1'),
+            (to_datetime(1200), 'model3'),
+        ]
+        self.assertEqual([(x.timestamp, x.model_id) for x in cache.rows()], expected)
+
+        # merged rows are indexed. refetched ones are deduplicated or replaced
+        alphapool_client.get_positions = MagicMock(return_value=create_df([
+            ('model2', 600, {'ETH': 1.0}, {}, {}),
+            ('model3', 450, {'XRP': 2.0}, {}, {}),
+        ]))
+        new_rows = cache.update(1400)
+        self.assertEqual([cache.decode(x) for x in new_rows], [
+            CompactRow(to_datetime(450), 'model3', {'XRP': 2.0}, {}, {}),
+        ])
+        self.assertEqual([(x.timestamp, x.model_id) for x in cache.rows()], expected)
+        self.assertEqual(cache.decode(list(cache.rows())[2]).positions, {'XRP': 2.0})
@@ -0,0 +1,54 @@
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+from src.logger import create_logger
+from src.price_snapshot import PriceSnapshot
+
+
+class TestPriceSnapshotFetch(TestCase):
+    @mock.patch('time.time', mock.MagicMock(return_value=100.0))
+    def test_bulk(self):
+        client = MagicMock()
+        client.has = {'fetchTickers': True}
+        client.fetch_tickers = MagicMock(return_value={
+            'BTC/USDT:USDT': {'last': 10000.0},
+            'ETH/USDT:USDT': {'last': 1000.0},
+        })
+        snapshot = PriceSnapshot(client=client, logger=create_logger('debug'))
+
+        self.assertIsNone(snapshot.age())
+        prices = snapshot.fetch(['BTC/USDT:USDT', 'ETH/USDT:USDT'])
+
+        self.assertEqual(prices, {'BTC/USDT:USDT': 10000.0, 'ETH/USDT:USDT': 1000.0})
+        self.assertEqual(snapshot.get_price('ETH/USDT:USDT'), 1000.0)
+        self.assertEqual(snapshot.age(now=103.0), 3.0)
+        client.fetch_tickers.assert_called_once_with(['BTC/USDT:USDT', 'ETH/USDT:USDT'])
+        client.fetch_ticker.assert_not_called()
+
+    def test_fallback(self):
+        client = MagicMock()
+        client.has = {'fetchTickers': False}
+        client.fetch_ticker = MagicMock(return_value={'last': 5000000.0})
+        snapshot = PriceSnapshot(client=client, logger=create_logger('debug'))
+
+        prices = snapshot.fetch(['BTC/JPY:JPY'])
+
+        self.assertEqual(prices, {'BTC/JPY:JPY': 5000000.0})
+        client.fetch_tickers.assert_not_called()
+        client.fetch_ticker.assert_called_once_with('BTC/JPY:JPY')
+
+    def test_missing_in_bulk(self):
+        client = MagicMock()
+        client.has = {'fetchTickers': True}
+        client.fetch_tickers = MagicMock(return_value={})
+        client.fetch_ticker = MagicMock(return_value={'last': 1.0})
+        snapshot = PriceSnapshot(client=client, logger=create_logger('debug'))
+
+        self.assertEqual(snapshot.fetch(['XRP/USDT:USDT']), {'XRP/USDT:USDT': 1.0})
+
+    def test_empty(self):
+        client = MagicMock()
+        client.has = {'fetchTickers': True}
+        snapshot = PriceSnapshot(client=client, logger=create_logger('debug'))
+
+        self.assertEqual(snapshot.fetch([]), {})
+        client.fetch_tickers.assert_not_called()
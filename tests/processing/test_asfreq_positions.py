@@ -0,0 +1,90 @@
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+from src.bench_processing import generate_positions
+from src.processing import asfreq_positions
+
+
+def asfreq_positions_reference(df, freq, max_timestamp):
+    # previous per model implementation
+    dfs = []
+    min_t = df.index.get_level_values('timestamp').min()
+    for model_id, df_model in df.groupby("model_id"):
+        df_model = df_model.reset_index().copy()
+        df_model = df_model.drop_duplicates("timestamp", keep="last")
+        df_model = df_model.set_index("timestamp").sort_index()
+
+        t = min_t - pd.to_timedelta(freq)
+        df_model.loc[t] = df_model.iloc[0]
+        for col in df_model.columns:
+            if col.startswith("p.") or col.startswith("w."):
+                df_model.loc[t, col] = 0.0
+        t = max_timestamp + pd.to_timedelta(freq)
+        df_model.loc[t] = df_model.iloc[0]
+        for col in df_model.columns:
+            if col.startswith("p.") or col.startswith("w."):
+                df_model.loc[t, col] = np.nan
+
+        df_model = df_model.sort_index()
+        df_model = df_model.asfreq(freq, method="ffill")
+        df_model = df_model.loc[
+            (df_model.index <= max_timestamp)
+        ]
+
+        dfs.append(df_model)
+
+    return pd.concat(dfs).reset_index().set_index(["model_id", "timestamp"])
+
+
+def to_datetime(x):
+    return pd.to_datetime(x, utc=True)
+
+
+class TestProcessingAsfreqPositions(TestCase):
+    def test_ok(self):
+        df = pd.DataFrame([
+            {'model_id': 'b', 'timestamp': to_datetime('2022-01-01 00:07:00'), 'p.BTC': 1.0, 'w.a': 0.0},
+            {'model_id': 'b', 'timestamp': to_datetime('2022-01-01 00:07:00'), 'p.BTC': 2.0, 'w.a': 0.0},
+            {'model_id': 'a', 'timestamp': to_datetime('2022-01-01 00:01:00'), 'p.BTC': 0.5, 'w.a': 0.0},
+            {'model_id': 'a', 'timestamp': to_datetime('2022-01-01 00:02:00'), 'p.BTC': np.nan, 'w.a': 1.0},
+            {'model_id': 'a', 'timestamp': to_datetime('2022-01-01 00:13:00'), 'p.BTC': 3.0, 'w.a': 0.0},
+            {'model_id': 'a', 'timestamp': to_datetime('2022-01-01 01:00:00'), 'p.BTC': 4.0, 'w.a': 0.0},
+        ]).set_index(['timestamp', 'model_id'])
+        max_timestamp = to_datetime('2022-01-01 00:20:00')
+
+        expected = asfreq_positions_reference(df, '300S', max_timestamp)
+        actual = asfreq_positions(df, '300S', max_timestamp)
+        pd.testing.assert_frame_equal(actual, expected)
+        self.assertEqual(actual.loc[('b', to_datetime('2022-01-01 00:11:00')), 'p.BTC'], 2.0)
+
+    def test_extra_columns(self):
+        df = pd.DataFrame([
+            {'model_id': 'a', 'timestamp': to_datetime('2022-01-01 00:05:00'), 'p.BTC': 1.0, 'delay': 3},
+            {'model_id': 'b', 'timestamp': to_datetime('2022-01-01 00:10:00'), 'p.BTC': 2.0, 'delay': 5},
+        ]).set_index(['model_id', 'timestamp'])
+        max_timestamp = to_datetime('2022-01-01 00:20:00')
+
+        expected = asfreq_positions_reference(df, '300S', max_timestamp)
+        actual = asfreq_positions(df, '300S', max_timestamp)
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_generated(self):
+        df, max_timestamp = generate_positions(n_models=5, n_symbols=4, days=0.5, n_portfolios=2)
+        df = df.fillna(0)
+
+        expected = asfreq_positions_reference(df, '300S', max_timestamp)
+        actual = asfreq_positions(df, '300S', max_timestamp)
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_empty_grid(self):
+        # max_timestamp before the first timestamp minus freq
+        df = pd.DataFrame([
+            {'model_id': 'a', 'timestamp': to_datetime('2022-01-01 00:10:00'), 'p.BTC': 1.0, 'delay': 3},
+        ]).set_index(['model_id', 'timestamp'])
+        max_timestamp = to_datetime('2022-01-01 00:00:00')
+
+        actual = asfreq_positions(df, '300S', max_timestamp)
+        self.assertEqual(actual.shape, (0, 2))
+        self.assertEqual(list(actual.index.names), ['model_id', 'timestamp'])
+        self.assertEqual(list(actual.columns), ['p.BTC', 'delay'])
+        self.assertEqual(list(actual.dtypes), [np.float64, np.int64])
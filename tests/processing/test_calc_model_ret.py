@@ -0,0 +1,65 @@
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+from src.bench_processing import (
+    generate_positions,
+    generate_returns,
+    attach_returns,
+)
+from src.processing import (
+    calc_model_ret,
+    iter_model_ret,
+    calc_portfolio_positions,
+    preprocess_df,
+)
+
+
+def calc_model_ret_reference(df):
+    # previous series based implementation
+    model_ret = None
+    for col in df.columns:
+        if col.startswith("p."):
+            ret_col = col.replace("p.", "ret.")
+            if model_ret is None:
+                model_ret = df[col] * df[ret_col]
+            else:
+                model_ret += df[col] * df[ret_col]
+    return model_ret.unstack(level=0)
+
+
+def create_df():
+    df, execution_time = generate_positions(n_models=5, n_symbols=4, days=2, n_portfolios=1)
+    df = calc_portfolio_positions(preprocess_df(df, execution_time))
+    df_ret = generate_returns(df.index.get_level_values('timestamp').unique().sort_values(), 4)
+    return attach_returns(df, df_ret)
+
+
+class TestProcessingCalcModelRet(TestCase):
+    def test_ok(self):
+        df = create_df()
+        pd.testing.assert_frame_equal(calc_model_ret(df), calc_model_ret_reference(df))
+
+    def test_nan(self):
+        df = create_df()
+        df.iloc[3, 0] = np.nan
+        pd.testing.assert_frame_equal(calc_model_ret(df), calc_model_ret_reference(df))
+
+    def test_iter(self):
+        df = create_df()
+        frames = list(iter_model_ret(df, window='12H'))
+        self.assertGreater(len(frames), 1)
+        pd.testing.assert_frame_equal(pd.concat(frames), calc_model_ret_reference(df))
+
+    def test_float32(self):
+        df = create_df()
+        expected = calc_model_ret_reference(df)
+        actual, error_bound = calc_model_ret(df, dtype=np.float32, return_error_bound=True)
+
+        self.assertEqual(actual.dtypes.iloc[0], np.float32)
+        error = (actual.astype(float) - expected).abs()
+        self.assertTrue((error <= error_bound).all().all())
+        self.assertTrue((error_bound < 1e-6).all().all())
+
+        frames = list(iter_model_ret(df, window='1D', dtype=np.float32, return_error_bound=True))
+        pd.testing.assert_frame_equal(pd.concat([x[0] for x in frames]), actual)
+        pd.testing.assert_frame_equal(pd.concat([x[1] for x in frames]), error_bound)
@@ -0,0 +1,77 @@
+from unittest import TestCase
+import numpy as np
+import pandas as pd
+from src.bench_processing import generate_positions
+from src.processing import calc_portfolio_positions, preprocess_df
+
+
+def calc_portfolio_positions_reference(df):
+    # previous per column implementation
+    df = df.copy()
+    symbol_cols = [x for x in df.columns if x.startswith("p.")]
+    for col in df.columns:
+        if col.startswith("w."):
+            model_id = col.replace("w.", "")
+
+            df2 = df.index.to_frame()
+            df2['model_id'] = model_id
+            idx = pd.MultiIndex.from_frame(df2)
+
+            df.loc[:, symbol_cols] += df[col].values.reshape(-1, 1) * df.loc[idx, symbol_cols].values
+    return df
+
+
+def create_df(rows):
+    df = pd.DataFrame(rows)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, unit='s')
+    return df.set_index(['model_id', 'timestamp']).fillna(0.0)
+
+
+class TestProcessingCalcPortfolioPositions(TestCase):
+    def test_generated(self):
+        df, execution_time = generate_positions(n_models=6, n_symbols=5, days=0.5, n_portfolios=2)
+        df = preprocess_df(df, execution_time)
+
+        expected = calc_portfolio_positions_reference(df)
+        pd.testing.assert_frame_equal(calc_portfolio_positions(df), expected)
+        pd.testing.assert_frame_equal(calc_portfolio_positions(df, sparse=True), expected)
+        pd.testing.assert_frame_equal(calc_portfolio_positions(df, chunk_size=1), expected)
+        pd.testing.assert_frame_equal(calc_portfolio_positions(df, sparse=True, chunk_size=1), expected)
+
+    def test_chained(self):
+        # pf2 holds pf1 which is applied first
+        rows = []
+        for t in [0, 300]:
+            rows += [
+                {'model_id': 'm1', 'timestamp': t, 'p.BTC': 1.0 + t, 'p.ETH': 2.0},
+                {'model_id': 'm2', 'timestamp': t, 'p.BTC': -1.0, 'p.ETH': 3.0},
+                {'model_id': 'pf1', 'timestamp': t, 'w.m1': 0.5, 'w.m2': 0.5},
+                {'model_id': 'pf2', 'timestamp': t, 'w.pf1': 2.0, 'w.m2': 1.0},
+            ]
+        df = create_df(rows)[['p.BTC', 'p.ETH', 'w.m1', 'w.m2', 'w.pf1']]
+
+        expected = calc_portfolio_positions_reference(df)
+        actual = calc_portfolio_positions(df)
+        pd.testing.assert_frame_equal(actual, expected)
+        # 1.0 * -1 + 2.0 * (0.5 * 301 + 0.5 * -1)
+        self.assertEqual(actual.loc[('pf2', pd.to_datetime(300, utc=True, unit='s')), 'p.BTC'], 299.0)
+
+    def test_nan(self):
+        df = create_df([
+            {'model_id': 'm1', 'timestamp': 0, 'p.BTC': 1.0},
+            {'model_id': 'pf1', 'timestamp': 0, 'w.m1': 0.5},
+        ])
+        df.loc[('m1', pd.to_datetime(0, utc=True, unit='s')), 'p.BTC'] = np.nan
+
+        pd.testing.assert_frame_equal(
+            calc_portfolio_positions(df),
+            calc_portfolio_positions_reference(df),
+        )
+
+    def test_missing_model(self):
+        df = create_df([
+            {'model_id': 'm1', 'timestamp': 0, 'p.BTC': 1.0},
+            {'model_id': 'pf1', 'timestamp': 0, 'w.m2': 0.5},
+        ])
+        with self.assertRaises(KeyError):
+            calc_portfolio_positions(df)
@@ -0,0 +1,32 @@
+from unittest import TestCase, mock
+from unittest.mock import MagicMock
+from src.rate_limiter import TokenBucket, get_token_bucket
+
+
+class TestRateLimiterTokenBucket(TestCase):
+    def test_ok(self):
+        clock = [0.0]
+
+        def sleep(x):
+            clock[0] += x
+
+        with mock.patch('time.monotonic', lambda: clock[0]), \
+                mock.patch('time.sleep', MagicMock(side_effect=sleep)) as mock_sleep:
+            bucket = TokenBucket(rate=2, capacity=2)
+            bucket.acquire()
+            bucket.acquire()
+            mock_sleep.assert_not_called()
+
+            bucket.acquire()
+            self.assertAlmostEqual(clock[0], 0.5)
+
+            clock[0] += 10
+            for _ in range(3):
+                bucket.acquire()
+            self.assertAlmostEqual(clock[0], 11.0)
+
+    def test_shared(self):
+        self.assertIs(
+            get_token_bucket('test_shared', rate=1),
+            get_token_bucket('test_shared', rate=2),
+        )
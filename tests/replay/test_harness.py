@@ -0,0 +1,18 @@
+from unittest import TestCase
+from src.logger import create_logger
+from src.replay.harness import run_replay
+
+
+class TestReplayHarness(TestCase):
+    def test_ok(self):
+        report = run_replay(
+            n_models=3,
+            n_symbols=4,
+            n_steps=30,
+            logger=create_logger('debug'),
+        )
+        self.assertEqual(report['steps'], 30)
+        self.assertEqual(report['models'], 3)
+        self.assertEqual(report['errors'], 0)
+        self.assertGreater(report['orders']['created'], 0)
+        self.assertEqual(report['api_calls']['by_method']['fetch_positions'], 30)
@@ -0,0 +1,52 @@
+from unittest import TestCase
+import ccxt
+import pandas as pd
+from src.replay.sim_exchange import SimClock, SimExchange
+
+
+def create_exchange(**kwargs):
+    prices = pd.DataFrame({'BTC/USDT:USDT': [100.0, 99.0, 101.0]}, index=[0.0, 60.0, 120.0])
+    clock = SimClock(0.0)
+    return SimExchange(prices=prices, clock=clock, spread=0.0, **kwargs), clock
+
+
+class TestSimExchange(TestCase):
+    def test_fill(self):
+        exchange, clock = create_exchange()
+        order = exchange.create_order('BTC/USDT:USDT', 'limit', 'buy', 2.0, 99.5, {'reduceOnly': 'false'})
+        self.assertEqual(order['status'], 'open')
+        self.assertEqual(len(exchange.fetch_open_orders('BTC/USDT:USDT')), 1)
+
+        exchange.advance(60.0)
+        self.assertEqual(exchange.fetch_order(order['id'])['status'], 'closed')
+        self.assertEqual(exchange.fetch_positions(), [{
+            'symbol': 'BTC/USDT:USDT',
+            'side': 'long',
+            'contracts': 2.0,
+        }])
+
+        exchange.advance(120.0)
+        collateral = float(exchange.fapiPrivateV2GetAccount()['totalMarginBalance'])
+        self.assertAlmostEqual(collateral, 10000.0 + 2 * (101.0 - 99.5))
+
+    def test_post_only_reject(self):
+        exchange, clock = create_exchange()
+        order = exchange.create_order('BTC/USDT:USDT', 'limit', 'buy', 1.0, 100.5, {})
+        self.assertEqual(order['status'], 'expired')
+        self.assertEqual(exchange.fetch_open_orders(), [])
+
+    def test_cancel(self):
+        exchange, clock = create_exchange()
+        order = exchange.create_order('BTC/USDT:USDT', 'limit', 'sell', 1.0, 101.0, {})
+        exchange.cancel_order(order['id'])
+        with self.assertRaises(ccxt.OrderNotFound):
+            exchange.cancel_order(order['id'])
+
+    def test_latency_rate_limit(self):
+        exchange, clock = create_exchange(latency=0.5, rate_limit=2)
+        exchange.fetch_ticker('BTC/USDT:USDT')
+        exchange.fetch_ticker('BTC/USDT:USDT')
+        self.assertEqual(clock.time(), 1.0)
+        with self.assertRaises(ccxt.RateLimitExceeded):
+            exchange.fetch_ticker('BTC/USDT:USDT')
+        self.assertEqual(exchange.api_calls['fetch_ticker'], 3)
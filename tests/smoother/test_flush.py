@@ -0,0 +1,129 @@
+from unittest import TestCase
+import os
+import tempfile
+import json
+from src.logger import create_logger
+from src.smoother import Smoother
+
+
+def create_smoother(tmp_path, reset_threshold=100, compact_threshold=1000):
+    return Smoother(
+        logger=create_logger('debug'),
+        halflife=10,
+        reset_threshold=reset_threshold,
+        save_path=tmp_path,
+        compact_threshold=compact_threshold,
+        reset_scope='global',
+    )
+
+
+def read_journal(tmp_path):
+    with open(tmp_path + '.journal') as f:
+        return [json.loads(x) for x in f]
+
+
+class TestSmootherFlush(TestCase):
+    def test_journal(self):
+        with tempfile.TemporaryDirectory() as dir:
+            tmp_path = os.path.join(dir, 'states.json')
+            smoother = create_smoother(tmp_path)
+            smoother.step('BTC', 1, t=1)
+            smoother.step('ETH', 2, t=1)
+            smoother.step('BTC', 2, t=11)
+            self.assertFalse(os.path.exists(tmp_path + '.journal'))
+
+            smoother.flush()
+            self.assertEqual(read_journal(tmp_path), [
+                ['ETH', 2.0, 1.0],
+                ['BTC', 1.5, 11.0],
+            ])
+            self.assertFalse(os.path.exists(tmp_path))
+
+            smoother.flush()
+            self.assertEqual(len(read_journal(tmp_path)), 2)
+
+            # restart without close replays the journal
+            smoother = create_smoother(tmp_path)
+            self.assertEqual(smoother._states, {
+                'BTC': { 'value': 1.5, 't': 11 },
+                'ETH': { 'value': 2, 't': 1 },
+            })
+            self.assertFalse(os.path.exists(tmp_path + '.journal'))
+            with open(tmp_path) as f:
+                self.assertEqual(json.load(f), smoother._states)
+
+    def test_compact(self):
+        with tempfile.TemporaryDirectory() as dir:
+            tmp_path = os.path.join(dir, 'states.json')
+            smoother = create_smoother(tmp_path, compact_threshold=3)
+            smoother.step('BTC', 1, t=1)
+            smoother.step('ETH', 2, t=1)
+            smoother.flush()
+            self.assertEqual(len(read_journal(tmp_path)), 2)
+
+            smoother.step('BTC', 2, t=11)
+            smoother.flush()
+            self.assertFalse(os.path.exists(tmp_path + '.journal'))
+            with open(tmp_path) as f:
+                self.assertEqual(json.load(f), {
+                    'BTC': { 'value': 1.5, 't': 11 },
+                    'ETH': { 'value': 2, 't': 1 },
+                })
+            self.assertEqual(os.listdir(dir), ['states.json'])
+
+    def test_reset(self):
+        with tempfile.TemporaryDirectory() as dir:
+            tmp_path = os.path.join(dir, 'states.json')
+            smoother = create_smoother(tmp_path, reset_threshold=0.2)
+            smoother.step('BTC', 10, t=1)
+            smoother.step('ETH', 20, t=1)
+            smoother.flush()
+            smoother.step('BTC', 10, t=11)
+            smoother.step('ETH', 30, t=11) # reset
+            smoother.flush()
+            self.assertEqual(read_journal(tmp_path), [
+                ['BTC', 10.0, 1.0],
+                ['ETH', 20.0, 1.0],
+                None,
+                ['ETH', 30.0, 11.0],
+            ])
+
+            smoother = create_smoother(tmp_path)
+            self.assertEqual(smoother._states, { 'ETH': { 'value': 30, 't': 11 } })
+
+    def test_replay_after_compact(self):
+        # crash between snapshot replace and journal removal
+        with tempfile.TemporaryDirectory() as dir:
+            tmp_path = os.path.join(dir, 'states.json')
+            smoother = create_smoother(tmp_path, reset_threshold=0.2)
+            smoother.step('BTC', 10, t=1)
+            smoother.step('ETH', 20, t=1)
+            smoother.step('ETH', 30, t=11) # reset
+            smoother.step('BTC', 5, t=11)
+            smoother.flush()
+            with open(tmp_path + '.journal') as f:
+                journal = f.read()
+            smoother.close()
+            with open(tmp_path + '.journal', 'w') as f:
+                f.write(journal)
+
+            smoother = create_smoother(tmp_path)
+            self.assertEqual(smoother._states, {
+                'BTC': { 'value': 5, 't': 11 },
+                'ETH': { 'value': 30, 't': 11 },
+            })
+
+    def test_torn_line(self):
+        with tempfile.TemporaryDirectory() as dir:
+            tmp_path = os.path.join(dir, 'states.json')
+            smoother = create_smoother(tmp_path)
+            smoother.step('BTC', 1, t=1)
+            smoother.flush()
+            with open(tmp_path + '.journal', 'a') as f:
+                f.write('["ETH", 2.')
+
+            smoother = create_smoother(tmp_path)
+            self.assertEqual(smoother._states, { 'BTC': { 'value': 1, 't': 1 } })
+            smoother.step('ETH', 2, t=1)
+            smoother.flush()
+            self.assertEqual(read_journal(tmp_path), [['ETH', 2.0, 1.0]])
@@ -8,3 +8,5 @@ class TestSmootherStep(TestCase):
         self.assertEqual(smoother.step('BTC', 1, t=1), 1)
         self.assertEqual(smoother.step('BTC', 2, t=11), 2)
         self.assertEqual(smoother.step('ETH', 2, t=11), 2)
+        smoother.flush()
+        smoother.close()
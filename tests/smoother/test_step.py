@@ -20,6 +20,8 @@ class TestSmootherStep(TestCase):
             self.assertEqual(smoother.step('BTC', 1, t=1), 1)
             self.assertEqual(smoother.step('BTC', 2, t=11), 1.5)
             self.assertEqual(smoother._states, { 'BTC': { 'value': 1.5, 't': 11 } })
+            self.assertFalse(os.path.exists(tmp_path))
+            smoother.close()
             with open(tmp_path) as f:
                 self.assertEqual(json.load(f), { 'BTC': { 'value': 1.5, 't': 11 } })
 
@@ -34,6 +36,7 @@ class TestSmootherStep(TestCase):
                 save_path=tmp_path,
             )
             self.assertEqual(smoother.step('BTC', 1, t=1), 1)
+            smoother.flush()
             smoother = Smoother(
                 logger=logger,
                 halflife=10,
@@ -50,6 +53,7 @@ class TestSmootherStep(TestCase):
             halflife=10,
             reset_threshold=0.2,
             save_path=None,
+            reset_scope='global',
         )
         self.assertEqual(smoother.step('BTC', 10, t=1), 10)
         self.assertEqual(smoother.step('ETH', 20, t=5), 20)
@@ -64,6 +68,7 @@ class TestSmootherStep(TestCase):
             halflife=10,
             reset_threshold=0.2,
             save_path=None,
+            reset_scope='global',
         )
         self.assertEqual(smoother.step('BTC', 10, t=1), 10)
         self.assertEqual(smoother.step('ETH', 20, t=5), 20)
@@ -81,3 +86,21 @@ class TestSmootherStep(TestCase):
         )
         self.assertEqual(smoother.step('BTC', 20, t=1), 20)
         self.assertEqual(smoother.step('BTC', 40, t=21), 35)
+
+    def test_reset_key(self):
+        logger = create_logger('debug')
+        smoother = Smoother(
+            logger=logger,
+            halflife=10,
+            reset_threshold=0.2,
+            save_path=None,
+            reset_scope='key',
+        )
+        self.assertEqual(smoother.step('BTC', 10, t=1), 10)
+        self.assertEqual(smoother.step('ETH', 20, t=5), 20)
+        self.assertEqual(smoother.step('BTC', 12, t=11), 11)
+        self.assertEqual(smoother.step('ETH', 24.01, t=11), 24.01) # reset
+        self.assertEqual(smoother._states, {
+            'BTC': { 'value': 11, 't': 11 },
+            'ETH': { 'value': 24.01, 't': 11 },
+        })
@@ -0,0 +1,77 @@
+from unittest import TestCase
+import numpy as np
+from src.logger import create_logger
+from src.smoother import Smoother, NullSmoother
+
+
+def create_smoother(reset_scope='key'):
+    return Smoother(
+        logger=create_logger('debug'),
+        halflife=10,
+        reset_threshold=0.2,
+        save_path=None,
+        reset_scope=reset_scope,
+    )
+
+
+class TestSmootherStepMany(TestCase):
+    def test_ok(self):
+        smoother = create_smoother()
+        np.testing.assert_array_equal(smoother.step_many(['BTC', 'ETH'], [10, 20], t=1), [10, 20])
+        np.testing.assert_array_equal(smoother.step_many(['ETH', 'XRP', 'BTC'], [22, 1, 12], t=11), [21, 1, 11])
+        self.assertEqual(smoother._states, {
+            'BTC': { 'value': 11, 't': 11 },
+            'ETH': { 'value': 21, 't': 11 },
+            'XRP': { 'value': 1, 't': 11 },
+        })
+
+    def test_same_as_step(self):
+        rs = np.random.RandomState(0)
+        keys = ['S{}'.format(i) for i in range(20)]
+        smoother = create_smoother()
+        smoother_many = create_smoother()
+        for t in range(50):
+            step_keys = list(rs.choice(keys, size=5, replace=False))
+            values = rs.uniform(1, 1.5, size=5)
+            expected = [smoother.step(k, v, t=t) for k, v in zip(step_keys, values)]
+            np.testing.assert_array_equal(smoother_many.step_many(step_keys, values, t=t), expected)
+        self.assertEqual(smoother_many._states, smoother._states)
+
+    def test_reset_key(self):
+        smoother = create_smoother()
+        smoother.step_many(['BTC', 'ETH'], [10, 20], t=1)
+        np.testing.assert_array_equal(smoother.step_many(['BTC', 'ETH'], [12, 30], t=11), [11, 30])
+
+    def test_reset_global(self):
+        smoother = create_smoother('global')
+        smoother.step_many(['BTC', 'ETH', 'XRP'], [10, 20, 1], t=1)
+        # keys before the reset are smoothed, then cleared with the others
+        np.testing.assert_array_equal(smoother.step_many(['BTC', 'ETH', 'XRP'], [12, 30, 1], t=11), [11, 30, 1])
+        self.assertEqual(smoother._states, {
+            'ETH': { 'value': 30, 't': 11 },
+            'XRP': { 'value': 1, 't': 11 },
+        })
+
+    def test_same_as_step_global(self):
+        rs = np.random.RandomState(0)
+        keys = ['S{}'.format(i) for i in range(20)]
+        smoother = create_smoother('global')
+        smoother_many = create_smoother('global')
+        resets = 0
+        for t in range(50):
+            step_keys = list(rs.choice(keys, size=5, replace=False))
+            # jumps beyond reset_threshold now and then
+            values = rs.uniform(1, 1.3, size=5)
+            states = smoother._states
+            expected = [smoother.step(k, v, t=t) for k, v in zip(step_keys, values)]
+            resets += len(smoother._states) < len(states)
+            np.testing.assert_array_equal(smoother_many.step_many(step_keys, values, t=t), expected)
+            self.assertEqual(smoother_many._states, smoother._states)
+        self.assertGreater(resets, 0)
+
+    def test_invalid_reset_scope(self):
+        with self.assertRaises(ValueError):
+            create_smoother('symbol')
+
+    def test_null(self):
+        np.testing.assert_array_equal(NullSmoother().step_many(['BTC', 'ETH'], [1, 2], t=1), [1, 2])
@@ -0,0 +1,49 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+from src.logger import create_logger
+from src.market_cache import MarketCache
+from src.symbol_registry import SymbolRegistry
+from ..market_cache.test_build_market_index import markets
+
+
+class TestSymbolRegistryLookup(TestCase):
+    def test_markets(self):
+        registry = SymbolRegistry('binance', ['BTC/USDT:USDT', 'ETH/USDT:USDT', 'BTC/USDT'])
+
+        self.assertEqual(len(registry), 2)
+        self.assertEqual(registry.to_ccxt('BTC'), 'BTC/USDT:USDT')
+        self.assertEqual(registry.to_symbol('ETH/USDT:USDT'), 'ETH')
+        self.assertTrue(registry.exists('BTC'))
+        self.assertFalse(registry.exists('BTC/USDT'))
+        # interned on both sides
+        self.assertIs(registry.to_ccxt(''.join(['B', 'TC'])), registry.to_ccxt('BTC'))
+
+    def test_unknown(self):
+        registry = SymbolRegistry('bitflyer', ['BTC/JPY:JPY'])
+
+        # converted by suffix but not listed
+        self.assertEqual(registry.to_ccxt('ETH'), 'ETH/JPY:JPY')
+        self.assertFalse(registry.exists('ETH'))
+        self.assertEqual(registry.to_symbol('XRP/JPY:JPY'), 'XRP')
+        self.assertEqual(len(registry), 1)
+
+    def test_not_implemented(self):
+        registry = SymbolRegistry('unknown')
+        with self.assertRaises(Exception):
+            registry.to_ccxt('BTC')
+
+    def test_market_cache(self):
+        client = MagicMock()
+        client.id = 'binance'
+        client.fetch_markets = MagicMock(return_value=markets)
+        cache = MarketCache(client=client, logger=create_logger('debug'))
+
+        self.assertFalse(cache.get_symbol_registry().exists('BTC'))
+        loaded = cache.get_markets()
+        registry = cache.get_symbol_registry(loaded)
+        self.assertIs(registry, cache.get_symbol_registry())
+        self.assertTrue(registry.exists('BTC'))
+
+        # markets of an older load are not mixed with the current registry
+        self.assertIsNot(cache.get_symbol_registry({}), registry)
+        self.assertFalse(cache.get_symbol_registry({}).exists('BTC'))
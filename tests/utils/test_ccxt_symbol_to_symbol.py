@@ -8,3 +8,8 @@ class TestUtilsCcxtSymbolToSymbol(TestCase):
         self.assertEqual(ccxt_symbol_to_symbol('BTC/USDT'), 'BTC')
         self.assertEqual(ccxt_symbol_to_symbol('BTC/USDT:USDT'), 'BTC')
         self.assertEqual(ccxt_symbol_to_symbol('BTC/JPY:JPY'), 'BTC')
+
+    def test_dated(self):
+        # quote parts are removed anywhere in the symbol, not only at the end
+        self.assertEqual(ccxt_symbol_to_symbol('BTC/USDT:USDT-240329'), 'BTC-240329')
+        self.assertEqual(ccxt_symbol_to_symbol('BTC/USD:USD-240329'), 'BTC-240329')